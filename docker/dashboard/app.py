@@ -5,53 +5,123 @@ Author: Joshua
 Description: Simple Flask dashboard to view health check reports
 """
 
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify, request
+import base64
 import json
 import os
+import queue
 from datetime import datetime
 from pathlib import Path
 
+from report_index import ReportIndex
+from report_stream import ReportBroadcaster
+
 app = Flask(__name__)
 
 REPORTS_DIR = Path('/app/reports')
+INDEX_PATH = Path(os.getenv('REPORT_INDEX_PATH', '/app/data/report_index.db'))
+INDEX_REFRESH_SECONDS = float(os.getenv('REPORT_INDEX_REFRESH', '5'))
+
+report_index = ReportIndex(REPORTS_DIR, INDEX_PATH, INDEX_REFRESH_SECONDS)
+STREAM_POLL_SECONDS = float(os.getenv('REPORT_STREAM_POLL', '2'))
+STREAM_KEEPALIVE_SECONDS = 15
+
+report_broadcaster = ReportBroadcaster(report_index, STREAM_POLL_SECONDS)
+
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 1000
 
 
 def get_latest_report():
     """Get the most recent health report"""
-    report_files = list(REPORTS_DIR.glob('*.json'))
+    filename = report_index.latest_filename()
 
-    if not report_files:
+    if filename is None:
         return None
 
-    # Sort by modification time, most recent first
-    latest_report = max(report_files, key=lambda p: p.stat().st_mtime)
-
     try:
-        with open(latest_report, 'r') as f:
-            data = json.load(f)
-        return data
+        return report_index.load(filename)
     except Exception as e:
         print(f"Error reading report: {e}")
         return None
 
 
-def get_all_reports():
-    """Get all health reports sorted by timestamp"""
-    report_files = list(REPORTS_DIR.glob('*.json'))
+def encode_cursor(key):
+    """Encode a (timestamp, filename) page key as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor; ValueError if malformed"""
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if (
+        not isinstance(key, list)
+        or len(key) != 2
+        or not all(isinstance(part, str) for part in key)
+    ):
+        raise ValueError('cursor must encode a (timestamp, filename) pair')
+    return key[0], key[1]
+
+
+def parse_fields(value):
+    """Split the fields parameter into dotted paths; ValueError if malformed"""
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    for path in fields:
+        if not all(key.strip() for key in path.split('.')):
+            raise ValueError(f'Invalid field path: {path}')
+    return fields
+
+
+def project_fields(report, fields):
+    """Keep only the requested dotted field paths of a report"""
+    projected = {}
+
+    for path in fields:
+        value = report
+        for key in path.split('.'):
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = projected
+            *parents, leaf = path.split('.')
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[leaf] = value
+
+    return projected
+
+
+def get_all_reports(limit=50, since=None, until=None, before=None, fields=None):
+    """
+    Get the newest health reports sorted by timestamp
+
+    Returns the reports and, when more may follow, the page key of the
+    last one, which can be passed back as ``before`` to fetch the next page.
+    """
     reports = []
+    keys = report_index.recent_filenames(limit, since, until, before)
 
-    for report_file in report_files:
+    for _, filename in keys:
         try:
-            with open(report_file, 'r') as f:
-                data = json.load(f)
-                data['filename'] = report_file.name
-                reports.append(data)
+            data = report_index.load(filename)
+            data['filename'] = filename
+            if fields:
+                data = project_fields(data, fields)
+            reports.append(data)
         except Exception:
             continue
 
-    # Sort by timestamp, newest first
-    reports.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-    return reports
+    next_key = keys[-1] if len(keys) == limit else None
+    return reports, next_key
+
+
+def parse_timestamp_arg(name):
+    """Read an ISO 8601 query parameter, normalised to the report format"""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return datetime.fromisoformat(value).isoformat()
 
 
 @app.route('/')
@@ -78,19 +148,90 @@ def api_latest():
 
 @app.route('/api/history')
 def api_history():
-    """API endpoint for historical reports"""
-    reports = get_all_reports()
+    """
+    API endpoint for historical reports
+
+    Query parameters:
+      since, until  ISO 8601 bounds on the report timestamp
+      limit         page size (default 50, max 1000)
+      cursor        next_cursor value from the previous page
+      fields        comma-separated dotted paths, e.g. timestamp,cpu.cpu_percent_total
+    """
+    try:
+        since = parse_timestamp_arg('since')
+        until = parse_timestamp_arg('until')
+    except ValueError:
+        return jsonify({'error': 'since/until must be ISO 8601 timestamps'}), 400
+
+    try:
+        limit = int(request.args.get('limit', HISTORY_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+
+    before = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            before = decode_cursor(cursor)
+        except Exception:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+    try:
+        fields = parse_fields(request.args.get('fields', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    reports, next_key = get_all_reports(limit, since, until, before, fields)
+
     return jsonify({
-        'count': len(reports),
-        'reports': reports[:50]  # Limit to 50 most recent
+        'count': report_index.count(since, until),
+        'reports': reports,
+        'next_cursor': encode_cursor(next_key) if next_key else None
     })
 
 
+@app.route('/api/stream')
+def api_stream():
+    """
+    Server-sent events stream of new reports
+
+    All clients share one watcher thread; each connection only waits on
+    its own queue. The current report is sent as soon as a client connects.
+    """
+    def generate():
+        client_queue = report_broadcaster.subscribe()
+        try:
+            latest = report_index.latest_filename()
+            if latest is not None:
+                try:
+                    report = report_index.load(latest)
+                    yield f"id: {latest}\nevent: report\ndata: {json.dumps(report)}\n\n"
+                except Exception:
+                    pass
+
+            while True:
+                try:
+                    event_id, payload = client_queue.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event_id}\nevent: report\ndata: {payload}\n\n"
+        finally:
+            report_broadcaster.unsubscribe(client_queue)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/history')
 def history():
     """Historical reports page"""
-    reports = get_all_reports()
-    return render_template('history.html', reports=reports[:50])
+    reports, _ = get_all_reports(limit=HISTORY_DEFAULT_LIMIT)
+    return render_template('history.html', reports=reports)
 
 
 @app.route('/health')
@@ -107,6 +248,7 @@ if __name__ == '__main__':
     print("Health Checker Dashboard Starting")
     print("=" * 60)
     print(f"Reports directory: {REPORTS_DIR}")
+    print(f"Report index: {INDEX_PATH}")
     print("Dashboard URL: http://localhost:5000")
     print("=" * 60)
 
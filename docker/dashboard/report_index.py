@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Report Index
+Author: Joshua
+Description: SQLite index over the health report directory so the dashboard
+can look up reports without re-reading every JSON file on each request
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    filename TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    valid INTEGER NOT NULL,
+    timestamp TEXT,
+    overall_health TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reports_order ON reports (timestamp, filename);
+CREATE INDEX IF NOT EXISTS idx_reports_mtime ON reports (mtime);
+"""
+
+
+class ReportIndex:
+    """Incrementally maintained index of health report files"""
+
+    def __init__(self, reports_dir, index_path, refresh_interval=5):
+        self.reports_dir = Path(reports_dir)
+        self.index_path = Path(index_path)
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._last_sync = None
+        self._conn = None
+
+    def _connect(self):
+        """Open the index database on first use"""
+        if self._conn is None:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.index_path), check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _read_summary(self, path):
+        """Parse a report file and pull out the indexed fields"""
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            return data.get('timestamp', ''), data.get('overall_health')
+        except Exception:
+            return None
+
+    def sync(self, force=False):
+        """
+        Bring the index up to date with the reports directory
+
+        Only files whose mtime or size changed since the last sync are
+        parsed. Syncs are throttled to one per ``refresh_interval`` seconds
+        unless ``force`` is set.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if (
+                not force
+                and self._last_sync is not None
+                and now - self._last_sync < self.refresh_interval
+            ):
+                return
+            self._last_sync = now
+
+            conn = self._connect()
+            known = {
+                filename: (mtime, size)
+                for filename, mtime, size in conn.execute(
+                    'SELECT filename, mtime, size FROM reports'
+                )
+            }
+
+            seen = set()
+            changed = []
+            if self.reports_dir.is_dir():
+                with os.scandir(self.reports_dir) as entries:
+                    for entry in entries:
+                        if not entry.name.endswith('.json') or not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                        seen.add(entry.name)
+                        if known.get(entry.name) != (stat.st_mtime, stat.st_size):
+                            changed.append((entry.name, stat.st_mtime, stat.st_size))
+
+            rows = []
+            for filename, mtime, size in changed:
+                summary = self._read_summary(self.reports_dir / filename)
+                if summary is None:
+                    # Possibly a half-written file; it is re-read once it changes
+                    rows.append((filename, mtime, size, 0, None, None))
+                else:
+                    rows.append((filename, mtime, size, 1) + summary)
+
+            removed = [(filename,) for filename in known if filename not in seen]
+
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO reports '
+                    '(filename, mtime, size, valid, timestamp, overall_health) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    rows,
+                )
+                conn.executemany('DELETE FROM reports WHERE filename = ?', removed)
+
+    def _query(self, sql, params=()):
+        """Sync the index, then run a read query against it"""
+        self.sync()
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _range_filter(self, since=None, until=None):
+        """Build the WHERE clause shared by range queries"""
+        clauses = ['valid = 1']
+        params = []
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('timestamp <= ?')
+            params.append(until)
+        return ' AND '.join(clauses), params
+
+    def count(self, since=None, until=None):
+        """Number of readable reports, optionally within a time range"""
+        where, params = self._range_filter(since, until)
+        return self._query(f'SELECT COUNT(*) FROM reports WHERE {where}', params)[0][0]
+
+    def latest_entry(self):
+        """(filename, mtime) of the most recently modified report"""
+        rows = self._query(
+            'SELECT filename, mtime FROM reports WHERE valid = 1 '
+            'ORDER BY mtime DESC, timestamp DESC LIMIT 1'
+        )
+        return rows[0] if rows else None
+
+    def latest_filename(self):
+        """Filename of the most recently modified report"""
+        latest = self.latest_entry()
+        return latest[0] if latest else None
+
+    def recent_filenames(self, limit=50, since=None, until=None, before=None):
+        """
+        Newest reports by timestamp as (timestamp, filename) pairs
+
+        ``before`` is a (timestamp, filename) key from a previous page;
+        paging on that key rather than an offset keeps pages stable while
+        new reports are added.
+        """
+        where, params = self._range_filter(since, until)
+        if before is not None:
+            where += ' AND (timestamp < ? OR (timestamp = ? AND filename < ?))'
+            params += [before[0], before[0], before[1]]
+
+        return [
+            (timestamp, filename)
+            for timestamp, filename in self._query(
+                f'SELECT timestamp, filename FROM reports WHERE {where} '
+                'ORDER BY timestamp DESC, filename DESC LIMIT ?',
+                params + [limit],
+            )
+        ]
+
+    def load(self, filename):
+        """Read a full report from disk"""
+        with open(self.reports_dir / filename, 'r') as f:
+            return json.load(f)
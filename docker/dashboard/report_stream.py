@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Report Stream
+Author: Joshua
+Description: Single watcher thread that pushes new health reports to every
+connected server-sent events client
+"""
+
+import json
+import queue
+import threading
+
+
+class ReportBroadcaster:
+    """Watch the report index once and fan new reports out to subscribers"""
+
+    def __init__(self, report_index, poll_interval=2, queue_size=10):
+        self.report_index = report_index
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_seen = None
+
+    def subscribe(self):
+        """Register a client and return the queue its events arrive on"""
+        client_queue = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(client_queue)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='report-watcher', daemon=True
+                )
+                self._thread.start()
+        return client_queue
+
+    def unsubscribe(self, client_queue):
+        """Remove a client queue"""
+        with self._lock:
+            self._subscribers.discard(client_queue)
+
+    def subscriber_count(self):
+        """Number of connected clients"""
+        with self._lock:
+            return len(self._subscribers)
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self._stop.set()
+
+    def publish(self, event_id, payload):
+        """Send an event to every subscriber, dropping the oldest if a client lags"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for client_queue in subscribers:
+            try:
+                client_queue.put_nowait((event_id, payload))
+            except queue.Full:
+                try:
+                    client_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    client_queue.put_nowait((event_id, payload))
+                except queue.Full:
+                    pass
+
+    def check_for_update(self):
+        """Sync the index and publish the latest report if it changed"""
+        self.report_index.sync(force=True)
+        latest = self.report_index.latest_entry()
+
+        if latest is None or latest == self._last_seen:
+            return False
+
+        first_check = self._last_seen is None
+        self._last_seen = latest
+        if first_check:
+            # Clients get the current report on connect; only push changes
+            return False
+
+        filename, _ = latest
+        try:
+            report = self.report_index.load(filename)
+        except Exception as e:
+            print(f"Error reading report: {e}")
+            return False
+
+        self.publish(filename, json.dumps(report))
+        return True
+
+    def _run(self):
+        """Watcher loop; exits once the last subscriber disconnects"""
+        while not self._stop.is_set():
+            try:
+                self.check_for_update()
+            except Exception as e:
+                print(f"Report watcher error: {e}")
+
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    self._last_seen = None
+                    return
+
+            self._stop.wait(self.poll_interval)
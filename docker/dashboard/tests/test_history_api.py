@@ -0,0 +1,156 @@
+"""
+Tests for the report index and the /api/history endpoint
+"""
+
+import json
+
+import pytest
+
+import app as dashboard
+from report_index import ReportIndex
+
+
+def write_report(reports_dir, filename, timestamp, cpu=10.0):
+    """Write a minimal health report file"""
+    report = {
+        'timestamp': timestamp,
+        'overall_health': 'HEALTHY',
+        'cpu': {'cpu_percent_total': cpu, 'cpu_count': 4},
+        'memory': {'percent': 50.0},
+    }
+    (reports_dir / filename).write_text(json.dumps(report))
+
+
+@pytest.fixture
+def reports_dir(tmp_path):
+    path = tmp_path / 'reports'
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def index(tmp_path, reports_dir):
+    return ReportIndex(reports_dir, tmp_path / 'index.db', refresh_interval=0)
+
+
+@pytest.fixture
+def client(monkeypatch, index):
+    monkeypatch.setattr(dashboard, 'report_index', index)
+    return dashboard.app.test_client()
+
+
+def fetch_all_pages(client, **params):
+    """Follow next_cursor until the last page; returns every report"""
+    reports = []
+    query = dict(params)
+    while True:
+        response = client.get('/api/history', query_string=query)
+        assert response.status_code == 200
+        body = response.get_json()
+        reports += body['reports']
+        if body['next_cursor'] is None:
+            return reports
+        query['cursor'] = body['next_cursor']
+
+
+class TestReportIndex:
+    """Test keyset paging in ReportIndex"""
+
+    def test_recent_filenames_orders_by_timestamp_then_filename(self, index, reports_dir):
+        write_report(reports_dir, 'a.json', '2025-01-01T00:00:00')
+        write_report(reports_dir, 'b.json', '2025-01-02T00:00:00')
+        write_report(reports_dir, 'c.json', '2025-01-02T00:00:00')
+
+        assert index.recent_filenames(10) == [
+            ('2025-01-02T00:00:00', 'c.json'),
+            ('2025-01-02T00:00:00', 'b.json'),
+            ('2025-01-01T00:00:00', 'a.json'),
+        ]
+
+    def test_before_key_breaks_ties_on_filename(self, index, reports_dir):
+        for name in ('a', 'b', 'c'):
+            write_report(reports_dir, f'{name}.json', '2025-01-01T00:00:00')
+
+        page = index.recent_filenames(10, before=('2025-01-01T00:00:00', 'b.json'))
+
+        assert page == [('2025-01-01T00:00:00', 'a.json')]
+
+    def test_invalid_files_are_not_listed(self, index, reports_dir):
+        write_report(reports_dir, 'good.json', '2025-01-01T00:00:00')
+        (reports_dir / 'partial.json').write_text('{"timestamp": ')
+
+        assert index.recent_filenames(10) == [('2025-01-01T00:00:00', 'good.json')]
+        assert index.count() == 1
+
+
+class TestHistoryApi:
+    """Test cursor paging, projection and validation on /api/history"""
+
+    def test_pages_cover_equal_timestamps_exactly_once(self, client, reports_dir):
+        for n in range(7):
+            write_report(reports_dir, f'report_{n}.json', '2025-01-01T00:00:00')
+
+        reports = fetch_all_pages(client, limit=3)
+
+        assert [r['filename'] for r in reports] == [
+            f'report_{n}.json' for n in reversed(range(7))
+        ]
+
+    def test_cursor_is_stable_across_newly_indexed_reports(self, client, reports_dir):
+        for day in range(1, 5):
+            write_report(reports_dir, f'day_{day}.json', f'2025-01-0{day}T00:00:00')
+
+        first = client.get('/api/history', query_string={'limit': 2}).get_json()
+        assert [r['filename'] for r in first['reports']] == ['day_4.json', 'day_3.json']
+
+        # A newer report would shift an offset-based page; an older one
+        # that falls after the cursor belongs on a later page
+        write_report(reports_dir, 'day_5.json', '2025-01-05T00:00:00')
+        write_report(reports_dir, 'day_0.json', '2024-12-31T12:00:00')
+
+        rest = fetch_all_pages(client, limit=2, cursor=first['next_cursor'])
+
+        assert [r['filename'] for r in rest] == ['day_2.json', 'day_1.json', 'day_0.json']
+
+    def test_time_range_and_count(self, client, reports_dir):
+        for day in range(1, 6):
+            write_report(reports_dir, f'day_{day}.json', f'2025-01-0{day}T00:00:00')
+
+        body = client.get('/api/history', query_string={
+            'since': '2025-01-02T00:00:00', 'until': '2025-01-04T00:00:00',
+        }).get_json()
+
+        assert body['count'] == 3
+        assert [r['filename'] for r in body['reports']] == [
+            'day_4.json', 'day_3.json', 'day_2.json'
+        ]
+        assert body['next_cursor'] is None
+
+    def test_fields_projection(self, client, reports_dir):
+        write_report(reports_dir, 'r.json', '2025-01-01T00:00:00', cpu=42.5)
+
+        body = client.get('/api/history', query_string={
+            'fields': 'timestamp, cpu.cpu_percent_total,missing.field',
+        }).get_json()
+
+        assert body['reports'] == [{
+            'timestamp': '2025-01-01T00:00:00',
+            'cpu': {'cpu_percent_total': 42.5},
+        }]
+
+    @pytest.mark.parametrize('params', [
+        {'cursor': 'not-a-cursor!'},
+        {'cursor': dashboard.encode_cursor(['only-one-part'])},
+        {'cursor': dashboard.encode_cursor([1, 2])},
+        {'fields': 'cpu..cpu_percent_total'},
+        {'fields': 'timestamp,.cpu'},
+        {'limit': 'ten'},
+        {'since': 'yesterday'},
+    ])
+    def test_bad_input_is_rejected(self, client, reports_dir, params):
+        write_report(reports_dir, 'r.json', '2025-01-01T00:00:00')
+
+        response = client.get('/api/history', query_string=params)
+
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
@@ -0,0 +1,198 @@
+"""
+Admission control for the data processing service
+
+Requests are admitted or rejected before any body is read or handler runs,
+so an overloaded worker spends almost nothing on the requests it sheds:
+
+- a token bucket per client returns ``429`` when one client sends too fast
+- a global token bucket returns ``503`` when the worker as a whole is over
+  its configured rate
+- a per-route in-flight limit returns ``503`` when a route already has too
+  many requests in progress
+
+Rejections carry ``Retry-After``. Health, readiness, metrics and profiling
+routes are exempt, so probes and diagnosis keep working while traffic is
+shed.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from starlette.routing import Match
+
+from app.instrumentation import REQUESTS_SHED, UNMATCHED_ROUTE
+from app.serialization import dumps_json, error_content
+
+DEFAULT_EXEMPT_PATHS = ("/health", "/ready", "/metrics", "/debug/profile")
+
+# Clients with a token bucket; the least recently seen are forgotten first
+DEFAULT_MAX_CLIENTS = 10_000
+
+
+class TokenBucket:
+    """Refills at ``rate`` tokens per second up to ``burst`` tokens"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take a token: 0 if one was available, else seconds until one is"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionMiddleware:
+    """
+    Shed requests beyond the configured rates and concurrency
+
+    A rate or limit of 0 disables that check. Clients are identified by the
+    ``client_header`` request header (e.g. ``x-api-key``) when given and
+    present, otherwise by peer address. ``routes`` is the application's route
+    list, used to apply in-flight limits and exemptions per route template.
+    """
+
+    def __init__(
+        self,
+        app,
+        routes: Iterable = (),
+        client_rate: float = 0.0,
+        client_burst: Optional[float] = None,
+        global_rate: float = 0.0,
+        global_burst: Optional[float] = None,
+        max_in_flight: int = 0,
+        client_header: Optional[str] = None,
+        exempt_paths: Iterable[str] = DEFAULT_EXEMPT_PATHS,
+        max_clients: int = DEFAULT_MAX_CLIENTS,
+    ):
+        self.app = app
+        self.routes = routes
+        self.client_rate = client_rate
+        self.client_burst = client_burst or max(client_rate, 1.0)
+        self.global_rate = global_rate
+        self.max_in_flight = max_in_flight
+        self.client_header = (
+            client_header.lower().encode() if client_header else None
+        )
+        self.exempt_paths = set(exempt_paths)
+        self.max_clients = max_clients
+
+        self._global_bucket = None
+        if global_rate > 0:
+            self._global_bucket = TokenBucket(
+                global_rate, global_burst or max(global_rate, 1.0), time.monotonic()
+            )
+        self._client_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._in_flight: Dict[str, int] = {}
+
+    def _match(self, scope) -> Tuple[Optional[str], dict]:
+        """Template of the route a request will reach, and its child scope"""
+        partial = (None, {})
+        for route in self.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return route.path_format, child_scope
+            if match == Match.PARTIAL and partial[0] is None:
+                partial = (route.path_format, child_scope)
+        return partial
+
+    def _client_key(self, scope) -> str:
+        if self.client_header is not None:
+            for name, value in scope["headers"]:
+                if name == self.client_header:
+                    return value.decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _client_bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self._client_buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.client_rate, self.client_burst, now)
+            self._client_buckets[key] = bucket
+            if len(self._client_buckets) > self.max_clients:
+                self._client_buckets.popitem(last=False)
+        else:
+            self._client_buckets.move_to_end(key)
+        return bucket
+
+    def _admit(
+        self, endpoint: Optional[str], scope
+    ) -> Optional[Tuple[int, float, str]]:
+        """None to admit, else (status code, retry after, reason)"""
+        if (
+            self.max_in_flight
+            and endpoint is not None
+            and self._in_flight.get(endpoint, 0) >= self.max_in_flight
+        ):
+            return 503, 1.0, "in_flight"
+
+        now = time.monotonic()
+        client_bucket = None
+        if self.client_rate > 0:
+            client_bucket = self._client_bucket(self._client_key(scope), now)
+            wait = client_bucket.take(now)
+            if wait:
+                return 429, wait, "client_rate"
+
+        if self._global_bucket is not None:
+            wait = self._global_bucket.take(now)
+            if wait:
+                if client_bucket is not None:
+                    # Not admitted, so the client keeps its token
+                    client_bucket.tokens += 1
+                return 503, wait, "global_rate"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint, child_scope = self._match(scope)
+        if endpoint in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        rejection = self._admit(endpoint, scope)
+        if rejection is not None:
+            status_code, retry_after, reason = rejection
+            # Label the rejection with its route in request metrics
+            scope.update(child_scope)
+            REQUESTS_SHED.labels(endpoint or UNMATCHED_ROUTE, reason).inc()
+            await _reject(send, status_code, retry_after)
+            return
+
+        if not self.max_in_flight or endpoint is None:
+            await self.app(scope, receive, send)
+            return
+
+        self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._in_flight[endpoint] -= 1
+
+
+async def _reject(send, status_code: int, retry_after: float) -> None:
+    """Send a JSON error response with Retry-After, in whole seconds"""
+    detail = "Too many requests" if status_code == 429 else "Service overloaded"
+    body = dumps_json(error_content(status_code, detail))
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
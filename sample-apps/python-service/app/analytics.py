@@ -0,0 +1,319 @@
+"""
+Streaming analytics for the data processing service
+
+Processing endpoints feed every request and value into fixed-size
+sketches, so the analytics summary is computed from in-memory aggregates
+in O(buckets) rather than by scanning stored points:
+
+- t-digests for latency and value quantiles
+- a HyperLogLog for distinct data point ids
+- bucketed ring buffers for the sliding 1h and 24h windows
+"""
+import math
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+# t-digest compression: roughly the number of centroids kept
+DEFAULT_COMPRESSION = 200
+
+# Values buffered before a t-digest merges them into its centroids
+TDIGEST_BUFFER_SIZE = 4096
+
+# HyperLogLog precision: 2**14 registers, ~0.8% standard error
+HLL_PRECISION = 14
+
+
+class TDigest:
+    """
+    Merging t-digest for streaming quantile estimates
+
+    Incoming values are buffered and merged in batches: the centroids and
+    buffer are sorted together and grouped so that no centroid spans more
+    than one unit of the k1 scale function, which keeps the tails precise.
+    """
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = []
+        self._buffered = 0
+        self._scalars = []
+
+    def add_one(self, value: float) -> None:
+        """Add a single value without the per-call cost of an array"""
+        self._scalars.append(value)
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self._scalars) + self._buffered >= TDIGEST_BUFFER_SIZE:
+            self._merge()
+
+    def add(self, values) -> None:
+        """Add an array of values"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if not len(values):
+            return
+        self._buffer.append(values)
+        self._buffered += len(values)
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        if len(self._scalars) + self._buffered >= TDIGEST_BUFFER_SIZE:
+            self._merge()
+
+    def _merge(self) -> None:
+        """Fold buffered values into the centroids"""
+        if self._scalars:
+            self._buffer.append(np.array(self._scalars, dtype=np.float64))
+            self._scalars = []
+        if not self._buffer:
+            return
+        incoming = np.concatenate(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+
+        means = np.concatenate([self.means, incoming])
+        weights = np.concatenate([self.weights, np.ones(len(incoming))])
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+
+        total = weights.sum()
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / total
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q - 1)
+        bins = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.diff(bins, prepend=-1))
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile q (0..1), or None if empty"""
+        self._merge()
+        if self.count == 0:
+            return None
+        if len(self.means) == 1:
+            return float(self.means[0])
+
+        centers = np.cumsum(self.weights) - self.weights / 2
+        position = q * self.count
+        value = np.interp(
+            position,
+            np.concatenate([[0.0], centers, [self.count]]),
+            np.concatenate([[self.min], self.means, [self.max]]),
+        )
+        return float(value)
+
+
+MASK64 = (1 << 64) - 1
+
+
+def _mix64_int(value: int) -> int:
+    """Scalar version of _mix64"""
+    z = (value + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser: spread integer ids uniformly over 64 bits"""
+    with np.errstate(over="ignore"):
+        z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter over integer ids"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_one(self, value: int) -> None:
+        """Add a single integer id"""
+        hashed = _mix64_int(value & MASK64)
+        rest_bits = 64 - self.precision
+        rest = hashed & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        index = hashed >> rest_bits
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, ids) -> None:
+        """Add an array of integer ids"""
+        try:
+            ids = np.asarray(ids, dtype=np.int64).ravel()
+        except OverflowError:
+            # Ids outside int64: wrap them to 64 bits, as add_one does
+            ids = np.array([int(value) & MASK64 for value in ids], dtype=np.uint64)
+        if not len(ids):
+            return
+        hashed = _mix64(ids)
+        rest_bits = 64 - self.precision
+        index = (hashed >> np.uint64(rest_bits)).astype(np.int64)
+        # The remaining bits fit in a float64 mantissa, so frexp gives their
+        # exact bit length; rank is the position of the first set bit
+        rest = hashed & np.uint64((1 << rest_bits) - 1)
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (rest_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def count(self) -> int:
+        """Estimated number of distinct ids"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class RingWindow:
+    """
+    Sliding window of per-bucket totals in a fixed ring buffer
+
+    Each bucket covers ``bucket_seconds``; a bucket is reset when its slot
+    is reused for a newer period, so stale buckets never need sweeping.
+    """
+
+    FIELDS = ("requests", "errors", "points", "value_sum", "latency_sum")
+
+    def __init__(self, bucket_seconds: int, buckets: int):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self.periods = [-1] * buckets
+        self.totals = {name: [0.0] * buckets for name in self.FIELDS}
+
+    def add(self, now: float, **amounts: float) -> None:
+        """Add amounts to the bucket covering ``now``"""
+        period = int(now // self.bucket_seconds)
+        slot = period % self.buckets
+        if self.periods[slot] != period:
+            self.periods[slot] = period
+            for values in self.totals.values():
+                values[slot] = 0.0
+        for name, amount in amounts.items():
+            self.totals[name][slot] += amount
+
+    def sums(self, now: float) -> Dict[str, float]:
+        """Totals over the buckets inside the window ending at ``now``"""
+        oldest = int(now // self.bucket_seconds) - self.buckets
+        live = [slot for slot, period in enumerate(self.periods) if period > oldest]
+        return {
+            name: sum(values[slot] for slot in live)
+            for name, values in self.totals.items()
+        }
+
+
+class StreamingAnalytics:
+    """Live aggregates over processed requests and values"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.points = 0
+        self.value_sum = 0.0
+        self.latency_sum = 0.0
+        self.latency_digest = TDigest()
+        self.value_digest = TDigest()
+        self.distinct_ids = HyperLogLog()
+        self.windows = {
+            "last_1h": RingWindow(60, 60),
+            "last_24h": RingWindow(900, 96),
+        }
+
+    def record_request(self, latency_seconds: float, error: bool) -> None:
+        """Record one processing request"""
+        now = time.time()
+        self.requests += 1
+        self.errors += error
+        self.latency_sum += latency_seconds
+        self.latency_digest.add_one(latency_seconds)
+        for window in self.windows.values():
+            window.add(now, requests=1, errors=error, latency_sum=latency_seconds)
+
+    def record_value(self, value: float, point_id: Optional[int] = None) -> None:
+        """Record a single processed value"""
+        now = time.time()
+        self.points += 1
+        self.value_sum += value
+        self.value_digest.add_one(value)
+        if point_id is not None:
+            self.distinct_ids.add_one(point_id)
+        for window in self.windows.values():
+            window.add(now, points=1, value_sum=value)
+
+    def record_values(self, values, ids=None) -> None:
+        """Record an array of processed values and, when present, their ids"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if not len(values):
+            return
+        now = time.time()
+        value_sum = float(values.sum())
+        self.points += len(values)
+        self.value_sum += value_sum
+        self.value_digest.add(values)
+        if ids is not None:
+            self.distinct_ids.add(ids)
+        for window in self.windows.values():
+            window.add(now, points=len(values), value_sum=value_sum)
+
+    def summary(self) -> Dict:
+        """Summary statistics; cost depends on window buckets, not traffic"""
+        now = time.time()
+
+        def ratio(numerator, denominator, default=None):
+            return numerator / denominator if denominator else default
+
+        summary = {
+            "total_processed": self.points,
+            "total_requests": self.requests,
+            "average_processing_time_ms": ratio(
+                self.latency_sum * 1000, self.requests, 0.0
+            ),
+            "success_rate": ratio(self.requests - self.errors, self.requests, 1.0),
+            "error_rate": ratio(self.errors, self.requests, 0.0),
+            "average_value": ratio(self.value_sum, self.points),
+            "distinct_ids": self.distinct_ids.count(),
+            "latency_ms": {
+                name: (value * 1000 if value is not None else None)
+                for name, value in (
+                    ("p50", self.latency_digest.quantile(0.5)),
+                    ("p95", self.latency_digest.quantile(0.95)),
+                    ("p99", self.latency_digest.quantile(0.99)),
+                )
+            },
+            "value_quantiles": {
+                "p50": self.value_digest.quantile(0.5),
+                "p95": self.value_digest.quantile(0.95),
+                "p99": self.value_digest.quantile(0.99),
+            },
+        }
+
+        for name, window in self.windows.items():
+            sums = window.sums(now)
+            summary[name] = {
+                "processed": int(sums["points"]),
+                "requests": int(sums["requests"]),
+                "errors": int(sums["errors"]),
+                "avg_value": ratio(sums["value_sum"], sums["points"]),
+                "avg_processing_time_ms": ratio(
+                    sums["latency_sum"] * 1000, sums["requests"]
+                ),
+            }
+
+        return summary
@@ -0,0 +1,201 @@
+"""
+Online anomaly scoring for the data processing service
+
+Each series keeps a small, fixed amount of state that is updated in O(1)
+per point, so points can be scored as they arrive without an offline job:
+
+- EWMA mean and variance (fast-moving baseline)
+- running median and MAD estimates (robust to the outliers being scored)
+- a seasonal baseline: one EWMA mean/variance per slot of a repeating period
+"""
+import math
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Smoothing factor for the EWMA mean/variance
+DEFAULT_ALPHA = 0.05
+
+# Points a series must see before it can be flagged
+DEFAULT_WARMUP = 30
+
+# Score above which a point is flagged as anomalous
+DEFAULT_THRESHOLD = 4.0
+
+# Seasonal baseline: 24 hourly slots, i.e. a daily cycle
+DEFAULT_SEASON_SLOT_SECONDS = 3600
+DEFAULT_SEASON_SLOTS = 24
+
+# Least recently updated series are evicted past this many
+DEFAULT_MAX_SERIES = 100_000
+
+# Scale factor that makes the MAD comparable to a standard deviation
+MAD_TO_STD = 1.4826
+
+# Smallest spread a baseline is scored against: an absolute floor, and a
+# fraction of the baseline's magnitude. Without one, a perfectly flat
+# baseline has zero spread and no deviation from it could be scored
+MIN_SPREAD = 1e-6
+MIN_RELATIVE_SPREAD = 1e-3
+
+
+class SeriesState:
+    """Online statistics for one series"""
+
+    __slots__ = (
+        "count",
+        "mean",
+        "variance",
+        "median",
+        "mad",
+        "seasonal_mean",
+        "seasonal_variance",
+        "seasonal_count",
+    )
+
+    def __init__(self, season_slots: int):
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.median = 0.0
+        self.mad = 0.0
+        self.seasonal_mean = [0.0] * season_slots
+        self.seasonal_variance = [0.0] * season_slots
+        self.seasonal_count = [0] * season_slots
+
+
+def _spread(spread: float, center: float) -> float:
+    """Spread raised to the floor for a baseline centred on center"""
+    return max(spread, MIN_SPREAD, MIN_RELATIVE_SPREAD * abs(center))
+
+
+def _z(value: float, center: float, spread: float) -> float:
+    """Deviation of value from center in units of (floored) spread"""
+    return (value - center) / _spread(spread, center)
+
+
+class AnomalyDetector:
+    """
+    Score points against per-series online baselines
+
+    A point is scored against the state *before* it is folded in, so a
+    spike does not hide itself. The score is the largest absolute z-score
+    of the three baselines; seasonal scores only count once the point's
+    slot has been seen ``warmup`` times.
+    """
+
+    def __init__(
+        self,
+        alpha: float = DEFAULT_ALPHA,
+        warmup: int = DEFAULT_WARMUP,
+        threshold: float = DEFAULT_THRESHOLD,
+        season_slot_seconds: int = DEFAULT_SEASON_SLOT_SECONDS,
+        season_slots: int = DEFAULT_SEASON_SLOTS,
+        max_series: int = DEFAULT_MAX_SERIES,
+    ):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.threshold = threshold
+        self.season_slot_seconds = season_slot_seconds
+        self.season_slots = season_slots
+        self.max_series = max_series
+        self._series: "OrderedDict[str, SeriesState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def _state(self, series: str) -> SeriesState:
+        """State for a series, created on first use and kept in LRU order"""
+        state = self._series.get(series)
+        if state is None:
+            state = SeriesState(self.season_slots)
+            self._series[series] = state
+            if len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(series)
+        return state
+
+    def score(self, series: str, value: float, timestamp: float) -> Dict:
+        """Score one point, then update the series state with it"""
+        state = self._state(series)
+        slot = int(timestamp // self.season_slot_seconds) % self.season_slots
+
+        warmed_up = state.count >= self.warmup
+        ewma_z = _z(value, state.mean, math.sqrt(state.variance))
+        robust_z = _z(value, state.median, state.mad * MAD_TO_STD)
+        seasonal_z = 0.0
+        if state.seasonal_count[slot] >= self.warmup:
+            seasonal_z = _z(
+                value,
+                state.seasonal_mean[slot],
+                math.sqrt(state.seasonal_variance[slot]),
+            )
+
+        score = max(abs(ewma_z), abs(robust_z), abs(seasonal_z)) if warmed_up else 0.0
+        self._update(state, slot, value)
+
+        return {
+            "series": series,
+            "value": value,
+            "score": score,
+            "is_anomaly": score > self.threshold,
+            "ewma_z": ewma_z,
+            "robust_z": robust_z,
+            "seasonal_z": seasonal_z,
+        }
+
+    def _update(self, state: SeriesState, slot: int, value: float) -> None:
+        """Fold a value into every baseline of a series"""
+        alpha = self.alpha
+        if state.count == 0:
+            state.mean = value
+            state.median = value
+        else:
+            # Incremental EWMA variance (Finch, 2009)
+            delta = value - state.mean
+            state.mean += alpha * delta
+            state.variance = (1 - alpha) * (state.variance + alpha * delta * delta)
+
+            deviation = abs(value - state.median)
+            if state.count < self.warmup:
+                # Until a spread is known, seed the median and MAD with
+                # running means of the values and their deviations
+                weight = 1.0 / (state.count + 1)
+                state.median += weight * (value - state.median)
+                state.mad += weight * (deviation - state.mad)
+            else:
+                # Frugal streaming median: step toward each value by a
+                # fraction of the (floored) spread, without overshooting it
+                spread = _spread(state.mad * MAD_TO_STD, state.median)
+                step = min(alpha * spread, deviation)
+                if value > state.median:
+                    state.median += step
+                elif value < state.median:
+                    state.median -= step
+                # The MAD moves additively toward each deviation, so it can
+                # leave zero after a flat stretch. Deviations are clipped at
+                # the anomaly threshold so outliers barely move it
+                clipped = min(deviation, self.threshold * spread)
+                state.mad += alpha * (clipped - state.mad)
+        state.count += 1
+
+        if state.seasonal_count[slot] == 0:
+            state.seasonal_mean[slot] = value
+        else:
+            delta = value - state.seasonal_mean[slot]
+            state.seasonal_mean[slot] += alpha * delta
+            state.seasonal_variance[slot] = (1 - alpha) * (
+                state.seasonal_variance[slot] + alpha * delta * delta
+            )
+        state.seasonal_count[slot] += 1
+
+
+def series_key(
+    point_id: Optional[int], metadata: Optional[dict], metadata_key: Optional[str]
+) -> str:
+    """Series a point belongs to: a metadata field, else its id, else "default" """
+    if metadata_key and metadata and metadata.get(metadata_key) is not None:
+        return str(metadata[metadata_key])
+    if point_id is not None:
+        return str(point_id)
+    return "default"
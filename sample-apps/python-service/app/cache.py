@@ -0,0 +1,239 @@
+"""
+Result cache for the processing endpoints
+
+Clients that retry resend the same payload, and every retry used to be
+recomputed. Responses are cached under the request's ``Idempotency-Key``
+header or, when content caching is enabled, a hash of the request body,
+so a retry is answered with the stored response. Concurrent duplicates of a
+request still being computed wait for that computation instead of
+starting their own, which keeps retry storms from multiplying the work.
+
+Backends:
+- ``MemoryBackend``: a per-process LRU bounded by entries and bytes
+- ``RedisBackend``: any Redis-compatible server, shared by every worker
+  (requires the ``redis`` package)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+from app.instrumentation import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Longest accepted Idempotency-Key header
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(ValueError):
+    """Raised when an Idempotency-Key is reused with a different payload"""
+
+
+class CachedResult:
+    """An encoded response and the fingerprint of the request that made it"""
+
+    __slots__ = ("fingerprint", "media_type", "body")
+
+    def __init__(self, fingerprint: str, media_type: str, body: bytes):
+        self.fingerprint = fingerprint
+        self.media_type = media_type
+        self.body = body
+
+    def dumps(self) -> bytes:
+        header = json.dumps([self.fingerprint, self.media_type]).encode()
+        return header + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, data: bytes) -> "CachedResult":
+        header, _, body = data.partition(b"\n")
+        fingerprint, media_type = json.loads(header)
+        return cls(fingerprint, media_type, body)
+
+
+class MemoryBackend:
+    """LRU of serialised results with a time-to-live, local to the process"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    async def set(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, data)
+        self.size += len(data)
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        _, data = self._entries.pop(key)
+        self.size -= len(data)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Results stored in a Redis-compatible server with a time-to-live"""
+
+    def __init__(self, url: str, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 prefix: str = "result-cache:"):
+        # Imported here: the client is slow to import and only needed when used
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("The Redis result cache requires the redis package")
+        self.client = aioredis.from_url(url)
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, data: bytes) -> None:
+        await self.client.set(self.prefix + key, data, px=self.ttl_ms)
+
+
+class ResultCache:
+    """
+    Cache encoded responses by idempotency key or request content
+
+    Only requests carrying an Idempotency-Key are cached unless
+    ``by_content`` is on, since identical bodies are not always retries.
+    Backend errors are logged and treated as misses, so an unavailable
+    cache server never fails a request.
+    """
+
+    def __init__(self, backend, by_content: bool = False):
+        self.backend = backend
+        self.by_content = by_content
+        self._inflight = {}
+
+    def key_for(
+        self,
+        endpoint: str,
+        body: bytes,
+        idempotency_key: Optional[str] = None,
+        variant: str = "",
+    ) -> Optional[Tuple[str, str]]:
+        """
+        (cache key, request fingerprint) for a request, or None to bypass
+
+        ``variant`` names anything besides the body that changes the
+        response, such as the response encoding or model version. A replayed
+        Idempotency-Key returns its original response regardless.
+        """
+        fingerprint = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if idempotency_key:
+            if len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+                raise IdempotencyConflict(
+                    f"Idempotency-Key exceeds {MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+                )
+            return f"idem:{endpoint}:{idempotency_key}", fingerprint
+        if self.by_content:
+            return f"body:{endpoint}:{variant}:{fingerprint}", fingerprint
+        return None
+
+    async def fetch(
+        self,
+        endpoint: str,
+        key: str,
+        fingerprint: str,
+        compute: Callable[[], Awaitable[Tuple[str, bytes]]],
+    ) -> Tuple[CachedResult, str]:
+        """
+        Cached result for key, computing and storing it on a miss
+
+        ``compute`` returns ``(media_type, body)``; exceptions it raises
+        (e.g. a 400 for an invalid batch) propagate and are not cached.
+        Returns the result and how it was found: hit, miss or coalesced.
+        """
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                result = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The computing request went away; compute it here instead
+                continue
+            CACHE_LOOKUPS.labels(endpoint, "coalesced").inc()
+            return self._check(result, fingerprint), "coalesced"
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._get(key)
+            outcome = "hit"
+            if result is None:
+                outcome = "miss"
+                media_type, body = await compute()
+                result = CachedResult(fingerprint, media_type, body)
+                await self._set(key, result)
+            future.set_result(result)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark retrieved: there may be no waiters to receive it
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        CACHE_LOOKUPS.labels(endpoint, outcome).inc()
+        return self._check(result, fingerprint), outcome
+
+    @staticmethod
+    def _check(result: CachedResult, fingerprint: str) -> CachedResult:
+        if result.fingerprint != fingerprint:
+            raise IdempotencyConflict(
+                "Idempotency-Key was already used with a different payload"
+            )
+        return result
+
+    async def _get(self, key: str) -> Optional[CachedResult]:
+        try:
+            data = await self.backend.get(key)
+        except Exception as exc:
+            logger.warning("Result cache lookup failed: %s", exc)
+            return None
+        return CachedResult.loads(data) if data is not None else None
+
+    async def _set(self, key: str, result: CachedResult) -> None:
+        try:
+            await self.backend.set(key, result.dumps())
+        except Exception as exc:
+            logger.warning("Result cache store failed: %s", exc)
@@ -0,0 +1,193 @@
+"""
+Columnar batch parsing for the data processing service
+
+Batches arrive as one array of values instead of a list of DataPoint
+objects, so they can be validated and processed as a single NumPy array.
+"""
+import json
+from typing import AsyncIterator, Optional, Tuple
+
+import numpy as np
+
+MAX_COLUMNAR_BATCH = 100_000
+
+# Generous per-point allowance for a value, an id and JSON/NDJSON framing
+MAX_COLUMNAR_BODY_BYTES = MAX_COLUMNAR_BATCH * 64
+
+JSON_CONTENT_TYPE = "application/json"
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class ColumnarParseError(ValueError):
+    """Raised when a columnar batch cannot be parsed"""
+
+    def __init__(self, message: str, status_code: int = 422):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _as_values(
+    values, ids=None, max_items: int = MAX_COLUMNAR_BATCH
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Convert raw value/id sequences into validated arrays"""
+    try:
+        array = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ColumnarParseError("values must be an array of numbers")
+
+    if array.ndim != 1:
+        raise ColumnarParseError("values must be a flat array of numbers")
+    if len(array) > max_items:
+        raise ColumnarParseError(
+            f"Maximum columnar batch size is {max_items} items", 413
+        )
+    if not np.isfinite(array).all():
+        raise ColumnarParseError("values must be finite numbers")
+
+    id_array = None
+    if ids is not None:
+        id_array = _as_ids(ids)
+        if id_array.shape != array.shape:
+            raise ColumnarParseError("ids and values must have the same length")
+
+    return array, id_array
+
+
+def _as_ids(ids) -> np.ndarray:
+    """
+    Convert ids to int64, accepting the same values as ``DataPoint.id``
+
+    Integers pass through; floats and numeric strings are only accepted
+    when they hold a whole number, so 1.0 becomes 1 but 1.9 is rejected
+    rather than truncated.
+    """
+    try:
+        raw = np.asarray(ids)
+    except (TypeError, ValueError):
+        raise ColumnarParseError("ids must be an array of integers")
+
+    if raw.dtype.kind in "iub":
+        return raw.astype(np.int64)
+
+    try:
+        as_float = raw.astype(np.float64)
+    except (TypeError, ValueError):
+        raise ColumnarParseError("ids must be an array of integers")
+
+    if not (np.isfinite(as_float).all() and (as_float == np.floor(as_float)).all()):
+        raise ColumnarParseError("ids must be an array of integers")
+
+    return as_float.astype(np.int64)
+
+
+def check_content_length(content_length: Optional[str], max_bytes: int) -> None:
+    """Refuse a body whose declared Content-Length is over max_bytes"""
+    if content_length is None:
+        return
+    try:
+        declared = int(content_length)
+    except ValueError:
+        raise ColumnarParseError("Invalid Content-Length header", 400)
+    if declared > max_bytes:
+        raise ColumnarParseError(f"Request body exceeds {max_bytes} bytes", 413)
+
+
+async def read_columnar_body(
+    chunks: AsyncIterator[bytes],
+    content_length: Optional[str] = None,
+    max_bytes: int = MAX_COLUMNAR_BODY_BYTES,
+) -> bytes:
+    """
+    Read a request body, rejecting it as soon as it exceeds the byte cap
+
+    A declared Content-Length over ``max_bytes`` is refused before anything
+    is read; otherwise the body is read until it passes the cap, so
+    oversized uploads are never buffered or parsed in full.
+    """
+    check_content_length(content_length, max_bytes)
+
+    body = bytearray()
+    async for chunk in chunks:
+        body += chunk
+        if len(body) > max_bytes:
+            raise ColumnarParseError(f"Request body exceeds {max_bytes} bytes", 413)
+
+    return bytes(body)
+
+
+def _parse_json(body: bytes, max_items: int):
+    """Parse {"values": [...], "ids": [...]}"""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise ColumnarParseError("Request body is not valid JSON", 400)
+
+    if not isinstance(payload, dict) or "values" not in payload:
+        raise ColumnarParseError('JSON body must be an object with a "values" array')
+
+    return _as_values(payload["values"], payload.get("ids"), max_items)
+
+
+def _parse_ndjson(body: bytes, max_items: int):
+    """Parse one {"value": ..., "id": ...} object per line"""
+    values = []
+    ids = []
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        if len(values) >= max_items:
+            raise ColumnarParseError(
+                f"Maximum columnar batch size is {max_items} items", 413
+            )
+        try:
+            record = json.loads(line)
+            values.append(record["value"])
+        except (ValueError, KeyError, TypeError):
+            raise ColumnarParseError(f"Invalid NDJSON record on line {line_number}")
+        ids.append(record.get("id"))
+
+    has_ids = any(i is not None for i in ids)
+    if has_ids and not all(i is not None for i in ids):
+        raise ColumnarParseError("Either every record or no record must have an id")
+
+    return _as_values(values, ids if has_ids else None, max_items)
+
+
+def _parse_arrow(body: bytes, max_items: int):
+    """Parse an Arrow IPC stream with a "value" column and optional "id" column"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ColumnarParseError("Arrow input requires pyarrow to be installed", 415)
+
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+        values = table.column("value").to_numpy()
+        ids = table.column("id").to_numpy() if "id" in table.column_names else None
+    except (pa.ArrowException, KeyError, ValueError):
+        raise ColumnarParseError('Arrow stream must contain a "value" column')
+
+    return _as_values(values, ids, max_items)
+
+
+def parse_columnar_body(
+    body: bytes, content_type: str, max_items: int = MAX_COLUMNAR_BATCH
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Parse a columnar batch into (values, ids)
+
+    Supports JSON ({"values": [...], "ids": [...]}), NDJSON (one
+    {"value": ..., "id": ...} per line) and, when pyarrow is installed,
+    Arrow IPC streams.
+    """
+    media_type = (content_type or JSON_CONTENT_TYPE).split(";")[0].strip().lower()
+
+    if media_type == JSON_CONTENT_TYPE:
+        return _parse_json(body, max_items)
+    if media_type in NDJSON_CONTENT_TYPES:
+        return _parse_ndjson(body, max_items)
+    if media_type == ARROW_CONTENT_TYPE:
+        return _parse_arrow(body, max_items)
+
+    raise ColumnarParseError(f"Unsupported content type: {media_type}", 415)
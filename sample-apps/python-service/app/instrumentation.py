@@ -0,0 +1,335 @@
+"""
+Request instrumentation for the data processing service
+
+Metrics are labelled by the matched route template (``/api/v1/jobs/{job_id}``
+rather than every concrete path), and requests that match no route share a
+single ``<unmatched>`` label, so scanner traffic cannot grow the number of
+series. Durations use a monotonic clock.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from typing import Callable, Optional
+
+from fastapi.routing import APIRoute
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client import multiprocess
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+BYTE_BUCKETS = (
+    64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216
+)
+
+REQUEST_COUNT = Counter(
+    'http_requests_total',
+    'Total HTTP requests',
+    ['method', 'endpoint', 'status']
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request duration in seconds',
+    ['method', 'endpoint']
+)
+EVENT_LOOP_LAG = Histogram(
+    'event_loop_lag_seconds',
+    'Delay between when an event loop timer was due and when it ran',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+REQUEST_SIZE = Histogram(
+    'http_request_size_bytes',
+    'HTTP request body size in bytes',
+    ['method', 'endpoint'],
+    buckets=BYTE_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'HTTP response body size in bytes',
+    ['method', 'endpoint'],
+    buckets=BYTE_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress',
+    'HTTP requests currently being handled',
+    ['method', 'endpoint'],
+    multiprocess_mode='livesum'
+)
+STAGE_DURATION = Histogram(
+    'http_request_stage_duration_seconds',
+    'Time spent in each stage of handling a request',
+    ['endpoint', 'stage']
+)
+REQUESTS_SHED = Counter(
+    'http_requests_shed_total',
+    'Requests rejected by admission control',
+    ['endpoint', 'reason']
+)
+STARTUP_DURATION = Gauge(
+    'app_startup_phase_seconds',
+    'Duration of each startup phase of the worker',
+    ['phase'],
+    multiprocess_mode='max'
+)
+CACHE_LOOKUPS = Counter(
+    'result_cache_lookups_total',
+    'Result cache lookups by outcome (hit, miss or coalesced)',
+    ['endpoint', 'result']
+)
+
+WEBSOCKET_CONNECTIONS = Gauge(
+    'websocket_connections',
+    'Open WebSocket connections',
+    ['endpoint'],
+    multiprocess_mode='livesum'
+)
+WEBSOCKET_CONNECTION_DURATION = Histogram(
+    'websocket_connection_duration_seconds',
+    'Lifetime of closed WebSocket connections',
+    ['endpoint'],
+    buckets=(1, 10, 60, 300, 900, 3600, 14400, 86400)
+)
+WEBSOCKET_FRAMES = Counter(
+    'websocket_frames_total',
+    'WebSocket frames by direction (in, out) and error replies',
+    ['endpoint', 'direction']
+)
+WEBSOCKET_POINTS = Counter(
+    'websocket_points_total',
+    'Data points processed over WebSocket connections',
+    ['endpoint']
+)
+WEBSOCKET_BYTES = Counter(
+    'websocket_bytes_total',
+    'WebSocket payload bytes by direction',
+    ['endpoint', 'direction']
+)
+
+
+async def monitor_event_loop_lag(interval: float = 0.1) -> None:
+    """
+    Observe event loop lag into EVENT_LOOP_LAG until cancelled
+
+    Sleeps ``interval`` seconds at a time and records how late each wake-up
+    was. A callback that blocks the loop (synchronous work in an async
+    handler) delays the wake-up by as long as it runs.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - start - interval))
+
+
+def metrics_registry():
+    """
+    Registry to expose on /metrics
+
+    Under gunicorn (see gunicorn.conf.py) each worker writes its metrics to
+    files in PROMETHEUS_MULTIPROC_DIR; a fresh registry collects and merges
+    them on every scrape. A single process just uses the default registry.
+    """
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+class StageTimings:
+    """Timestamps marking the stages of one request"""
+
+    __slots__ = ("route_start", "handler_start", "handler_end", "route_end")
+
+    def __init__(self):
+        self.route_start = None
+        self.handler_start = None
+        self.handler_end = None
+        self.route_end = None
+
+    def stages(self):
+        """(stage, seconds) pairs for every stage that completed"""
+        marks = (
+            ("validation", self.route_start, self.handler_start),
+            ("handler", self.handler_start, self.handler_end),
+            ("serialization", self.handler_end, self.route_end),
+        )
+        return [(stage, end - start) for stage, start, end in marks
+                if start is not None and end is not None]
+
+
+_stage_timings: contextvars.ContextVar[Optional[StageTimings]] = (
+    contextvars.ContextVar("stage_timings", default=None)
+)
+
+
+def _timed_call(call: Callable) -> Callable:
+    """Wrap an endpoint function so it marks the handler stage"""
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def timed(*args, **kwargs):
+            timings = _stage_timings.get()
+            if timings is None:
+                return await call(*args, **kwargs)
+            timings.handler_start = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                timings.handler_end = time.perf_counter()
+    else:
+        @functools.wraps(call)
+        def timed(*args, **kwargs):
+            timings = _stage_timings.get()
+            if timings is None:
+                return call(*args, **kwargs)
+            timings.handler_start = time.perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                timings.handler_end = time.perf_counter()
+    return timed
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    API route that reports in-flight requests and stage timings
+
+    Set as ``app.router.route_class`` before routes are declared. The route
+    handler covers body parsing, validation, the endpoint and response
+    serialisation, so wrapping it and the endpoint splits a request into
+    those stages.
+    """
+
+    def get_route_handler(self) -> Callable:
+        self.dependant.call = _timed_call(self.dependant.call)
+        handler = super().get_route_handler()
+        endpoint = self.path_format
+
+        async def instrumented_handler(request):
+            scope = request.scope
+            method = _method_label(scope["method"])
+            REQUESTS_IN_PROGRESS.labels(method=method, endpoint=endpoint).inc()
+            scope["instrumentation.in_progress"] = (method, endpoint)
+
+            timings = _stage_timings.get()
+            if timings is None:
+                return await handler(request)
+            timings.route_start = time.perf_counter()
+            response = await handler(request)
+            timings.route_end = time.perf_counter()
+            return response
+
+        return instrumented_handler
+
+
+def _method_label(method: str) -> str:
+    """Collapse non-standard methods into one label value"""
+    return method if method in KNOWN_METHODS else "OTHER"
+
+
+def route_label(scope) -> str:
+    """Route template a request matched, or UNMATCHED_ROUTE"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path_format
+    if scope.get("endpoint") is not None:
+        # Plain Starlette routes such as /docs have fixed paths
+        return scope["path"]
+    return UNMATCHED_ROUTE
+
+
+def _trace_exemplar(scope) -> Optional[dict]:
+    """Exemplar labels from a W3C traceparent header, if the request has one"""
+    for name, value in scope["headers"]:
+        if name == b"traceparent":
+            parts = value.decode("latin-1").split("-")
+            if len(parts) >= 3 and len(parts[1]) == 32:
+                return {"trace_id": parts[1]}
+            return None
+    return None
+
+
+class MetricsMiddleware:
+    """
+    Add Prometheus metrics to requests
+
+    Plain ASGI middleware rather than ``@app.middleware("http")``: that
+    wraps every response in a StreamingResponse which reads ``receive()``
+    to watch for disconnects, stealing body chunks from endpoints that read
+    the request while streaming the response.
+
+    Requests carrying a ``traceparent`` header attach their trace id as an
+    exemplar (exposed when /metrics is scraped as OpenMetrics). With
+    ``stage_timing`` on, validation/handler/serialization durations are
+    recorded per route. ``on_complete(endpoint, duration, status)`` is
+    called after every request.
+    """
+
+    def __init__(self, app, stage_timing: bool = False, on_complete=None):
+        self.app = app
+        self.stage_timing = stage_timing
+        self.on_complete = on_complete
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        request_size = 0
+        response_size = 0
+
+        async def receive_with_size():
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+            return message
+
+        async def send_with_status(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        timings = StageTimings() if self.stage_timing else None
+        token = _stage_timings.set(timings)
+        try:
+            await self.app(scope, receive_with_size, send_with_status)
+        finally:
+            _stage_timings.reset(token)
+            duration = time.perf_counter() - start
+            method = _method_label(scope["method"])
+            endpoint = route_label(scope)
+            exemplar = _trace_exemplar(scope)
+
+            in_progress = scope.get("instrumentation.in_progress")
+            if in_progress is not None:
+                REQUESTS_IN_PROGRESS.labels(*in_progress).dec()
+
+            REQUEST_COUNT.labels(
+                method=method,
+                endpoint=endpoint,
+                status=status_code
+            ).inc(exemplar=exemplar)
+
+            REQUEST_DURATION.labels(
+                method=method,
+                endpoint=endpoint
+            ).observe(duration, exemplar=exemplar)
+
+            REQUEST_SIZE.labels(method, endpoint).observe(request_size)
+            RESPONSE_SIZE.labels(method, endpoint).observe(response_size)
+
+            if timings is not None:
+                for stage, seconds in timings.stages():
+                    STAGE_DURATION.labels(endpoint, stage).observe(seconds)
+
+            if self.on_complete is not None:
+                self.on_complete(endpoint, duration, status_code)
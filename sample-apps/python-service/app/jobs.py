@@ -0,0 +1,266 @@
+"""
+Asynchronous jobs for datasets too large for a single request
+
+A job's request body is spooled to disk as it arrives; parsing and
+processing then run in a process pool, one chunk per task, so the event
+loop only moves bytes and bookkeeping and keeps serving other requests.
+
+Each job has a directory under the spool directory holding:
+- ``body``: the raw upload (deleted once parsed)
+- ``values.npy`` / ``ids.npy``: the parsed input
+- ``processed.npy``: results, written chunk by chunk by the workers
+- ``status.json``: progress, readable by every server worker process
+"""
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import AsyncIterator, Dict, Optional
+
+import numpy as np
+
+from app.columnar import ColumnarParseError, check_content_length, parse_columnar_body
+
+DEFAULT_SPOOL_DIR = "/tmp/jobs"
+DEFAULT_MAX_POINTS = 10_000_000
+DEFAULT_CHUNK_SIZE = 250_000
+DEFAULT_TTL_SECONDS = 3600
+
+# Generous per-point allowance for a value, an id and JSON/NDJSON framing
+BYTES_PER_POINT = 64
+
+MAX_RESULTS_PAGE = 100_000
+
+
+def parse_job_input(job_dir: str, content_type: str, max_points: int) -> Dict:
+    """
+    Worker task: parse the spooled body into .npy arrays
+
+    Also preallocates processed.npy so chunk tasks can write their slices
+    into it independently.
+    """
+    body_path = os.path.join(job_dir, "body")
+    with open(body_path, "rb") as f:
+        body = f.read()
+    values, ids = parse_columnar_body(body, content_type, max_points)
+    del body
+    os.remove(body_path)
+
+    np.save(os.path.join(job_dir, "values.npy"), values)
+    if ids is not None:
+        np.save(os.path.join(job_dir, "ids.npy"), ids)
+    processed = np.lib.format.open_memmap(
+        os.path.join(job_dir, "processed.npy"),
+        mode="w+",
+        dtype=np.float64,
+        shape=values.shape,
+    )
+    del processed
+    return {"total": len(values), "has_ids": ids is not None}
+
+
+def process_job_chunk(job_dir: str, start: int, stop: int) -> int:
+    """Worker task: process values[start:stop] into processed.npy"""
+    values = np.load(os.path.join(job_dir, "values.npy"), mmap_mode="r")
+    processed = np.load(os.path.join(job_dir, "processed.npy"), mmap_mode="r+")
+    np.multiply(values[start:stop], 2.0, out=processed[start:stop])
+    processed.flush()
+    return stop - start
+
+
+class JobManager:
+    """Accept, run and report on background processing jobs"""
+
+    def __init__(
+        self,
+        spool_dir: str = DEFAULT_SPOOL_DIR,
+        max_workers: Optional[int] = None,
+        max_points: int = DEFAULT_MAX_POINTS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ):
+        self.spool_dir = spool_dir
+        self.max_workers = max_workers
+        self.max_points = max_points
+        self.max_bytes = max_points * BYTES_PER_POINT
+        self.chunk_size = chunk_size
+        self.ttl_seconds = ttl_seconds
+        self._executor = None
+        self._tasks: set = set()
+
+    def _pool(self):
+        """Process pool, started on first use"""
+        if self._executor is None:
+            # Imported here so startup does not pay for multiprocessing
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn rather than fork: the server process runs threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, abandoning queued chunks"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, job_id)
+
+    def _write_status(self, job_id: str, status: Dict) -> None:
+        """Atomically replace a job's status file"""
+        path = os.path.join(self._job_dir(job_id), "status.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(status, f)
+        os.replace(tmp_path, path)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Current status of a job, or None if unknown or expired"""
+        try:
+            uuid.UUID(hex=job_id)
+        except ValueError:
+            return None
+        try:
+            with open(os.path.join(self._job_dir(job_id), "status.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    async def submit(
+        self,
+        chunks: AsyncIterator[bytes],
+        content_type: Optional[str],
+        content_length: Optional[str] = None,
+    ) -> Dict:
+        """Spool a request body to disk and start processing it"""
+        check_content_length(content_length, self.max_bytes)
+        self.expire()
+
+        job_id = uuid.uuid4().hex
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir)
+
+        size = 0
+        try:
+            with open(os.path.join(job_dir, "body"), "wb") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ColumnarParseError(
+                            f"Request body exceeds {self.max_bytes} bytes", 413
+                        )
+                    f.write(chunk)
+        except BaseException:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        status = {
+            "job_id": job_id,
+            "status": "queued",
+            "total": None,
+            "processed": 0,
+            "progress": 0.0,
+            "created_at": time.time(),
+            "finished_at": None,
+            "error": None,
+        }
+        self._write_status(job_id, status)
+
+        task = asyncio.ensure_future(self._run(job_id, status, content_type))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return status
+
+    async def _run(self, job_id: str, status: Dict, content_type: Optional[str]):
+        """Parse a job, then fan its chunks out to the process pool"""
+        loop = asyncio.get_running_loop()
+        pool = self._pool()
+        job_dir = self._job_dir(job_id)
+
+        try:
+            status["status"] = "parsing"
+            self._write_status(job_id, status)
+            parsed = await loop.run_in_executor(
+                pool, parse_job_input, job_dir, content_type, self.max_points
+            )
+
+            total = parsed["total"]
+            status.update(status="running", total=total, has_ids=parsed["has_ids"])
+            self._write_status(job_id, status)
+
+            futures = [
+                loop.run_in_executor(
+                    pool, process_job_chunk, job_dir, start,
+                    min(start + self.chunk_size, total)
+                )
+                for start in range(0, total, self.chunk_size)
+            ]
+            for future in asyncio.as_completed(futures):
+                status["processed"] += await future
+                status["progress"] = status["processed"] / total
+                self._write_status(job_id, status)
+
+            status.update(status="completed", progress=1.0)
+        except ColumnarParseError as exc:
+            status.update(status="failed", error=str(exc))
+        except asyncio.CancelledError:
+            status.update(status="failed", error="Server shut down")
+            raise
+        except Exception as exc:
+            status.update(status="failed", error=f"Processing failed: {exc}")
+        finally:
+            status["finished_at"] = time.time()
+            self._write_status(job_id, status)
+
+    def results(self, job_id: str, offset: int = 0, limit: int = MAX_RESULTS_PAGE):
+        """A page of a completed job's results as columnar arrays"""
+        job_dir = self._job_dir(job_id)
+        values = np.load(os.path.join(job_dir, "values.npy"), mmap_mode="r")
+        processed = np.load(os.path.join(job_dir, "processed.npy"), mmap_mode="r")
+        stop = min(offset + limit, len(values))
+
+        page = {
+            "job_id": job_id,
+            "offset": offset,
+            "count": max(stop - offset, 0),
+            "total": len(values),
+            "original_values": np.array(values[offset:stop]),
+            "processed_values": np.array(processed[offset:stop]),
+        }
+        ids_path = os.path.join(job_dir, "ids.npy")
+        if os.path.exists(ids_path):
+            page["ids"] = np.array(np.load(ids_path, mmap_mode="r")[offset:stop])
+        return page
+
+    def expire(self) -> None:
+        """
+        Delete jobs that finished more than ttl_seconds ago
+
+        Jobs whose status has not changed for that long (an interrupted
+        upload, or a job orphaned by a restart) are removed as well.
+        """
+        if not os.path.isdir(self.spool_dir):
+            return
+        cutoff = time.time() - self.ttl_seconds
+        for entry in os.scandir(self.spool_dir):
+            if not entry.is_dir():
+                continue
+            status = self.status(entry.name)
+            finished_at = status.get("finished_at") if status else None
+            if finished_at is None:
+                status_path = os.path.join(entry.path, "status.json")
+                try:
+                    finished_at = os.stat(status_path).st_mtime
+                except OSError:
+                    finished_at = entry.stat().st_mtime
+            if finished_at < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
@@ -2,22 +2,115 @@
 Python Data Processing Service
 FastAPI application for ML-based DevOps Security Research
 """
+import asyncio
+import hmac
 import os
 import time
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from typing import List, Optional, Union
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
-from pydantic import BaseModel, Field
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from prometheus_client.exposition import choose_encoder
+
+from app.admission import AdmissionMiddleware
+from app.analytics import StreamingAnalytics
+from app.anomaly import AnomalyDetector, series_key
+from app.cache import IdempotencyConflict, MemoryBackend, RedisBackend, ResultCache
+from app.columnar import (
+    ColumnarParseError,
+    parse_columnar_body,
+    read_columnar_body,
+)
+from app.instrumentation import (
+    InstrumentedRoute,
+    MetricsMiddleware,
+    metrics_registry,
+    monitor_event_loop_lag,
+    route_label,
+)
+from app.jobs import MAX_RESULTS_PAGE, JobManager
+from app.pipeline import DEFAULT_PIPELINE, PipelineError, compile_pipeline
+from app.profiling import MAX_PROFILE_SECONDS, Profiler, ProfilerBusy
+from app.scoring import BatchingScorer
+from app.serialization import (
+    dumps_json,
+    encode_response,
+    error_content,
+    result_record,
+    use_fast_path,
+    wants_msgpack,
+)
+from app.server import job_worker_count
+from app.startup import (
+    StartupTracker,
+    load_openapi_schema,
+    warm_up_in_background,
+)
+from app.streaming import (
+    NDJSON_MEDIA_TYPE,
+    STREAM_CHUNK_SIZE,
+    DuplexStreamingResponse,
+    LineTooLongError,
+    iter_ndjson_lines,
+)
+from app.websocket import (
+    FrameError,
+    decode_values,
+    encode_values,
+    serve_channel,
+)
+from app.windows import WindowAggregator
+
+# Startup phases are timed against a budget and reported on /ready
+startup = StartupTracker(float(os.getenv("STARTUP_BUDGET_SECONDS", "3")))
+startup.mark("imports")
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Warm up and watch event loop lag in the background; stop job workers on
+    shutdown
+    """
+    startup.mark("server")
+    warm_up_task = asyncio.ensure_future(warm_up_in_background(app, startup))
+    lag_task = asyncio.ensure_future(monitor_event_loop_lag(
+        float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.1"))
+    ))
+    yield
+    warm_up_task.cancel()
+    lag_task.cancel()
+    job_manager.shutdown()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Python Data Processing Service",
     description="Data processing and analytics service for DevOps research",
     version="1.0.0",
+    lifespan=lifespan,
+)
+# Label metrics by route template and time request stages
+app.router.route_class = InstrumentedRoute
+
+# Admission control: shed excess load before reading bodies. Added before
+# CORS so rejections still carry CORS headers
+def optional_float(name: str) -> Optional[float]:
+    """Float environment variable, or None if unset"""
+    value = os.getenv(name)
+    return float(value) if value else None
+
+app.add_middleware(
+    AdmissionMiddleware,
+    routes=app.router.routes,
+    client_rate=float(os.getenv("ADMISSION_CLIENT_RATE", "0")),
+    client_burst=optional_float("ADMISSION_CLIENT_BURST"),
+    global_rate=float(os.getenv("ADMISSION_GLOBAL_RATE", "0")),
+    global_burst=optional_float("ADMISSION_GLOBAL_BURST"),
+    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "100")),
+    client_header=os.getenv("ADMISSION_CLIENT_HEADER") or None,
 )
 
 # CORS middleware
@@ -29,18 +122,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Prometheus metrics
-REQUEST_COUNT = Counter(
-    'http_requests_total',
-    'Total HTTP requests',
-    ['method', 'endpoint', 'status']
-)
-REQUEST_DURATION = Histogram(
-    'http_request_duration_seconds',
-    'HTTP request duration in seconds',
-    ['method', 'endpoint']
-)
-
 # Pydantic models
 class DataPoint(BaseModel):
     """Data point for processing"""
@@ -55,6 +136,7 @@ class ProcessingResult(BaseModel):
     processed_value: float
     operation: str
     timestamp: datetime
+    prediction: Optional[float] = None
 
 class HealthResponse(BaseModel):
     """Health check response"""
@@ -63,29 +145,92 @@ class HealthResponse(BaseModel):
     uptime_seconds: float
     environment: str
 
+class AnomalyScore(BaseModel):
+    """Anomaly score for one data point"""
+    series: str
+    value: float
+    score: float
+    is_anomaly: bool
+    ewma_z: float
+    robust_z: float
+    seasonal_z: float
+
 # Application state
 start_time = time.time()
+anomaly_detector = AnomalyDetector(
+    threshold=float(os.getenv("ANOMALY_THRESHOLD", "4.0")),
+    warmup=int(os.getenv("ANOMALY_WARMUP", "30")),
+)
+MAX_ANOMALY_BATCH = 10_000
+analytics = StreamingAnalytics()
+window_aggregator = WindowAggregator(
+    pane_seconds=int(os.getenv("WINDOW_PANE_SECONDS", "60")),
+    retention_panes=int(os.getenv("WINDOW_RETENTION_PANES", "120")),
+    allowed_lateness=float(os.getenv("WINDOW_ALLOWED_LATENESS", "120")),
+    max_series=int(os.getenv("WINDOW_MAX_SERIES", "1000")),
+)
+MAX_WINDOW_BATCH = 10_000
+
+# Large datasets are processed in the background by a process pool
+job_manager = JobManager(
+    spool_dir=os.getenv("JOB_SPOOL_DIR", "/tmp/jobs"),
+    max_workers=job_worker_count(),
+    max_points=int(os.getenv("JOB_MAX_POINTS", "10000000")),
+)
+
+# Requests to these routes feed the analytics summary
+ANALYTICS_PATHS = {
+    "/api/v1/process",
+    "/api/v1/batch-process",
+    "/api/v1/batch-process/columnar",
+    "/api/v1/stream-process",
+}
+
+# Optional model scoring; requests are micro-batched across callers
+model_scorer = (
+    BatchingScorer(
+        os.environ["MODEL_PATH"],
+        max_batch=int(os.getenv("MODEL_MAX_BATCH", "4096")),
+        max_wait_ms=float(os.getenv("MODEL_MAX_WAIT_MS", "5")),
+        reload_interval=float(os.getenv("MODEL_RELOAD_INTERVAL", "5")),
+    )
+    if os.getenv("MODEL_PATH")
+    else None
+)
+
+# Cache of processing results, keyed by Idempotency-Key or request content
+def create_result_cache() -> Optional[ResultCache]:
+    """Result cache configured from the environment, or None if disabled"""
+    backend_name = os.getenv("RESULT_CACHE", "memory").lower()
+    ttl = float(os.getenv("RESULT_CACHE_TTL", "300"))
+    if backend_name == "off":
+        return None
+    if backend_name == "redis":
+        backend = RedisBackend(
+            os.getenv("RESULT_CACHE_URL", "redis://localhost:6379/0"), ttl
+        )
+    else:
+        backend = MemoryBackend(
+            ttl,
+            max_entries=int(os.getenv("RESULT_CACHE_SIZE", "10000")),
+            max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+    by_content = os.getenv("RESULT_CACHE_BY_CONTENT", "false").lower() == "true"
+    return ResultCache(backend, by_content=by_content)
+
+result_cache = create_result_cache()
 
 # Middleware for metrics
-@app.middleware("http")
-async def add_metrics(request, call_next):
-    """Add Prometheus metrics to requests"""
-    start = time.time()
-    response = await call_next(request)
-    duration = time.time() - start
-
-    REQUEST_COUNT.labels(
-        method=request.method,
-        endpoint=request.url.path,
-        status=response.status_code
-    ).inc()
-
-    REQUEST_DURATION.labels(
-        method=request.method,
-        endpoint=request.url.path
-    ).observe(duration)
+def record_analytics(endpoint, duration, status_code):
+    """Feed processing requests into the analytics summary"""
+    if endpoint in ANALYTICS_PATHS:
+        analytics.record_request(duration, status_code >= 400)
 
-    return response
+app.add_middleware(
+    MetricsMiddleware,
+    stage_timing=os.getenv("METRICS_STAGE_TIMING", "false").lower() == "true",
+    on_complete=record_analytics,
+)
 
 # Routes
 @app.get("/", tags=["Root"])
@@ -113,30 +258,85 @@ async def health_check():
         environment=os.getenv("ENVIRONMENT", "development")
     )
 
-@app.post("/api/v1/process", response_model=ProcessingResult, tags=["Processing"])
-async def process_data(data: DataPoint):
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    """
+    Readiness check
+
+    Returns 503 until the worker has finished warming up, then 200. Unlike
+    `/health`, which only shows the process is alive, this is meant for the
+    readiness probe. It also reports the measured startup phases.
+    """
+    report = startup.report()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if startup.ready
+        else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ready" if startup.ready else "warming_up", **report},
+    )
+
+@app.post(
+    "/api/v1/process",
+    response_model=ProcessingResult,
+    response_model_exclude_none=True,
+    tags=["Processing"],
+)
+async def process_data(
+    data: DataPoint, request: Request, pipeline: str = DEFAULT_PIPELINE
+):
     """
     Process a single data point
 
     - **value**: Numeric value to process
     - **metadata**: Optional metadata dictionary
+    - **pipeline**: Operations to apply, e.g. `scale(3)|clip(0,100)`
+
+    When a model is configured (`MODEL_PATH`), the result includes its
+    `prediction`. Send `Accept: application/msgpack` for a msgpack response,
+    and an `Idempotency-Key` header to make retries safe.
     """
-    # Simple processing: multiply by 2 (placeholder for real processing)
-    processed = data.value * 2.0
+    steps = get_pipeline(pipeline)
 
-    return ProcessingResult(
-        original_value=data.value,
-        processed_value=processed,
-        operation="multiply_by_2",
-        timestamp=datetime.utcnow()
-    )
+    async def compute():
+        processed = run_pipeline(steps, [data.value])
+
+        prediction = None
+        if model_scorer is not None:
+            prediction = float((await model_scorer.score([data.value]))[0])
+
+        return result_record(
+            data.value,
+            float(processed[0]),
+            steps.name,
+            datetime.utcnow().isoformat(),
+            prediction,
+        )
+
+    response = await cached_response(request, compute)
+    # Recorded for cache hits too: each request is a point the client sent
+    analytics.record_value(data.value, data.id)
+    return response
 
-@app.post("/api/v1/batch-process", response_model=List[ProcessingResult], tags=["Processing"])
-async def batch_process(data_points: List[DataPoint]):
+@app.post(
+    "/api/v1/batch-process",
+    response_model=List[ProcessingResult],
+    response_model_exclude_none=True,
+    tags=["Processing"],
+)
+async def batch_process(
+    data_points: List[DataPoint], request: Request, pipeline: str = DEFAULT_PIPELINE
+):
     """
     Process multiple data points in batch
 
     - **data_points**: List of data points to process
+    - **pipeline**: Operations to apply, e.g. `zscore|rolling_mean(5)`. Steps
+      that look across points (`diff`, `zscore`, `rolling_mean`) run over the
+      batch in order.
+
+    When a model is configured, the batch is scored together with other
+    concurrent requests in one model call. All results share one timestamp.
+    Send `Accept: application/msgpack` for a msgpack response, and an
+    `Idempotency-Key` header to make retries safe.
     """
     if len(data_points) > 100:
         raise HTTPException(
@@ -144,58 +344,485 @@ async def batch_process(data_points: List[DataPoint]):
             detail="Maximum batch size is 100 items"
         )
 
-    results = []
-    for point in data_points:
-        processed = point.value * 2.0
-        results.append(ProcessingResult(
-            original_value=point.value,
-            processed_value=processed,
-            operation="multiply_by_2",
-            timestamp=datetime.utcnow()
-        ))
+    steps = get_pipeline(pipeline)
+
+    async def compute():
+        values = [point.value for point in data_points]
+        processed = run_pipeline(steps, values).tolist()
+
+        predictions = [None] * len(data_points)
+        if model_scorer is not None and data_points:
+            predictions = (await model_scorer.score(values)).tolist()
+
+        timestamp = datetime.utcnow().isoformat()
+        return [
+            result_record(value, result, steps.name, timestamp, prediction)
+            for value, result, prediction in zip(values, processed, predictions)
+        ]
+
+    response = await cached_response(request, compute)
+    analytics.record_values(
+        [point.value for point in data_points],
+        [point.id for point in data_points if point.id is not None],
+    )
+    return response
+
+def get_pipeline(spec: str):
+    """Compiled pipeline for a request, or a 400 if it is invalid"""
+    try:
+        return compile_pipeline(spec)
+    except PipelineError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+def run_pipeline(steps, values):
+    """Run a pipeline over a batch, or raise a 400 if it cannot be applied"""
+    try:
+        return steps(values)
+    except PipelineError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+async def cached_response(request: Request, compute):
+    """
+    Respond with compute()'s results, through the result cache if enabled
+
+    Cached responses are stored encoded, so they always take the fast
+    encoding path. Without the cache, results go through response_model
+    validation unless the fast path is on.
+    """
+    accept = request.headers.get("accept")
+    if result_cache is not None:
+        endpoint = route_label(request.scope)
+        variant = "msgpack" if wants_msgpack(accept) else "json"
+        if model_scorer is not None:
+            variant += f":{model_scorer.path}:{model_scorer.version}"
+        try:
+            lookup = result_cache.key_for(
+                endpoint,
+                request.url.query.encode() + b"\n" + await request.body(),
+                request.headers.get("idempotency-key"),
+                variant,
+            )
+            if lookup is not None:
+                async def render():
+                    response = encode_response(await compute(), accept)
+                    return response.media_type, response.body
+
+                result, outcome = await result_cache.fetch(endpoint, *lookup, render)
+                return Response(
+                    result.body,
+                    media_type=result.media_type,
+                    headers={"X-Cache": outcome.upper()},
+                )
+        except IdempotencyConflict as exc:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)
+            )
+
+    content = await compute()
+    if use_fast_path(accept):
+        return encode_response(content, accept)
+    return content
+
+@app.post("/api/v1/batch-process/columnar", tags=["Processing"])
+async def batch_process_columnar(request: Request, pipeline: str = DEFAULT_PIPELINE):
+    """
+    Process a columnar batch in a single vectorised operation
+
+    Accepts up to 100,000 values as:
+    - **application/json**: `{"values": [...], "ids": [...]}` (ids optional)
+    - **application/x-ndjson**: one `{"value": ..., "id": ...}` per line
+    - **application/vnd.apache.arrow.stream**: Arrow IPC with `value`/`id` columns
+
+    Returns columnar output: parallel `original_values` and
+    `processed_values` arrays, as JSON or (with `Accept: application/msgpack`)
+    msgpack. `pipeline` names the operations to apply, as on
+    `/api/v1/batch-process`.
+    """
+    steps = get_pipeline(pipeline)
+    try:
+        body = await read_columnar_body(
+            request.stream(), request.headers.get("content-length")
+        )
+        values, ids = parse_columnar_body(body, request.headers.get("content-type"))
+    except ColumnarParseError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+
+    processed = run_pipeline(steps, values)
+    analytics.record_values(values, ids)
+
+    result = {
+        "operation": steps.name,
+        "count": len(values),
+        "original_values": values,
+        "processed_values": processed,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+    if ids is not None:
+        result["ids"] = ids
+
+    # Encode the arrays directly rather than walking them with jsonable_encoder
+    return encode_response(result, request.headers.get("accept"))
+
+@app.post("/api/v1/stream-process", tags=["Processing"])
+async def stream_process(request: Request):
+    """
+    Process an NDJSON stream of data points incrementally
+
+    The request body is read one chunk at a time, one DataPoint per line,
+    and results are streamed back as NDJSON (one ProcessingResult per line)
+    every 1000 records, each flush sharing one timestamp. Memory use stays
+    bounded regardless of payload size. Invalid lines produce an
+    `{"line": n, "error": ...}` record instead of aborting the stream.
+    """
+    async def generate(chunks):
+        output = []
+        timestamp = datetime.utcnow().isoformat()
+
+        try:
+            async for line_number, line in iter_ndjson_lines(chunks):
+                try:
+                    point = DataPoint.model_validate_json(line)
+                except ValidationError as exc:
+                    error = exc.errors()[0]["msg"]
+                    output.append(dumps_json({"line": line_number, "error": error}))
+                else:
+                    analytics.record_value(point.value, point.id)
+                    output.append(dumps_json(result_record(
+                        point.value, point.value * 2.0, "multiply_by_2", timestamp
+                    )))
+
+                if len(output) >= STREAM_CHUNK_SIZE:
+                    yield b"\n".join(output) + b"\n"
+                    output = []
+                    timestamp = datetime.utcnow().isoformat()
+        except LineTooLongError as exc:
+            output.append(dumps_json({"error": str(exc)}))
+
+        if output:
+            yield b"\n".join(output) + b"\n"
+
+    return DuplexStreamingResponse(request, generate, media_type=NDJSON_MEDIA_TYPE)
+
+# Text frames on the WebSocket channel hold one DataPoint or a list of them
+data_points_adapter = TypeAdapter(Union[DataPoint, List[DataPoint]])
+WS_MAX_FRAME_POINTS = int(os.getenv("WS_MAX_FRAME_POINTS", "10000"))
+WS_MAX_PENDING_FRAMES = int(os.getenv("WS_MAX_PENDING_FRAMES", "16"))
+
+@app.websocket("/api/v1/ws/process")
+async def process_channel(websocket: WebSocket, pipeline: str = DEFAULT_PIPELINE):
+    """
+    Process a continuous stream of points over one WebSocket connection
+
+    Text frames carry a DataPoint or a list of them and are answered with
+    ProcessingResult JSON of the same shape. Binary frames carry packed
+    little-endian float64 values (8 bytes per point) and are answered with
+    the processed values packed the same way, then the predictions when a
+    model is configured. Each frame is processed like an
+    `/api/v1/batch-process` request, in order; a bad frame gets an
+    `{"frame": n, "error": ...}` reply and the connection stays open.
+    """
+    try:
+        steps = compile_pipeline(pipeline)
+    except PipelineError as exc:
+        await websocket.close(code=1008, reason=str(exc)[:120])
+        return
+
+    async def handle(message):
+        binary = message.get("bytes") is not None
+        if binary:
+            values = decode_values(message["bytes"], WS_MAX_FRAME_POINTS)
+            ids = None
+        else:
+            try:
+                parsed = data_points_adapter.validate_json(message.get("text") or "")
+            except ValidationError as exc:
+                raise FrameError(exc.errors()[0]["msg"])
+            points = parsed if isinstance(parsed, list) else [parsed]
+            if len(points) > WS_MAX_FRAME_POINTS:
+                raise FrameError(f"Frame exceeds {WS_MAX_FRAME_POINTS} points")
+            values = [point.value for point in points]
+            ids = [point.id for point in points if point.id is not None]
+
+        try:
+            processed = steps(values)
+        except PipelineError as exc:
+            raise FrameError(str(exc))
+        analytics.record_values(values, ids)
+
+        predictions = None
+        if model_scorer is not None and len(values):
+            predictions = await model_scorer.score(values)
+
+        if binary:
+            columns = (processed,) if predictions is None else (processed, predictions)
+            return len(values), encode_values(*columns)
+
+        timestamp = datetime.utcnow().isoformat()
+        records = [
+            result_record(
+                value, float(result), steps.name, timestamp,
+                None if predictions is None else float(predictions[i]),
+            )
+            for i, (value, result) in enumerate(zip(values, processed))
+        ]
+        reply = records if isinstance(parsed, list) else records[0]
+        return len(values), dumps_json(reply).decode()
+
+    await serve_channel(
+        websocket, handle, "/api/v1/ws/process", WS_MAX_PENDING_FRAMES
+    )
+
+@app.post(
+    "/api/v1/jobs", status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"]
+)
+async def create_job(request: Request):
+    """
+    Submit a large dataset for background processing
+
+    Takes the same body formats as `/api/v1/batch-process/columnar`, up to
+    10 million values by default (`JOB_MAX_POINTS`). The body is spooled to
+    disk and processed in a process pool; poll the returned `status_url`
+    and fetch results from `results_url` once the job completes.
+    """
+    try:
+        job = await job_manager.submit(
+            request.stream(),
+            request.headers.get("content-type"),
+            request.headers.get("content-length"),
+        )
+    except ColumnarParseError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+
+    job_url = f"/api/v1/jobs/{job['job_id']}"
+    return {**job, "status_url": job_url, "results_url": f"{job_url}/results"}
 
-    return results
+@app.get("/api/v1/jobs/{job_id}", tags=["Jobs"])
+async def get_job(job_id: str):
+    """Status and progress of a background job"""
+    job = job_manager.status(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+    return job
+
+@app.get("/api/v1/jobs/{job_id}/results", tags=["Jobs"])
+async def get_job_results(
+    job_id: str, request: Request, offset: int = 0, limit: int = 10_000
+):
+    """
+    A page of a completed job's results
+
+    Returns columnar `original_values`/`processed_values` (and `ids`, if the
+    input had them) for `offset` .. `offset + limit` (at most 100,000).
+    """
+    job = job_manager.status(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+    if job["status"] != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job['status']}, results are not available"
+        )
+    if offset < 0 or not 0 < limit <= MAX_RESULTS_PAGE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"offset must be >= 0 and limit between 1 and {MAX_RESULTS_PAGE}"
+        )
+
+    return encode_response(
+        job_manager.results(job_id, offset, limit), request.headers.get("accept")
+    )
+
+@app.get("/api/v1/model", tags=["Processing"])
+async def model_info():
+    """Loaded scoring model and micro-batching statistics"""
+    if model_scorer is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No model configured; set MODEL_PATH"
+        )
+    return model_scorer.info()
+
+@app.post(
+    "/api/v1/anomaly/score",
+    response_model=Union[List[AnomalyScore], AnomalyScore],
+    tags=["Anomaly Detection"],
+)
+async def score_anomalies(
+    data: Union[List[DataPoint], DataPoint], series_key_field: Optional[str] = None
+):
+    """
+    Score data points against online per-series baselines
+
+    Accepts a single data point or a list of up to 10,000. Points are
+    grouped into series by the `series_key_field` metadata field when given,
+    otherwise by `id`. Each point is scored before it updates its series,
+    and is flagged once the series is warmed up and the score passes the
+    threshold.
+    """
+    points = data if isinstance(data, list) else [data]
+    if len(points) > MAX_ANOMALY_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum batch size is {MAX_ANOMALY_BATCH} items"
+        )
+
+    now = time.time()
+    scores = [
+        anomaly_detector.score(
+            series_key(point.id, point.metadata, series_key_field),
+            point.value,
+            point.timestamp.timestamp() if point.timestamp else now,
+        )
+        for point in points
+    ]
+
+    return scores if isinstance(data, list) else scores[0]
+
+@app.post("/api/v1/windows/ingest", tags=["Windows"])
+async def ingest_windows(
+    data: Union[List[DataPoint], DataPoint], series_key_field: Optional[str] = None
+):
+    """
+    Add data points to event-time windows
+
+    Accepts a single data point or a list of up to 10,000. Points are
+    grouped into series like `/api/v1/anomaly/score` and placed by their
+    `timestamp` (arrival time if missing). Points behind their series'
+    watermark are counted as `late` and dropped; points stamped more than
+    five minutes ahead of the clock are counted as `future` and dropped.
+    """
+    points = data if isinstance(data, list) else [data]
+    if len(points) > MAX_WINDOW_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum batch size is {MAX_WINDOW_BATCH} items"
+        )
+
+    now = time.time()
+    counts = {"accepted": 0, "late": 0, "future": 0}
+    for point in points:
+        outcome = window_aggregator.add(
+            series_key(point.id, point.metadata, series_key_field),
+            point.value,
+            point.timestamp.timestamp() if point.timestamp else now,
+            now,
+        )
+        counts[outcome] += 1
+    return counts
+
+@app.get("/api/v1/windows/{series}", tags=["Windows"])
+async def get_windows(
+    series: str,
+    size: int = 300,
+    slide: Optional[int] = None,
+    q: List[float] = Query(default=[0.5, 0.95, 0.99]),
+    limit: int = Query(default=60, ge=1, le=1000),
+):
+    """
+    Window aggregates of one series
+
+    Returns the latest `limit` non-empty windows of `size` seconds, oldest
+    first, each with count, sum, mean, min, max and the `q` quantiles.
+    Windows are tumbling unless a shorter `slide` is given; both must be
+    multiples of the pane length (`WINDOW_PANE_SECONDS`, default 60).
+    Windows ending at or before the watermark are `final`.
+    """
+    if any(not 0 <= quantile <= 1 for quantile in q):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Quantiles must be between 0 and 1"
+        )
+    try:
+        result = window_aggregator.windows(series, size, slide, q, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Series not found"
+        )
+    return result
 
 @app.get("/api/v1/analytics/summary", tags=["Analytics"])
 async def get_analytics_summary():
     """
     Get analytics summary
 
-    Returns summary statistics (mock data for demonstration)
+    Live aggregates over the processing endpoints since startup: request
+    and point counts, success/error rates, latency and value quantiles
+    (t-digest), distinct ids (HyperLogLog) and sliding 1h/24h windows.
+    Reading it costs O(buckets) regardless of traffic.
     """
-    return {
-        "total_processed": 1523,
-        "average_processing_time_ms": 12.5,
-        "success_rate": 0.987,
-        "last_24h": {
-            "processed": 342,
-            "errors": 5,
-            "avg_value": 45.2
-        },
-        "timestamp": datetime.utcnow()
-    }
+    summary = analytics.summary()
+    summary["timestamp"] = datetime.utcnow()
+    return summary
 
 @app.get("/metrics", response_class=PlainTextResponse, tags=["Monitoring"])
-async def metrics():
+async def metrics(request: Request):
     """
     Prometheus metrics endpoint
 
-    Exposes application metrics in Prometheus format
+    Exposes application metrics in Prometheus format, or in OpenMetrics
+    format (which includes trace exemplars) when the scraper asks for it.
+    Under gunicorn the metrics of all workers are merged.
+    """
+    encoder, content_type = choose_encoder(request.headers.get("accept"))
+    return PlainTextResponse(
+        content=encoder(metrics_registry()), media_type=content_type
+    )
+
+# On-demand profiling; the endpoint answers 404 unless PROFILE_TOKEN is set
+profile_token = os.getenv("PROFILE_TOKEN") or None
+profiler = Profiler(float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005")))
+
+@app.get("/debug/profile", response_class=PlainTextResponse, include_in_schema=False)
+async def debug_profile(
+    request: Request,
+    seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+):
     """
+    Sample every thread's stack for `seconds` and return collapsed stacks
+
+    Requires the `X-Profile-Token` header to match `PROFILE_TOKEN`. The
+    output feeds straight into flamegraph.pl, speedscope or inferno. Under
+    gunicorn only the worker that serves the request is profiled, and one
+    profile runs at a time per worker.
+    """
+    if profile_token is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    supplied = request.headers.get("x-profile-token", "")
+    if not hmac.compare_digest(supplied.encode(), profile_token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid profile token"
+        )
+    try:
+        sampler = profiler.begin()
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        collapsed = await profiler.end(sampler)
     return PlainTextResponse(
-        content=generate_latest(),
-        media_type=CONTENT_TYPE_LATEST
+        collapsed,
+        headers={"Content-Disposition": 'inline; filename="profile.folded"'},
     )
 
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Handle HTTP exceptions"""
-    return {
-        "error": exc.detail,
-        "status_code": exc.status_code,
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=error_content(exc.status_code, exc.detail),
+        headers=getattr(exc, "headers", None)
+    )
+
+load_openapi_schema(app, os.getenv("OPENAPI_SCHEMA_PATH"))
+startup.mark("app")
 
 if __name__ == "__main__":
     import uvicorn
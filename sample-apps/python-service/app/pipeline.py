@@ -0,0 +1,158 @@
+"""
+Composable processing pipelines for the data processing service
+
+A pipeline is named as a ``|``-separated list of registered operations,
+each with optional arguments, e.g. ``scale(3)|clip(0,100)|rolling_mean(5)``.
+A pipeline string is parsed and validated once and cached; running it is a
+short sequence of NumPy array operations over the whole batch, so Python
+overhead is paid per step rather than per point.
+
+Operations that look across points (``diff``, ``zscore``,
+``rolling_mean``) work over the batch in request order and always return
+one output per input.
+"""
+import math
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+DEFAULT_PIPELINE = "multiply_by_2"
+
+# Longest pipeline accepted, in steps
+MAX_PIPELINE_STEPS = 16
+
+OPERATIONS: Dict[str, Callable] = {}
+
+_STEP = re.compile(r"^\s*([a-z_][a-z0-9_]*)\s*(?:\(([^()]*)\))?\s*$")
+
+
+class PipelineError(ValueError):
+    """Raised when a pipeline is invalid or cannot be applied"""
+
+
+def operation(name: str):
+    """Register an operation factory: takes the step's arguments, returns f(array)"""
+    def register(factory: Callable) -> Callable:
+        OPERATIONS[name] = factory
+        return factory
+    return register
+
+
+@operation("multiply_by_2")
+def _multiply_by_2():
+    return lambda values: values * 2.0
+
+
+@operation("scale")
+def _scale(factor: float):
+    return lambda values: values * factor
+
+
+@operation("offset")
+def _offset(amount: float):
+    return lambda values: values + amount
+
+
+@operation("clip")
+def _clip(low: float, high: float):
+    if low > high:
+        raise PipelineError("clip requires low <= high")
+    return lambda values: np.clip(values, low, high)
+
+
+@operation("log")
+def _log():
+    def log(values: np.ndarray) -> np.ndarray:
+        if len(values) and values.min() <= 0:
+            raise PipelineError("log requires positive values")
+        return np.log(values)
+    return log
+
+
+@operation("diff")
+def _diff():
+    # The first point has no predecessor, so its difference is 0
+    return lambda values: np.diff(values, prepend=values[:1])
+
+
+@operation("zscore")
+def _zscore():
+    def zscore(values: np.ndarray) -> np.ndarray:
+        std = values.std() if len(values) else 0.0
+        if std == 0:
+            return np.zeros_like(values)
+        return (values - values.mean()) / std
+    return zscore
+
+
+@operation("rolling_mean")
+def _rolling_mean(window: float):
+    if window < 1 or window != int(window):
+        raise PipelineError("rolling_mean requires a positive integer window")
+    window = int(window)
+
+    def rolling_mean(values: np.ndarray) -> np.ndarray:
+        # Trailing mean; the first window - 1 points average what is available
+        sums = np.cumsum(values)
+        sums[window:] = sums[window:] - sums[:-window]
+        counts = np.minimum(np.arange(1, len(values) + 1), window)
+        return sums / counts
+    return rolling_mean
+
+
+class Pipeline:
+    """A validated sequence of operations over a float64 array"""
+
+    def __init__(self, name: str, steps: List[Callable]):
+        self.name = name
+        self.steps = steps
+
+    def __call__(self, values) -> np.ndarray:
+        result = np.asarray(values, dtype=np.float64)
+        for step in self.steps:
+            result = step(result)
+        if not np.isfinite(result).all():
+            raise PipelineError(f"Pipeline {self.name} produced non-finite values")
+        return result
+
+
+def _parse_step(text: str) -> Tuple[str, Tuple[float, ...]]:
+    """(operation name, arguments) of one pipeline step"""
+    match = _STEP.match(text)
+    if match is None:
+        raise PipelineError(f"Invalid pipeline step: {text.strip()!r}")
+    name, arguments = match.groups()
+    if name not in OPERATIONS:
+        raise PipelineError(f"Unknown operation: {name}")
+    try:
+        args = tuple(
+            float(arg) for arg in (arguments or "").split(",") if arg.strip()
+        )
+    except ValueError:
+        raise PipelineError(f"Arguments of {name} must be numbers")
+    if not all(math.isfinite(arg) for arg in args):
+        raise PipelineError(f"Arguments of {name} must be finite")
+    return name, args
+
+
+@lru_cache(maxsize=256)
+def compile_pipeline(spec: str = DEFAULT_PIPELINE) -> Pipeline:
+    """Parse and validate a pipeline string; compiled pipelines are cached"""
+    texts = spec.split("|")
+    if len(texts) > MAX_PIPELINE_STEPS:
+        raise PipelineError(f"Pipelines are limited to {MAX_PIPELINE_STEPS} steps")
+
+    steps = []
+    names = []
+    for text in texts:
+        name, args = _parse_step(text)
+        try:
+            steps.append(OPERATIONS[name](*args))
+        except TypeError:
+            raise PipelineError(f"Wrong number of arguments for {name}")
+        if args:
+            name = f"{name}({','.join(f'{arg:g}' for arg in args)})"
+        names.append(name)
+    return Pipeline("|".join(names), steps)
@@ -0,0 +1,221 @@
+"""
+Micro-batched model scoring for the data processing service
+
+Concurrent requests are collected for up to ``max_wait_ms`` or
+``max_batch`` values and scored with one vectorised call, since the cost
+of a model call is mostly per-call overhead rather than per-value work.
+The model file is watched and reloaded in the background; requests keep
+using the previous model until the new one has loaded.
+
+Supported model files:
+- ``.json``: a linear scorer, ``{"type": "linear", "coef": 0.5, "intercept": 1}``
+- ``.joblib`` / ``.pkl``: an estimator with ``score_samples``,
+  ``decision_function`` or ``predict`` (e.g. scikit-learn's IsolationForest),
+  loaded with joblib. Only load model files from a trusted location.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 4096
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+
+class ModelLoadError(RuntimeError):
+    """Raised when a model file cannot be loaded"""
+
+
+class LinearModel:
+    """score = coef * value + intercept"""
+
+    def __init__(self, coef: float, intercept: float = 0.0):
+        self.coef = coef
+        self.intercept = intercept
+
+    def predict(self, values: np.ndarray) -> np.ndarray:
+        return values * self.coef + self.intercept
+
+
+class EstimatorModel:
+    """Adapter for a fitted estimator taking one feature column"""
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+        for method in ("score_samples", "decision_function", "predict"):
+            if hasattr(estimator, method):
+                self._predict = getattr(estimator, method)
+                break
+        else:
+            raise ModelLoadError("Estimator has no scoring method")
+
+    def predict(self, values: np.ndarray) -> np.ndarray:
+        return np.asarray(self._predict(values.reshape(-1, 1)), dtype=np.float64)
+
+
+def load_model(path: str):
+    """Load a model file into an object with a vectorised ``predict``"""
+    if path.endswith(".json"):
+        try:
+            with open(path, "r") as f:
+                spec = json.load(f)
+            if spec.get("type", "linear") != "linear":
+                raise ModelLoadError(f"Unsupported model type: {spec['type']}")
+            return LinearModel(float(spec["coef"]), float(spec.get("intercept", 0.0)))
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            raise ModelLoadError(f"Invalid linear model {path}: {exc}")
+
+    if path.endswith((".joblib", ".pkl")):
+        try:
+            import joblib
+        except ImportError:
+            raise ModelLoadError("Loading estimator models requires joblib")
+        try:
+            return EstimatorModel(joblib.load(path))
+        except ModelLoadError:
+            raise
+        except Exception as exc:
+            raise ModelLoadError(f"Invalid estimator model {path}: {exc}")
+
+    raise ModelLoadError(f"Unsupported model file: {path}")
+
+
+class BatchingScorer:
+    """
+    Score values with a hot-reloadable model, batching across callers
+
+    ``score`` must be awaited from the event loop; the model itself runs in
+    the default executor so a slow model does not block other requests.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        reload_interval: float = DEFAULT_RELOAD_INTERVAL,
+    ):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.reload_interval = reload_interval
+
+        self._model = load_model(path)
+        self._mtime = os.stat(path).st_mtime_ns
+        self.version = 1
+        self.loaded_at = time.time()
+        self._last_check = time.monotonic()
+        self._reload_lock = threading.Lock()
+
+        self._pending: List = []
+        self._pending_count = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+        self.batches = 0
+        self.points = 0
+
+    def info(self) -> dict:
+        """Model and batching statistics"""
+        return {
+            "path": self.path,
+            "model": type(self._model).__name__,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "batches": self.batches,
+            "points": self.points,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    async def score(self, values) -> np.ndarray:
+        """Score an array of values, sharing one model call with concurrent callers"""
+        values = np.asarray(values, dtype=np.float64)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((values, future))
+        self._pending_count += len(values)
+
+        if self._pending_count >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Hand every pending request to one model call"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending, self._pending_count = self._pending, [], 0
+        self._maybe_reload()
+        task = asyncio.ensure_future(self._run(batch, self._model))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch, model) -> None:
+        """Score a batch and resolve each caller's future with its slice"""
+        values = np.concatenate([values for values, _ in batch])
+        loop = asyncio.get_running_loop()
+        try:
+            scores = await loop.run_in_executor(None, model.predict, values)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        self.batches += 1
+        self.points += len(values)
+        offset = 0
+        for part, future in batch:
+            if not future.done():
+                future.set_result(scores[offset:offset + len(part)])
+            offset += len(part)
+
+    def _maybe_reload(self) -> None:
+        """Start a background reload if the model file changed"""
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return
+        self._last_check = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime and not self._reload_lock.locked():
+            asyncio.get_running_loop().run_in_executor(None, self.reload, mtime)
+
+    def reload(self, mtime: Optional[int] = None) -> bool:
+        """
+        Load the model file and swap it in
+
+        The previous model keeps serving until the new one has loaded, and
+        stays in place if the new file is invalid (e.g. half-written).
+        """
+        with self._reload_lock:
+            try:
+                model = load_model(self.path)
+            except ModelLoadError as exc:
+                logger.warning("Keeping model version %s: %s", self.version, exc)
+                return False
+
+            self._model = model
+            self._mtime = mtime if mtime is not None else os.stat(self.path).st_mtime_ns
+            self.version += 1
+            self.loaded_at = time.time()
+            logger.info("Loaded model version %s from %s", self.version, self.path)
+            return True
@@ -0,0 +1,110 @@
+"""
+Fast response encoding for the data processing service
+
+The default FastAPI path re-validates every returned item against its
+``response_model`` and encodes it with ``jsonable_encoder`` plus the
+standard ``json`` module. Processing results are built by the service
+itself, so the fast path skips that validation and encodes plain dicts with
+orjson (falling back to ``json``), or with msgpack when the client sends
+``Accept: application/msgpack``.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Optional
+
+import numpy as np
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional encoding
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+# Skip response_model validation for JSON responses from processing routes
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "false").lower() == "true"
+
+
+def _default(value: Any) -> Any:
+    """Encode the types the plain encoders do not know about"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def dumps_json(content: Any) -> bytes:
+    """Encode content as compact JSON, serialising NumPy arrays natively"""
+    if orjson is not None:
+        return orjson.dumps(
+            content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """Whether the Accept header asks for msgpack and it can be produced"""
+    if not accept or msgpack is None:
+        return False
+    return any(
+        part.split(";")[0].strip().lower() in MSGPACK_MEDIA_TYPES
+        for part in accept.split(",")
+    )
+
+
+def use_fast_path(accept: Optional[str]) -> bool:
+    """Whether a processing route should bypass response_model encoding"""
+    return FAST_RESPONSES or wants_msgpack(accept)
+
+
+def encode_response(content: Any, accept: Optional[str], status_code: int = 200):
+    """Encode trusted content as msgpack or JSON, chosen via Accept"""
+    if wants_msgpack(accept):
+        return Response(
+            msgpack.packb(content, default=_default),
+            status_code=status_code,
+            media_type=MSGPACK_MEDIA_TYPE,
+        )
+    return Response(
+        dumps_json(content), status_code=status_code, media_type=JSON_MEDIA_TYPE
+    )
+
+
+def error_content(status_code: int, detail: Any) -> dict:
+    """Body of every error response: the detail, status code and time"""
+    return {
+        "error": detail,
+        "status_code": status_code,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+def result_record(
+    original_value: float,
+    processed_value: float,
+    operation: str,
+    timestamp: str,
+    prediction: Optional[float] = None,
+) -> dict:
+    """One ProcessingResult as a plain dict, with None fields left out"""
+    record = {
+        "original_value": original_value,
+        "processed_value": processed_value,
+        "operation": operation,
+        "timestamp": timestamp,
+    }
+    if prediction is not None:
+        record["prediction"] = prediction
+    return record
@@ -0,0 +1,101 @@
+"""
+Production server settings for the data processing service
+
+Used by gunicorn.conf.py to size the worker pool and to prepare the shared
+directory where prometheus_client's multiprocess mode keeps each worker's
+metric files, so /metrics can merge them at scrape time.
+"""
+import math
+import os
+import shutil
+
+DEFAULT_MULTIPROC_DIR = "/tmp/prometheus"
+
+
+def available_cpus() -> int:
+    """
+    Number of cores this process may actually use
+
+    Honours the container's CFS quota (cgroup v2 ``cpu.max`` or v1
+    ``cpu.cfs_quota_us``) as well as the CPU affinity mask, since
+    ``os.cpu_count()`` reports the host's cores.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def _cgroup_cpu_quota():
+    """CPU limit in cores from the cgroup, or None if unlimited or unknown"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def worker_count() -> int:
+    """
+    Workers to run: WEB_CONCURRENCY if set, otherwise one per usable core
+
+    Processing is CPU-bound NumPy work on an async event loop, so extra
+    workers beyond the core count only add contention.
+    """
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    return available_cpus()
+
+
+def job_worker_count() -> int:
+    """
+    Job processes per server worker: JOB_WORKERS if set, otherwise the
+    usable cores divided among the server workers
+
+    Every gunicorn worker runs its own job pool, so sizing each pool to the
+    whole machine would start workers x cores processes.
+    """
+    configured = os.getenv("JOB_WORKERS")
+    if configured and int(configured) > 0:
+        return int(configured)
+    return max(1, available_cpus() // worker_count())
+
+
+def prepare_multiproc_dir() -> str:
+    """
+    Point prometheus_client at an empty multiprocess directory
+
+    Must run in the master before workers import prometheus_client. Files
+    left by a previous run are removed so old counts are not merged in. The
+    directory itself is kept, since it is often a volume mount point (the
+    k8s emptyDir), which cannot be removed.
+    """
+    path = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", DEFAULT_MULTIPROC_DIR)
+    os.makedirs(path, exist_ok=True)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+    return path
@@ -0,0 +1,136 @@
+"""
+Cold-start measurement and warm-up for the data processing service
+
+Startup is split into phases, each timed against a budget:
+
+- ``imports``: interpreter start until the application's imports finish
+- ``app``: building the application and its routes
+- ``warmup``: exercising first-request code paths (pipeline compilation,
+  JSON encoding, the OpenAPI schema) after the server starts
+
+``/ready`` reports not ready until warm-up has finished, while ``/health``
+answers as soon as the server is up. The OpenAPI schema can be generated at
+build time with ``python -m app.startup openapi.json`` and loaded from
+``OPENAPI_SCHEMA_PATH``, instead of being built on the first ``/docs`` hit.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, Optional
+
+from app.instrumentation import STARTUP_DURATION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STARTUP_BUDGET = 3.0
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields resume after ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+
+
+class StartupTracker:
+    """Durations of the startup phases and whether warm-up has finished"""
+
+    def __init__(self, budget_seconds: float = DEFAULT_STARTUP_BUDGET):
+        self.budget_seconds = budget_seconds
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self._created = time.perf_counter()
+        self._elapsed = 0.0
+
+    def _now(self) -> float:
+        """Seconds since process start, or since this tracker was created"""
+        age = process_age()
+        if age is not None:
+            return age
+        return time.perf_counter() - self._created
+
+    def mark(self, phase: str) -> float:
+        """End a phase; its duration is the time since the previous mark"""
+        now = max(self._now(), self._elapsed)
+        duration = now - self._elapsed
+        self._elapsed = now
+        self.phases[phase] = duration
+        STARTUP_DURATION.labels(phase).set(duration)
+        return duration
+
+    def finish(self) -> None:
+        """Mark warm-up complete and check the total against the budget"""
+        self.mark("warmup")
+        self.ready = True
+        if self.total > self.budget_seconds:
+            logger.warning(
+                "Startup took %.2fs, over the %.2fs budget: %s",
+                self.total, self.budget_seconds, self.phases,
+            )
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def report(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "phases_seconds": dict(self.phases),
+            "total_seconds": self.total,
+            "budget_seconds": self.budget_seconds,
+            "within_budget": self.total <= self.budget_seconds,
+        }
+
+
+def load_openapi_schema(app, path: Optional[str]) -> bool:
+    """Use a pre-generated OpenAPI schema if ``path`` names one"""
+    if not path or not os.path.exists(path):
+        return False
+    with open(path) as f:
+        app.openapi_schema = json.load(f)
+    return True
+
+
+def warm_up(app) -> None:
+    """Run first-request code paths once so real requests do not pay for them"""
+    import numpy as np
+
+    from app.pipeline import DEFAULT_PIPELINE, compile_pipeline
+    from app.serialization import dumps_json, result_record
+
+    values = compile_pipeline(DEFAULT_PIPELINE)(np.ones(8))
+    dumps_json([result_record(1.0, 2.0, DEFAULT_PIPELINE, "")])
+    dumps_json({"processed_values": values})
+    if app.openapi_schema is None:
+        app.openapi()
+
+
+async def warm_up_in_background(app, tracker: StartupTracker) -> None:
+    """
+    Warm up off the event loop, then mark the worker ready
+
+    A failed warm-up is logged and the worker still becomes ready: warm-up
+    only moves first-request costs earlier.
+    """
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, warm_up, app)
+    except Exception:
+        logger.exception("Warm-up failed")
+    tracker.finish()
+
+
+if __name__ == "__main__":
+    # python -m app.startup openapi.json
+    from app.main import app as main_app
+
+    with open(sys.argv[1], "w") as f:
+        json.dump(main_app.openapi(), f)
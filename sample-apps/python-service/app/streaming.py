@@ -0,0 +1,105 @@
+"""
+Streaming helpers for NDJSON request and response bodies
+"""
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Tuple
+
+import anyio
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Results are flushed after this many input records
+STREAM_CHUNK_SIZE = 1000
+
+# Longest single NDJSON record accepted, which bounds the read buffer
+MAX_STREAM_LINE_BYTES = 64 * 1024
+
+
+class LineTooLongError(ValueError):
+    """Raised when an NDJSON record exceeds MAX_STREAM_LINE_BYTES"""
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose body is produced while the request is still read
+
+    ``content`` is called with an async iterator over the request body and
+    must return the response body iterator. StreamingResponse watches for
+    client disconnects by reading ``receive()``, which would swallow request
+    body chunks; here the watch only starts once the request body has been
+    read to the end. Each ``send`` waits on the server's flow control and
+    the request is only read as fast as results are sent, which gives
+    end-to-end backpressure.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        content: Callable[[AsyncIterator[bytes]], AsyncIterator[Any]],
+        **kwargs: Any,
+    ) -> None:
+        self._request = request
+        self._request_read = anyio.Event()
+        super().__init__(content(self._request_chunks()), **kwargs)
+
+    async def _request_chunks(self) -> AsyncIterator[bytes]:
+        """Request body chunks; a client disconnect just ends the body"""
+        try:
+            async for chunk in self._request.stream():
+                yield chunk
+        except ClientDisconnect:
+            pass
+        finally:
+            self._request_read.set()
+
+    async def _listen_for_disconnect(self, receive: Receive) -> None:
+        await self._request_read.wait()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async with anyio.create_task_group() as task_group:
+
+            async def wrap(func: Callable[[], Awaitable[None]]) -> None:
+                await func()
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(wrap, partial(self.stream_response, send))
+            await wrap(partial(self._listen_for_disconnect, receive))
+
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_STREAM_LINE_BYTES
+) -> AsyncIterator[Tuple[int, bytes]]:
+    """Split a byte stream into (line number, line) pairs, skipping blank lines"""
+    buffer = b""
+    line_number = 0
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+
+        for line in lines:
+            line_number += 1
+            if len(line) > max_line_bytes:
+                raise LineTooLongError(
+                    f"Line {line_number} exceeds {max_line_bytes} bytes"
+                )
+            if line.strip():
+                yield line_number, line
+
+        if len(buffer) > max_line_bytes:
+            raise LineTooLongError(
+                f"Line {line_number + 1} exceeds {max_line_bytes} bytes"
+            )
+
+    if buffer.strip():
+        yield line_number + 1, buffer
@@ -0,0 +1,193 @@
+"""
+WebSocket processing channel for persistent producers
+
+A producer keeps one connection open and sends points as frames, instead
+of paying for an HTTP request and JSON envelope per point:
+
+- text frames hold a DataPoint object or an array of them, answered with a
+  ProcessingResult object or array in a text frame
+- binary frames hold packed little-endian float64 values, answered with the
+  processed values packed the same way, followed by the model predictions
+  when a model is configured
+
+Frames are read by one task and processed in order by another, with at most
+``max_pending`` frames queued between them. When the queue is full the
+channel stops reading, so a producer that outpaces processing is slowed
+down by the transport's flow control instead of filling memory. Metrics are
+counted per connection and flushed periodically and on close, rather than
+updated for every frame.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Tuple, Union
+
+import numpy as np
+from starlette.websockets import WebSocket, WebSocketDisconnect, WebSocketState
+
+from app.instrumentation import (
+    WEBSOCKET_BYTES,
+    WEBSOCKET_CONNECTION_DURATION,
+    WEBSOCKET_CONNECTIONS,
+    WEBSOCKET_FRAMES,
+    WEBSOCKET_POINTS,
+)
+from app.serialization import dumps_json
+
+logger = logging.getLogger(__name__)
+
+BINARY_DTYPE = np.dtype("<f8")
+
+# Frames received but not yet processed, per connection
+DEFAULT_MAX_PENDING_FRAMES = 16
+
+# Most points accepted in one frame
+DEFAULT_MAX_FRAME_POINTS = 10_000
+
+# Seconds between metric flushes on a long-lived connection
+METRICS_FLUSH_INTERVAL = 5.0
+
+Reply = Union[str, bytes]
+FrameHandler = Callable[[dict], Awaitable[Tuple[int, Reply]]]
+
+
+class FrameError(ValueError):
+    """Raised when a frame cannot be processed; answered with an error frame"""
+
+
+def decode_values(data: bytes, max_points: int = DEFAULT_MAX_FRAME_POINTS):
+    """Values of a binary frame of packed little-endian float64"""
+    if len(data) % BINARY_DTYPE.itemsize:
+        raise FrameError(
+            f"Binary frame length must be a multiple of {BINARY_DTYPE.itemsize} bytes"
+        )
+    if len(data) // BINARY_DTYPE.itemsize > max_points:
+        raise FrameError(f"Frame exceeds {max_points} points")
+    return np.frombuffer(data, dtype=BINARY_DTYPE)
+
+
+def encode_values(*columns) -> bytes:
+    """Binary frame of the given columns of values, one after the other"""
+    return b"".join(
+        np.asarray(column, dtype=BINARY_DTYPE).tobytes() for column in columns
+    )
+
+
+class ConnectionStats:
+    """Counts for one connection, added to the shared metrics in bulk"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.opened = time.perf_counter()
+        self._flushed = self.opened
+        self._pending = {
+            "frames_in": 0, "frames_out": 0, "errors": 0, "points": 0,
+            "bytes_in": 0, "bytes_out": 0,
+        }
+
+    def add(self, **counts: int) -> None:
+        for name, count in counts.items():
+            self._pending[name] += count
+        if time.perf_counter() - self._flushed >= METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        pending = self._pending
+        WEBSOCKET_FRAMES.labels(self.endpoint, "in").inc(pending["frames_in"])
+        WEBSOCKET_FRAMES.labels(self.endpoint, "out").inc(pending["frames_out"])
+        WEBSOCKET_FRAMES.labels(self.endpoint, "error").inc(pending["errors"])
+        WEBSOCKET_POINTS.labels(self.endpoint).inc(pending["points"])
+        WEBSOCKET_BYTES.labels(self.endpoint, "in").inc(pending["bytes_in"])
+        WEBSOCKET_BYTES.labels(self.endpoint, "out").inc(pending["bytes_out"])
+        self._pending = dict.fromkeys(pending, 0)
+        self._flushed = time.perf_counter()
+
+    def close(self) -> None:
+        self.flush()
+        WEBSOCKET_CONNECTION_DURATION.labels(self.endpoint).observe(
+            time.perf_counter() - self.opened
+        )
+
+
+async def _read_frames(websocket: WebSocket, queue: asyncio.Queue) -> None:
+    """Queue received frames, blocking while the queue is full; None ends"""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            await queue.put(message)
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        logger.warning("WebSocket receive failed: %s", exc)
+    await queue.put(None)
+
+
+def _frame_size(message: dict) -> int:
+    data = message.get("bytes")
+    if data is None:
+        data = message.get("text") or ""
+    return len(data)
+
+
+async def serve_channel(
+    websocket: WebSocket,
+    handle: FrameHandler,
+    endpoint: str,
+    max_pending: int = DEFAULT_MAX_PENDING_FRAMES,
+) -> None:
+    """
+    Accept a connection and answer each frame with ``handle``'s reply
+
+    ``handle(message)`` receives the raw ASGI message and returns the number
+    of points it processed and the reply, sent as a binary frame if it is
+    bytes and as a text frame otherwise. A FrameError it raises is answered
+    with an ``{"frame": n, "error": ...}`` text frame, and any other
+    exception is logged and answered with ``"error": "internal error"``;
+    either way the connection stays open.
+    """
+    await websocket.accept()
+    WEBSOCKET_CONNECTIONS.labels(endpoint).inc()
+    stats = ConnectionStats(endpoint)
+    queue: asyncio.Queue = asyncio.Queue(max_pending)
+    reader = asyncio.ensure_future(_read_frames(websocket, queue))
+    frame_number = 0
+    try:
+        while True:
+            message: Optional[dict] = await queue.get()
+            if message is None:
+                break
+            frame_number += 1
+            try:
+                points, reply = await handle(message)
+                errors = 0
+            except FrameError as exc:
+                points, errors = 0, 1
+                reply = dumps_json({"frame": frame_number, "error": str(exc)}).decode()
+            except Exception:
+                # One bad frame must not end a long-lived connection
+                logger.exception(
+                    "WebSocket frame %d failed on %s", frame_number, endpoint
+                )
+                points, errors = 0, 1
+                reply = dumps_json(
+                    {"frame": frame_number, "error": "internal error"}
+                ).decode()
+
+            if websocket.client_state == WebSocketState.DISCONNECTED:
+                break
+            if isinstance(reply, bytes):
+                await websocket.send_bytes(reply)
+            else:
+                await websocket.send_text(reply)
+            stats.add(
+                frames_in=1, frames_out=1, errors=errors, points=points,
+                bytes_in=_frame_size(message), bytes_out=len(reply),
+            )
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+        WEBSOCKET_CONNECTIONS.labels(endpoint).dec()
+        stats.close()
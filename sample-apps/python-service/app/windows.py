@@ -0,0 +1,245 @@
+"""
+Event-time window aggregation for the data processing service
+
+Points are assigned to fixed panes by their own timestamp rather than by
+arrival time. Tumbling and sliding windows are assembled from panes when
+queried, so one set of panes serves every window size and slide that is a
+multiple of the pane length.
+
+Each series tracks a watermark: the latest event time it has seen minus
+the allowed lateness. A point whose pane ends at or before the watermark
+is dropped as late, so a window that ends at or before the watermark is
+final and will not change. Memory is bounded: a series keeps only the
+``retention_panes`` panes up to its newest, each pane keeps a fixed-size
+reservoir sample for quantiles, and the least recently updated series are
+evicted past ``max_series``.
+"""
+import math
+import random
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_PANE_SECONDS = 60
+DEFAULT_RETENTION_PANES = 120
+DEFAULT_ALLOWED_LATENESS = 120.0
+DEFAULT_MAX_SERIES = 1000
+
+# Values sampled per pane for quantile estimates; exact below this count
+DEFAULT_SAMPLE_SIZE = 64
+
+# Points stamped further than this ahead of the clock are rejected, so one
+# bad clock cannot push the watermark forward and drop everything else
+DEFAULT_MAX_FUTURE_SECONDS = 300.0
+
+
+class Pane:
+    """Aggregates of the values in one pane"""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "sample")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.sample = array("d")
+
+
+class SeriesWindows:
+    """Panes and watermark of one series"""
+
+    __slots__ = ("panes", "max_event_time", "late_points")
+
+    def __init__(self):
+        self.panes: Dict[int, Pane] = {}
+        self.max_event_time = -math.inf
+        self.late_points = 0
+
+
+class WindowAggregator:
+    """Tumbling and sliding window aggregates per series over event time"""
+
+    def __init__(
+        self,
+        pane_seconds: int = DEFAULT_PANE_SECONDS,
+        retention_panes: int = DEFAULT_RETENTION_PANES,
+        allowed_lateness: float = DEFAULT_ALLOWED_LATENESS,
+        max_series: int = DEFAULT_MAX_SERIES,
+        sample_size: int = DEFAULT_SAMPLE_SIZE,
+        max_future_seconds: float = DEFAULT_MAX_FUTURE_SECONDS,
+    ):
+        self.pane_seconds = pane_seconds
+        self.retention_panes = retention_panes
+        self.allowed_lateness = allowed_lateness
+        self.max_series = max_series
+        self.sample_size = sample_size
+        self.max_future_seconds = max_future_seconds
+        self._series: "OrderedDict[str, SeriesWindows]" = OrderedDict()
+        self._random = random.Random(0)
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def _state(self, series: str) -> SeriesWindows:
+        """State for a series, created on first use and kept in LRU order"""
+        state = self._series.get(series)
+        if state is None:
+            state = SeriesWindows()
+            self._series[series] = state
+            if len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(series)
+        return state
+
+    def watermark(self, state: SeriesWindows) -> float:
+        """Event time before which a series accepts no more points"""
+        return state.max_event_time - self.allowed_lateness
+
+    def add(self, series: str, value: float, timestamp: float, now: float) -> str:
+        """
+        Add one point to its series' pane
+
+        Returns "accepted", "late" (its pane is already final or no longer
+        retained) or "future" (stamped too far ahead of ``now``).
+        """
+        if timestamp > now + self.max_future_seconds:
+            return "future"
+        state = self._state(series)
+        index = int(timestamp // self.pane_seconds)
+        if (index + 1) * self.pane_seconds <= self.watermark(state) or (
+            index <= state.max_event_time // self.pane_seconds - self.retention_panes
+        ):
+            state.late_points += 1
+            return "late"
+
+        pane = state.panes.get(index)
+        if pane is None:
+            pane = state.panes[index] = Pane()
+        pane.count += 1
+        pane.total += value
+        if value < pane.minimum:
+            pane.minimum = value
+        if value > pane.maximum:
+            pane.maximum = value
+        # Reservoir sampling keeps a uniform sample of the pane's values
+        if len(pane.sample) < self.sample_size:
+            pane.sample.append(value)
+        else:
+            slot = self._random.randrange(pane.count)
+            if slot < self.sample_size:
+                pane.sample[slot] = value
+
+        if timestamp > state.max_event_time:
+            previous = state.max_event_time // self.pane_seconds
+            state.max_event_time = timestamp
+            if index > previous:
+                # The newest pane moved: drop panes that fell out of retention
+                oldest = index - self.retention_panes
+                for stale in [i for i in state.panes if i <= oldest]:
+                    del state.panes[stale]
+        return "accepted"
+
+    def windows(
+        self,
+        series: str,
+        size: int,
+        slide: Optional[int] = None,
+        quantiles: Sequence[float] = (0.5, 0.95, 0.99),
+        limit: int = 60,
+    ) -> Optional[Dict]:
+        """
+        The latest ``limit`` non-empty windows of a series, oldest first
+
+        ``size`` and ``slide`` are in seconds and must be multiples of the
+        pane length; ``slide`` defaults to ``size`` (tumbling windows).
+        Returns None for an unknown series.
+        """
+        slide = slide or size
+        if (
+            size <= 0
+            or not 0 < slide <= size
+            or size % self.pane_seconds
+            or slide % self.pane_seconds
+        ):
+            raise ValueError(
+                f"size and slide must be positive multiples of {self.pane_seconds}s, "
+                "with slide <= size"
+            )
+        if size > self.retention_panes * self.pane_seconds:
+            raise ValueError(
+                "size exceeds the "
+                f"{self.retention_panes * self.pane_seconds}s retained per series"
+            )
+
+        state = self._series.get(series)
+        if state is None:
+            return None
+
+        watermark = self.watermark(state)
+        size_panes = size // self.pane_seconds
+        slide_panes = slide // self.pane_seconds
+        results: List[Dict] = []
+        if state.panes:
+            newest = max(state.panes)
+            # Only windows overlapping the retained panes can be non-empty,
+            # so the scan is bounded by retention, not the timestamp spread
+            oldest = max(min(state.panes), newest - self.retention_panes + 1)
+            first = oldest - size_panes + 1
+            start = (newest // slide_panes) * slide_panes
+            while start >= first and len(results) < limit:
+                panes = [
+                    state.panes[i]
+                    for i in range(start, start + size_panes)
+                    if i in state.panes
+                ]
+                if panes:
+                    window_end = (start + size_panes) * self.pane_seconds
+                    window = _aggregate(panes, quantiles)
+                    window["start"] = start * self.pane_seconds
+                    window["end"] = window_end
+                    window["final"] = window_end <= watermark
+                    results.append(window)
+                start -= slide_panes
+        results.reverse()
+
+        return {
+            "series": series,
+            "size": size,
+            "slide": slide,
+            "watermark": watermark if watermark > -math.inf else None,
+            "late_points": state.late_points,
+            "windows": results,
+        }
+
+
+def _aggregate(panes: List[Pane], quantiles: Sequence[float]) -> Dict:
+    """Combine panes into one window's aggregates"""
+    count = sum(pane.count for pane in panes)
+    total = sum(pane.total for pane in panes)
+
+    # Each sampled value stands for count / len(sample) values of its pane
+    values = np.concatenate([np.frombuffer(pane.sample) for pane in panes])
+    weights = np.concatenate([
+        np.full(len(pane.sample), pane.count / len(pane.sample)) for pane in panes
+    ])
+    order = np.argsort(values, kind="stable")
+    values = values[order]
+    cumulative = np.cumsum(weights[order])
+
+    return {
+        "count": count,
+        "sum": total,
+        "mean": total / count,
+        "min": min(pane.minimum for pane in panes),
+        "max": max(pane.maximum for pane in panes),
+        "quantiles": {
+            str(q): float(values[min(
+                int(np.searchsorted(cumulative, q * cumulative[-1])), len(values) - 1
+            )])
+            for q in quantiles
+        },
+    }
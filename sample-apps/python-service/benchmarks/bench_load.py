@@ -0,0 +1,277 @@
+"""
+Load and latency benchmark for the processing endpoints
+
+    python -m benchmarks.bench_load [--target inprocess|uvicorn]
+        [--endpoints process,batch-process,metrics] [--concurrency 1,16]
+        [--batch-sizes 1,100] [--requests 500]
+        [--save results.json] [--compare baseline.json] [--threshold 0.1]
+
+Drives the app in process through httpx's ASGI transport, or over HTTP
+against a uvicorn server started for the run. Each scenario (endpoint,
+batch size, concurrency) sends ``--requests`` requests from ``concurrency``
+concurrent callers and reports throughput and p50/p95/p99 latency.
+
+``--save`` writes the results as a JSON baseline. ``--compare`` checks the
+results against a baseline and exits with status 1 if any scenario's
+throughput fell, or its p99 latency rose, by more than ``--threshold``, or
+if it had more failed requests.
+``--input`` compares a saved result file instead of running the benchmark.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+from httpx import AsyncClient, Limits
+
+ENDPOINTS = ("process", "batch-process", "metrics")
+
+# The batch endpoint accepts at most this many points
+MAX_BATCH_SIZE = 100
+
+# Warm-up requests per scenario, not measured
+WARMUP_REQUESTS = 20
+
+
+def scenario_key(endpoint: str, batch_size: int, concurrency: int) -> str:
+    if endpoint == "batch-process":
+        return f"{endpoint} batch={batch_size} concurrency={concurrency}"
+    return f"{endpoint} concurrency={concurrency}"
+
+
+def scenarios(endpoints, batch_sizes, concurrencies):
+    """(endpoint, batch size, concurrency) for every combination that applies"""
+    for endpoint in endpoints:
+        sizes = batch_sizes if endpoint == "batch-process" else [1]
+        for batch_size, concurrency in itertools.product(sizes, concurrencies):
+            yield endpoint, batch_size, concurrency
+
+
+def _request_factory(endpoint: str, batch_size: int):
+    """
+    send(client) for one request of a scenario
+
+    Payloads differ between requests so that the result cache does not turn
+    the benchmark into a cache benchmark.
+    """
+    counter = itertools.count()
+
+    if endpoint == "process":
+        def send(client):
+            n = next(counter)
+            return client.post("/api/v1/process", json={"id": n, "value": float(n)})
+    elif endpoint == "batch-process":
+        def send(client):
+            n = next(counter) * batch_size
+            batch = [{"id": n + i, "value": float(n + i)} for i in range(batch_size)]
+            return client.post("/api/v1/batch-process", json=batch)
+    elif endpoint == "metrics":
+        def send(client):
+            return client.get("/metrics")
+    else:
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+    return send
+
+
+async def run_scenario(
+    client: AsyncClient, endpoint: str, batch_size: int, concurrency: int,
+    requests: int,
+) -> Dict:
+    """Throughput and latency percentiles of one scenario"""
+    send = _request_factory(endpoint, batch_size)
+    for _ in range(WARMUP_REQUESTS):
+        await send(client)
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def caller():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await send(client)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "endpoint": endpoint,
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "points_per_second": requests * batch_size / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
+
+
+async def run_benchmark(client_kwargs, endpoints, batch_sizes, concurrencies,
+                        requests) -> Dict[str, Dict]:
+    """Run every scenario with one client"""
+    results = {}
+    async with AsyncClient(**client_kwargs) as client:
+        for endpoint, batch_size, concurrency in scenarios(
+            endpoints, batch_sizes, concurrencies
+        ):
+            key = scenario_key(endpoint, batch_size, concurrency)
+            results[key] = await run_scenario(
+                client, endpoint, batch_size, concurrency, requests
+            )
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_uvicorn(timeout: float = 30.0):
+    """Start a single uvicorn worker on a free port; returns (process, url)"""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start listening in time")
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """Descriptions of scenarios that regressed by more than threshold"""
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{key}: throughput {result['throughput_rps']:.0f} req/s, "
+                f"baseline {base['throughput_rps']:.0f} req/s"
+            )
+        if result["p99_ms"] > base["p99_ms"] * (1 + threshold):
+            regressions.append(
+                f"{key}: p99 {result['p99_ms']:.2f} ms, "
+                f"baseline {base['p99_ms']:.2f} ms"
+            )
+        if result["errors"] > base["errors"]:
+            regressions.append(
+                f"{key}: {result['errors']} errors, baseline {base['errors']}"
+            )
+    return regressions
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(part) for part in text.split(",") if part]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--target", choices=("inprocess", "uvicorn"),
+                        default="inprocess")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 16])
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 100])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--input", help="compare this result file instead of running")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed relative regression (default 0.1 = 10%%)")
+    args = parser.parse_args(argv)
+
+    endpoints = [name for name in args.endpoints.split(",") if name]
+    for name in endpoints:
+        if name not in ENDPOINTS:
+            parser.error(f"unknown endpoint {name}; choose from {', '.join(ENDPOINTS)}")
+    if args.requests < 1 or min(args.concurrency, default=0) < 1:
+        parser.error("requests and concurrency must be at least 1")
+    if any(not 1 <= size <= MAX_BATCH_SIZE for size in args.batch_sizes):
+        parser.error(f"batch sizes must be between 1 and {MAX_BATCH_SIZE}")
+
+    if args.input:
+        with open(args.input) as f:
+            current = json.load(f)
+    else:
+        process = None
+        if args.target == "uvicorn":
+            process, url = start_uvicorn()
+            client_kwargs = {
+                "base_url": url,
+                "limits": Limits(max_connections=max(args.concurrency)),
+            }
+        else:
+            from app.main import app
+            client_kwargs = {"app": app, "base_url": "http://bench"}
+        try:
+            results = asyncio.run(run_benchmark(
+                client_kwargs, endpoints, args.batch_sizes, args.concurrency,
+                args.requests,
+            ))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        current = {
+            "meta": {
+                "target": args.target,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "results": results,
+        }
+
+    print(f"{'scenario':<44} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'errors':>6}")
+    for key, result in current["results"].items():
+        print(f"{key:<44} {result['throughput_rps']:9.0f} {result['p50_ms']:8.2f} "
+              f"{result['p95_ms']:8.2f} {result['p99_ms']:8.2f} {result['errors']:6d}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Benchmark the fast serialisation path against the default one
+
+    python -m benchmarks.bench_serialization [--requests 2000]
+
+Compares, in process:
+- POST /api/v1/batch-process (100 items) through response_model validation,
+  the fast JSON path (FAST_RESPONSES) and msgpack (if installed)
+- encoding a 100,000-value columnar result with json.dumps(ndarray.tolist())
+  against dumps_json, which serialises the arrays directly
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+from httpx import AsyncClient
+
+from app import main as service
+from app import serialization
+from app.main import app
+
+BATCH = [{"id": i, "value": float(i)} for i in range(100)]
+
+
+async def _time_requests(headers, requests):
+    """Requests per second for the 100-item batch endpoint"""
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        for _ in range(20):
+            await client.post("/api/v1/batch-process", json=BATCH, headers=headers)
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.post(
+                "/api/v1/batch-process", json=BATCH, headers=headers
+            )
+            response.raise_for_status()
+        return requests / (time.perf_counter() - start)
+
+
+def bench_batch_endpoint(requests):
+    """Throughput of each response path"""
+    results = {}
+    # Every request posts the same batch: measure encoding, not cache hits
+    service.result_cache = None
+
+    serialization.FAST_RESPONSES = False
+    results["response_model + json"] = asyncio.run(_time_requests({}, requests))
+
+    serialization.FAST_RESPONSES = True
+    results["fast json"] = asyncio.run(_time_requests({}, requests))
+    serialization.FAST_RESPONSES = False
+
+    if serialization.msgpack is not None:
+        results["fast msgpack"] = asyncio.run(
+            _time_requests({"Accept": "application/msgpack"}, requests)
+        )
+    return results
+
+
+def bench_columnar_encoding(repeats=20):
+    """Seconds to encode a 100k-value columnar result"""
+    values = np.random.default_rng(0).normal(size=100_000)
+    result = {"original_values": values, "processed_values": values * 2.0}
+
+    def baseline():
+        return json.dumps(
+            {name: array.tolist() for name, array in result.items()}
+        ).encode()
+
+    timings = {}
+    for name, encode in (("json + tolist", baseline),
+                         ("dumps_json", lambda: serialization.dumps_json(result))):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            encode()
+        timings[name] = (time.perf_counter() - start) / repeats
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    print("POST /api/v1/batch-process, 100 items")
+    batch = bench_batch_endpoint(args.requests)
+    baseline = batch["response_model + json"]
+    for name, rate in batch.items():
+        print(f"  {name:<24} {rate:8.0f} req/s  ({rate / baseline:.2f}x)")
+
+    print("Encoding a 100,000-value columnar result")
+    encoding = bench_columnar_encoding()
+    baseline = encoding["json + tolist"]
+    for name, seconds in encoding.items():
+        print(f"  {name:<24} {seconds * 1000:8.1f} ms     ({baseline / seconds:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Gunicorn configuration for production
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+Runs one uvicorn worker per usable core (override with WEB_CONCURRENCY) and
+enables prometheus_client multiprocess mode so /metrics reports the sum
+over all workers rather than whichever worker answered the scrape.
+"""
+import os
+
+from app.server import prepare_multiproc_dir, worker_count
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = worker_count()
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+# Worker heartbeat files; the container's root filesystem is read-only
+worker_tmp_dir = "/dev/shm"
+
+# Recycle workers occasionally to bound memory growth
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+
+
+def on_starting(server):
+    """Create a clean metrics directory before any worker starts"""
+    prepare_multiproc_dir()
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges from the merged metrics"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
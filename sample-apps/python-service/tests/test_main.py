@@ -74,6 +74,42 @@ async def test_analytics_summary():
         assert "success_rate" in data
         assert "last_24h" in data
 
+@pytest.mark.asyncio
+async def test_analytics_summary_tracks_processing():
+    """Test processing requests are reflected in the analytics summary"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        before = (await client.get("/api/v1/analytics/summary")).json()
+
+        await client.post("/api/v1/process", json={"id": 424242, "value": 7.0})
+        await client.post(
+            "/api/v1/batch-process",
+            json=[{"id": 424243, "value": 1.0}, {"id": 424242, "value": 2.0}],
+        )
+
+        after = (await client.get("/api/v1/analytics/summary")).json()
+        assert after["total_processed"] == before["total_processed"] + 3
+        assert after["total_requests"] == before["total_requests"] + 2
+        assert after["last_1h"]["processed"] == before["last_1h"]["processed"] + 3
+        assert after["distinct_ids"] >= before["distinct_ids"] + 1
+        assert after["latency_ms"]["p50"] is not None
+
+def test_sketches_are_accurate():
+    """Test t-digest quantiles and HyperLogLog counts stay within tolerance"""
+    import numpy as np
+    from app.analytics import HyperLogLog, TDigest
+
+    values = np.random.default_rng(0).normal(size=200_000)
+    digest = TDigest()
+    for chunk in np.array_split(values, 50):
+        digest.add(chunk)
+    for q in (0.5, 0.95, 0.99):
+        assert abs(digest.quantile(q) - np.quantile(values, q)) < 0.02
+
+    hll = HyperLogLog()
+    hll.add(np.arange(100_000))
+    hll.add(np.arange(50_000))
+    assert abs(hll.count() - 100_000) < 3_000
+
 @pytest.mark.asyncio
 async def test_metrics():
     """Test Prometheus metrics endpoint"""
@@ -81,3 +117,1088 @@ async def test_metrics():
         response = await client.get("/metrics")
         assert response.status_code == 200
         assert "http_requests_total" in response.text
+
+@pytest.mark.asyncio
+async def test_metrics_use_route_templates():
+    """Test metrics are labelled by route template with unknown paths collapsed"""
+    from fastapi import FastAPI
+    from prometheus_client import REGISTRY
+    from app.instrumentation import InstrumentedRoute, MetricsMiddleware
+
+    test_app = FastAPI()
+    test_app.router.route_class = InstrumentedRoute
+    test_app.add_middleware(MetricsMiddleware, stage_timing=True)
+
+    @test_app.post("/items/{item_id}")
+    async def echo(item_id: int, point: dict):
+        return {"item_id": item_id}
+
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    template = {"method": "POST", "endpoint": "/items/{item_id}"}
+    before = sample("http_requests_total", status="200", **template)
+    unmatched_before = sample(
+        "http_requests_total", method="GET", endpoint="<unmatched>", status="404"
+    )
+
+    async with AsyncClient(app=test_app, base_url="http://test") as client:
+        for item_id in range(3):
+            await client.post(f"/items/{item_id}", json={"value": 1})
+        await client.get("/wp-admin/setup-config.php")
+
+    assert sample("http_requests_total", status="200", **template) == before + 3
+    assert sample(
+        "http_requests_total", method="GET", endpoint="<unmatched>", status="404"
+    ) == unmatched_before + 1
+    assert sample("http_requests_in_progress", **template) == 0
+    assert sample("http_request_size_bytes_sum", **template) > 0
+    for stage in ("validation", "handler", "serialization"):
+        assert sample(
+            "http_request_stage_duration_seconds_count",
+            endpoint="/items/{item_id}",
+            stage=stage,
+        ) >= 3
+
+def test_metrics_registry_merges_worker_processes(tmp_path, monkeypatch):
+    """Test multiprocess mode sums the metrics written by each worker"""
+    import os
+    import subprocess
+    import sys
+    from app.instrumentation import metrics_registry
+
+    worker = (
+        "from prometheus_client import Counter;"
+        "Counter('worker_jobs_total', 'Jobs').inc(2)"
+    )
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], env=env, check=True)
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    assert metrics_registry().get_sample_value("worker_jobs_total") == 4.0
+
+def test_prepare_multiproc_dir_keeps_mount_point(tmp_path, monkeypatch):
+    """Test stale metric files are cleared without removing the directory"""
+    import errno
+    import os
+    from app.server import prepare_multiproc_dir
+
+    metrics_dir = tmp_path / "prometheus"
+    (metrics_dir / "stale").mkdir(parents=True)
+    (metrics_dir / "counter_123.db").write_bytes(b"old")
+    (metrics_dir / "stale" / "gauge_456.db").write_bytes(b"old")
+    inode = metrics_dir.stat().st_ino
+
+    # A mount point cannot be removed, like the k8s emptyDir
+    rmdir = os.rmdir
+
+    def refuse_mount_point(path, *args, **kwargs):
+        if os.fspath(path) == str(metrics_dir):
+            raise OSError(errno.EBUSY, "Device or resource busy", str(path))
+        return rmdir(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "rmdir", refuse_mount_point)
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(metrics_dir))
+
+    assert prepare_multiproc_dir() == str(metrics_dir)
+    assert list(metrics_dir.iterdir()) == []
+    assert metrics_dir.stat().st_ino == inode
+
+    missing = tmp_path / "missing"
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(missing))
+    assert prepare_multiproc_dir() == str(missing) and missing.is_dir()
+
+def test_worker_count(monkeypatch):
+    """Test the worker pool follows WEB_CONCURRENCY, else the usable cores"""
+    from app.server import available_cpus, worker_count
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert worker_count() == 3
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert worker_count() == available_cpus() >= 1
+
+def test_job_worker_count_shares_cores_between_workers(monkeypatch):
+    """Test each server worker's job pool gets its share of the cores"""
+    from app import server
+
+    monkeypatch.setattr(server, "available_cpus", lambda: 8)
+    monkeypatch.delenv("JOB_WORKERS", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert server.job_worker_count() == 2
+    monkeypatch.setenv("WEB_CONCURRENCY", "16")
+    assert server.job_worker_count() == 1
+    monkeypatch.setenv("JOB_WORKERS", "3")
+    assert server.job_worker_count() == 3
+
+@pytest.mark.asyncio
+async def test_metrics_openmetrics_exemplars():
+    """Test trace ids are exposed as exemplars in OpenMetrics output"""
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get(
+            "/health", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"}
+        )
+        response = await client.get(
+            "/metrics", headers={"Accept": "application/openmetrics-text"}
+        )
+        assert response.headers["content-type"].startswith(
+            "application/openmetrics-text"
+        )
+        assert f'trace_id="{trace_id}"' in response.text
+
+@pytest.mark.asyncio
+async def test_fast_responses_match_default(monkeypatch):
+    """Test the fast path returns the same results with one batch timestamp"""
+    from app import serialization
+
+    payload = [{"value": float(i)} for i in range(50)]
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        default = (await client.post("/api/v1/batch-process", json=payload)).json()
+
+        monkeypatch.setattr(serialization, "FAST_RESPONSES", True)
+        fast = (await client.post("/api/v1/batch-process", json=payload)).json()
+        single = (await client.post("/api/v1/process", json={"value": 3.0})).json()
+
+    assert len({item["timestamp"] for item in fast}) == 1
+    def without_timestamps(items):
+        return [{k: v for k, v in item.items() if k != "timestamp"} for item in items]
+
+    assert without_timestamps(fast) == without_timestamps(default)
+    assert single["processed_value"] == 6.0
+    assert "prediction" not in single
+
+@pytest.mark.asyncio
+async def test_msgpack_responses():
+    """Test Accept: application/msgpack selects msgpack encoding"""
+    msgpack = pytest.importorskip("msgpack")
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/batch-process/columnar",
+            json={"values": [1.0, 2.0]},
+            headers={"Accept": "application/msgpack"},
+        )
+        assert response.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content)["processed_values"] == [2.0, 4.0]
+
+@pytest.mark.asyncio
+async def test_batch_process_columnar_json():
+    """Test columnar batch processing with a JSON body"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        payload = {"values": [5.0, 10.0, 15.0], "ids": [1, 2, 3]}
+        response = await client.post("/api/v1/batch-process/columnar", json=payload)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 3
+        assert data["operation"] == "multiply_by_2"
+        assert data["processed_values"] == [10.0, 20.0, 30.0]
+        assert data["ids"] == [1, 2, 3]
+
+@pytest.mark.asyncio
+async def test_batch_process_columnar_ndjson():
+    """Test columnar batch processing with an NDJSON body"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        body = '{"value": 1.5}\n{"value": 2.5}\n'
+        response = await client.post(
+            "/api/v1/batch-process/columnar",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        assert response.json()["processed_values"] == [3.0, 5.0]
+
+@pytest.mark.asyncio
+async def test_batch_process_columnar_large_batch():
+    """Test columnar batches well above the 100-item object limit"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        payload = {"values": [float(i) for i in range(100_000)]}
+        response = await client.post("/api/v1/batch-process/columnar", json=payload)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 100_000
+        assert data["processed_values"][-1] == 199_998.0
+
+@pytest.mark.asyncio
+async def test_batch_process_columnar_limits():
+    """Test columnar batch validation errors"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        too_large = {"values": [0.0] * 100_001}
+        response = await client.post("/api/v1/batch-process/columnar", json=too_large)
+        assert response.status_code == 413
+
+        response = await client.post(
+            "/api/v1/batch-process/columnar", json={"values": ["a", "b"]}
+        )
+        assert response.status_code == 422
+
+        response = await client.post(
+            "/api/v1/batch-process/columnar",
+            content="x",
+            headers={"Content-Type": "text/plain"},
+        )
+        assert response.status_code == 415
+
+@pytest.mark.asyncio
+async def test_batch_process_columnar_rejects_oversized_body():
+    """Test oversized uploads are refused before being parsed"""
+    from app.columnar import MAX_COLUMNAR_BODY_BYTES
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/batch-process/columnar",
+            content=b" " * (MAX_COLUMNAR_BODY_BYTES + 1),
+            headers={"Content-Type": "application/json"},
+        )
+        assert response.status_code == 413
+
+@pytest.mark.asyncio
+async def test_batch_process_columnar_ids_must_be_integral():
+    """Test ids follow DataPoint.id rules instead of being truncated"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/batch-process/columnar",
+            json={"values": [1.0, 2.0], "ids": [1.9, 2.2]},
+        )
+        assert response.status_code == 422
+
+        response = await client.post(
+            "/api/v1/batch-process/columnar",
+            json={"values": [1.0, 2.0], "ids": [1.0, 2]},
+        )
+        assert response.status_code == 200
+        assert response.json()["ids"] == [1, 2]
+
+@pytest.mark.asyncio
+async def test_stream_process_ndjson():
+    """Test NDJSON streaming processing, including invalid lines"""
+    import json
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        lines = [json.dumps({"value": float(i)}) for i in range(2500)]
+        lines.insert(10, '{"value": "not-a-number"}')
+        body = "\n".join(lines) + "\n"
+
+        response = await client.post(
+            "/api/v1/stream-process",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert len(records) == 2501
+        assert records[0]["processed_value"] == 0.0
+        assert records[0]["operation"] == "multiply_by_2"
+        assert records[10]["line"] == 11
+        assert "error" in records[10]
+        assert records[-1]["processed_value"] == 4998.0
+
+@pytest.mark.asyncio
+async def test_stream_process_chunked_body():
+    """Test records split across request body chunks are reassembled"""
+    import json
+
+    async def body():
+        yield b'{"value": 1.0}\n{"val'
+        yield b'ue": 2.0}\n'
+        yield b'{"value": 3.0}'
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/stream-process", content=body())
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["processed_value"] for r in records] == [2.0, 4.0, 6.0]
+
+@pytest.mark.asyncio
+async def test_ids_beyond_int64_are_counted():
+    """Test ids outside the int64 range are accepted and hashed like add_one"""
+    from app.analytics import HyperLogLog
+
+    large = [2**70, 2**63 + 5, -1]
+    batch, single = HyperLogLog(), HyperLogLog()
+    batch.add(large)
+    for value in large:
+        single.add_one(value)
+    assert (batch.registers == single.registers).all()
+    assert batch.count() == 3
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/batch-process",
+            json=[{"id": 2**70, "value": 1.0}, {"id": 2**63, "value": 2.0}],
+        )
+        assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_anomaly_score_flags_outlier():
+    """Test a spike is flagged once a series has a baseline"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        baseline = [
+            {"id": 9001, "value": 100.0 + (i % 5)} for i in range(200)
+        ]
+        response = await client.post("/api/v1/anomaly/score", json=baseline)
+        assert response.status_code == 200
+        scores = response.json()
+        assert len(scores) == 200
+        assert not any(s["is_anomaly"] for s in scores)
+
+        response = await client.post(
+            "/api/v1/anomaly/score", json={"id": 9001, "value": 500.0}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["series"] == "9001"
+        assert data["is_anomaly"] is True
+
+def test_anomaly_flat_baseline_then_spike():
+    """Test a spike after a flat baseline is flagged and the MAD recovers"""
+    from app.anomaly import AnomalyDetector
+
+    detector = AnomalyDetector()
+    for i in range(40):
+        detector.score("flat", 5.0, i)
+
+    spike = detector.score("flat", 1000.0, 40)
+    assert spike["is_anomaly"] is True
+
+    # Once the series starts varying, its spread leaves zero and ordinary
+    # variation stops being flagged
+    flagged = [
+        detector.score("flat", 5.0 + (i % 7) - 3, 41 + i)["is_anomaly"]
+        for i in range(200)
+    ]
+    assert detector._series["flat"].mad > 1.0
+    assert not any(flagged[-100:])
+
+@pytest.mark.asyncio
+async def test_anomaly_score_series_key_field():
+    """Test points are grouped by a metadata field when one is named"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/anomaly/score?series_key_field=host",
+            json=[
+                {"value": 1.0, "metadata": {"host": "web-1"}},
+                {"id": 7, "value": 1.0},
+            ],
+        )
+        assert response.status_code == 200
+        assert [s["series"] for s in response.json()] == ["web-1", "7"]
+
+@pytest.mark.asyncio
+async def test_batching_scorer_batches_and_hot_reloads(tmp_path):
+    """Test concurrent calls share one model call and reloads swap the model"""
+    import asyncio
+    import json
+    import os
+    from app.scoring import BatchingScorer
+
+    model_path = tmp_path / "model.json"
+    model_path.write_text(json.dumps({"type": "linear", "coef": 3.0}))
+    scorer = BatchingScorer(str(model_path), max_wait_ms=20, reload_interval=0)
+
+    results = await asyncio.gather(*(scorer.score([i, i + 1]) for i in range(10)))
+    expected = [[3.0 * i, 3.0 * i + 3.0] for i in range(10)]
+    assert [r.tolist() for r in results] == expected
+    assert scorer.batches == 1
+    assert scorer.points == 20
+
+    model_path.write_text("{not json")
+    assert scorer.reload() is False
+    assert (await scorer.score([1.0])).tolist() == [3.0]
+
+    model_path.write_text(json.dumps({"type": "linear", "coef": 1.0, "intercept": 5}))
+    stat = os.stat(model_path)
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert scorer.reload() is True
+    assert scorer.version == 2
+    assert (await scorer.score([1.0])).tolist() == [6.0]
+
+@pytest.mark.asyncio
+async def test_process_with_model(tmp_path, monkeypatch):
+    """Test processing endpoints include model scores when a model is loaded"""
+    import json
+    from app import main
+    from app.scoring import BatchingScorer
+
+    model_path = tmp_path / "model.json"
+    model_path.write_text(json.dumps({"type": "linear", "coef": -1.0}))
+    monkeypatch.setattr(main, "model_scorer", BatchingScorer(str(model_path)))
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/process", json={"value": 4.0})
+        assert response.json()["prediction"] == -4.0
+
+        response = await client.post(
+            "/api/v1/batch-process", json=[{"value": 1.0}, {"value": 2.0}]
+        )
+        assert [r["prediction"] for r in response.json()] == [-1.0, -2.0]
+
+        response = await client.get("/api/v1/model")
+        assert response.json()["model"] == "LinearModel"
+
+@pytest.mark.asyncio
+async def test_jobs_process_large_dataset_in_background(tmp_path, monkeypatch):
+    """Test a job is processed by the worker pool while the service stays up"""
+    import asyncio
+    from app import main
+    from app.jobs import JobManager
+
+    manager = JobManager(str(tmp_path), max_workers=1, chunk_size=1000)
+    monkeypatch.setattr(main, "job_manager", manager)
+    values = [float(i) for i in range(5000)]
+
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/jobs", json={"values": values, "ids": list(range(5000))}
+            )
+            assert response.status_code == 202
+            job = response.json()
+            assert job["status"] == "queued"
+            status_url, results_url = job["status_url"], job["results_url"]
+
+            for _ in range(300):
+                assert (await client.get("/health")).status_code == 200
+                job = (await client.get(status_url)).json()
+                if job["status"] in ("completed", "failed"):
+                    break
+                await asyncio.sleep(0.1)
+            assert job["status"] == "completed", job
+            assert job["processed"] == job["total"] == 5000
+            assert job["progress"] == 1.0
+
+            response = await client.get(
+                results_url, params={"offset": 4998, "limit": 10}
+            )
+            page = response.json()
+            assert page["count"] == 2
+            assert page["ids"] == [4998, 4999]
+            assert page["processed_values"] == [9996.0, 9998.0]
+    finally:
+        manager.shutdown()
+
+@pytest.mark.asyncio
+async def test_jobs_errors(tmp_path, monkeypatch):
+    """Test unknown jobs, invalid bodies and oversized uploads"""
+    import asyncio
+    from app import main
+    from app.jobs import JobManager
+
+    manager = JobManager(str(tmp_path), max_workers=1, max_points=10)
+    monkeypatch.setattr(main, "job_manager", manager)
+
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.get("/api/v1/jobs/not-a-job")
+            assert response.status_code == 404
+            response = await client.get("/api/v1/jobs/" + "0" * 32 + "/results")
+            assert response.status_code == 404
+
+            response = await client.post(
+                "/api/v1/jobs", content=b"x" * 1000,
+                headers={"content-type": "application/json"}
+            )
+            assert response.status_code == 413
+
+            response = await client.post(
+                "/api/v1/jobs", content=b"{not json",
+                headers={"content-type": "application/json"}
+            )
+            status_url = response.json()["status_url"]
+            for _ in range(300):
+                job = (await client.get(status_url)).json()
+                if job["status"] == "failed":
+                    break
+                await asyncio.sleep(0.1)
+            assert job["status"] == "failed"
+            assert job["error"]
+
+            response = await client.get(f"/api/v1/jobs/{job['job_id']}/results")
+            assert response.status_code == 409
+    finally:
+        manager.shutdown()
+
+@pytest.mark.asyncio
+async def test_idempotency_key_replays_result():
+    """Test a retried request is served from the result cache"""
+    from app import main
+
+    before = main.analytics.points
+    headers = {"Idempotency-Key": "retry-test-1"}
+    payload = [{"value": 1.5}, {"value": 2.5}]
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.post(
+            "/api/v1/batch-process", json=payload, headers=headers
+        )
+        retry = await client.post(
+            "/api/v1/batch-process", json=payload, headers=headers
+        )
+        assert first.headers["x-cache"] == "MISS"
+        assert retry.headers["x-cache"] == "HIT"
+        assert retry.json() == first.json()
+        assert [r["processed_value"] for r in retry.json()] == [3.0, 5.0]
+        # Replays still count as requests the client made
+        assert main.analytics.points == before + 4
+
+        # Without a key, identical bodies are not deduplicated by default
+        plain = [
+            await client.post("/api/v1/process", json={"value": 7.0})
+            for _ in range(2)
+        ]
+        assert all("x-cache" not in response.headers for response in plain)
+
+        conflict = await client.post(
+            "/api/v1/batch-process", json=[{"value": 9.0}], headers=headers
+        )
+        assert conflict.status_code == 422
+
+        metrics = (await client.get("/metrics")).text
+        assert (
+            'result_cache_lookups_total{endpoint="/api/v1/batch-process",'
+            'result="hit"}' in metrics
+        )
+
+@pytest.mark.asyncio
+async def test_result_cache_coalesces_concurrent_duplicates():
+    """Test concurrent identical requests share one computation"""
+    import asyncio
+    from app.cache import MemoryBackend, ResultCache
+
+    cache = ResultCache(MemoryBackend(ttl_seconds=60), by_content=True)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "application/json", b"[]"
+
+    key, fingerprint = cache.key_for("/test", b"payload")
+    results = await asyncio.gather(
+        *(cache.fetch("/test", key, fingerprint, compute) for _ in range(20))
+    )
+    assert calls == 1
+    assert sorted(outcome for _, outcome in results) == ["coalesced"] * 19 + ["miss"]
+    assert (await cache.fetch("/test", key, fingerprint, compute))[1] == "hit"
+
+@pytest.mark.asyncio
+async def test_memory_backend_is_bounded():
+    """Test the in-memory backend evicts by size and expires by age"""
+    from app.cache import MemoryBackend
+
+    backend = MemoryBackend(ttl_seconds=60, max_entries=3, max_bytes=1000)
+    for i in range(5):
+        await backend.set(f"k{i}", b"x" * 100)
+    assert len(backend) == 3
+    assert await backend.get("k0") is None
+    assert await backend.get("k4") == b"x" * 100
+
+    await backend.set("big", b"x" * 900)
+    assert backend.size <= 1000
+
+    expired = MemoryBackend(ttl_seconds=-1)
+    await expired.set("k", b"x")
+    assert await expired.get("k") is None
+
+@pytest.mark.asyncio
+async def test_event_time_windows():
+    """Test tumbling/sliding window aggregates, watermarks and late data"""
+    import time
+    from datetime import datetime, timezone
+
+    base = (int(time.time()) // 3600 - 1) * 3600
+    def point(offset, value):
+        stamp = datetime.fromtimestamp(base + offset, tz=timezone.utc)
+        return {"value": value, "timestamp": stamp.isoformat(),
+                "metadata": {"host": "window-test"}}
+
+    # Three 60s panes, the middle one arriving out of order
+    points = [point(i, float(i)) for i in range(0, 60)]
+    points += [point(120 + i, 100.0) for i in range(30)]
+    points += [point(60 + i, 10.0) for i in range(30)]
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/windows/ingest?series_key_field=host", json=points
+        )
+        assert response.json() == {"accepted": 120, "late": 0, "future": 0}
+
+        # The watermark has moved past the first pane: it no longer accepts
+        response = await client.post(
+            "/api/v1/windows/ingest?series_key_field=host",
+            json=[point(300, 1.0), point(10, 1.0)],
+        )
+        assert response.json() == {"accepted": 1, "late": 1, "future": 0}
+
+        response = await client.get("/api/v1/windows/window-test?size=60")
+        result = response.json()
+        assert result["late_points"] == 1
+        first, second, third, last = result["windows"]
+        assert (first["start"], first["end"]) == (base, base + 60)
+        assert first["count"] == 60 and first["sum"] == sum(range(60))
+        assert (first["min"], first["max"]) == (0.0, 59.0)
+        assert first["quantiles"]["0.5"] in (29.0, 30.0)
+        assert first["final"] and not last["final"]
+        assert second["mean"] == 10.0 and third["mean"] == 100.0
+
+        response = await client.get(
+            "/api/v1/windows/window-test?size=120&slide=60&q=0.9"
+        )
+        windows = response.json()["windows"]
+        assert [w["start"] - base for w in windows] == [-60, 0, 60, 120, 240, 300]
+        assert windows[1]["count"] == 90
+        assert windows[2]["quantiles"]["0.9"] == 100.0
+
+        response = await client.get("/api/v1/windows/window-test?size=90")
+        assert response.status_code == 400
+        response = await client.get("/api/v1/windows/missing-series")
+        assert response.status_code == 404
+
+def test_window_memory_is_bounded():
+    """Test series keep a bounded number of panes and series"""
+    from app.windows import WindowAggregator
+
+    windows = WindowAggregator(pane_seconds=1, retention_panes=10, max_series=5)
+    now = 1_000_000.0
+    for series in range(8):
+        for i in range(100):
+            windows.add(str(series), 1.0, now - 100 + i, now)
+    assert len(windows) == 5
+    assert len(windows._series["7"].panes) <= 11
+    assert windows.add("7", 1.0, now + 3600, now) == "future"
+
+def test_window_query_cost_ignores_timestamp_spread():
+    """Test old panes are pruned by age and queries scan only retention"""
+    import time
+    from app.windows import WindowAggregator
+
+    windows = WindowAggregator(pane_seconds=1, retention_panes=10)
+    now = 1_000_000_000.0
+    assert windows.add("spread", 1.0, 0.0, now) == "accepted"
+    assert windows.add("spread", 2.0, now, now) == "accepted"
+    assert list(windows._series["spread"].panes) == [int(now)]
+
+    started = time.perf_counter()
+    result = windows.windows("spread", size=1)
+    assert time.perf_counter() - started < 0.5
+    assert [w["sum"] for w in result["windows"]] == [2.0]
+
+@pytest.mark.asyncio
+async def test_processing_pipelines():
+    """Test named operation pipelines across the processing endpoints"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/process?pipeline=scale(3)|clip(0,10)", json={"value": 4.0}
+        )
+        assert response.json()["processed_value"] == 10.0
+        assert response.json()["operation"] == "scale(3)|clip(0,10)"
+
+        payload = [{"value": v} for v in (1.0, 2.0, 4.0, 8.0)]
+        response = await client.post(
+            "/api/v1/batch-process?pipeline=diff", json=payload
+        )
+        assert [r["processed_value"] for r in response.json()] == [0.0, 1.0, 2.0, 4.0]
+
+        response = await client.post(
+            "/api/v1/batch-process/columnar?pipeline=rolling_mean(2)",
+            json={"values": [1.0, 3.0, 5.0]},
+        )
+        assert response.json()["processed_values"] == [1.0, 2.0, 4.0]
+
+        for pipeline in ("nope", "clip(1)", "scale(x)", "rolling_mean(0)"):
+            response = await client.post(
+                f"/api/v1/process?pipeline={pipeline}", json={"value": 1.0}
+            )
+            assert response.status_code == 400, pipeline
+
+        response = await client.post(
+            "/api/v1/process?pipeline=log", json={"value": -1.0}
+        )
+        assert response.status_code == 400
+
+def test_pipeline_operations():
+    """Test each registered operation over a whole batch"""
+    import numpy as np
+    from app.pipeline import compile_pipeline
+
+    values = np.array([1.0, 2.0, 3.0, 4.0])
+    logs = compile_pipeline("offset(1)|log")(values)
+    assert logs.tolist() == np.log(values + 1).tolist()
+    zscores = compile_pipeline("zscore")(values)
+    assert abs(zscores.mean()) < 1e-12 and abs(zscores.std() - 1) < 1e-12
+    assert compile_pipeline("zscore")(np.ones(3)).tolist() == [0.0, 0.0, 0.0]
+    pipeline = compile_pipeline(" scale( 2 ) | multiply_by_2 ")
+    assert pipeline.name == "scale(2)|multiply_by_2"
+    assert compile_pipeline("diff") is compile_pipeline("diff")
+
+@pytest.mark.asyncio
+async def test_admission_token_buckets():
+    """Test per-client and global rate limits shed load with Retry-After"""
+    from app.admission import AdmissionMiddleware
+
+    limited = AdmissionMiddleware(
+        app,
+        routes=app.router.routes,
+        client_rate=0.01,
+        client_burst=2,
+        global_rate=0.01,
+        global_burst=3,
+        client_header="x-api-key",
+    )
+    async with AsyncClient(app=limited, base_url="http://test") as client:
+        def post(key):
+            return client.post(
+                "/api/v1/process", json={"value": 1.0}, headers={"x-api-key": key}
+            )
+
+        assert [(await post("a")).status_code for _ in range(3)] == [200, 200, 429]
+        response = await post("a")
+        assert int(response.headers["retry-after"]) >= 1
+
+        # Client b has tokens of its own, until the global bucket runs dry
+        assert (await post("b")).status_code == 200
+        response = await post("b")
+        assert response.status_code == 503
+        error = response.json()
+        assert error["error"] == "Service overloaded"
+        assert error["status_code"] == 503 and error["timestamp"]
+        assert (await post("a")).json()["status_code"] == 429
+
+        # Health and metrics stay reachable
+        assert (await client.get("/health")).status_code == 200
+        metrics = (await client.get("/metrics")).text
+        assert (
+            'http_requests_shed_total{endpoint="/api/v1/process",'
+            'reason="client_rate"}' in metrics
+        )
+
+@pytest.mark.asyncio
+async def test_admission_in_flight_limit():
+    """Test a route sheds requests beyond its in-flight limit"""
+    import asyncio
+    from app.admission import AdmissionMiddleware
+
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await app(scope, receive, send)
+
+    limited = AdmissionMiddleware(
+        slow_app, routes=app.router.routes, max_in_flight=2
+    )
+    async with AsyncClient(app=limited, base_url="http://test") as client:
+        pending = [
+            asyncio.ensure_future(client.get("/api/v1/analytics/summary"))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        response = await client.get("/api/v1/analytics/summary")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+
+        release.set()
+        assert [(await p).status_code for p in pending] == [200, 200]
+        response = await client.get("/api/v1/analytics/summary")
+        assert response.status_code == 200
+
+def test_startup_within_budget(tmp_path):
+    """Test a fresh import starts within budget and uses a pre-generated schema"""
+    import json
+    import os
+    import subprocess
+    import sys
+    from app.startup import DEFAULT_STARTUP_BUDGET
+
+    schema_path = tmp_path / "openapi.json"
+    schema_path.write_text(json.dumps(app.openapi()))
+    script = (
+        "import json, time\n"
+        "start = time.perf_counter()\n"
+        "import app.main\n"
+        "print(json.dumps({'seconds': time.perf_counter() - start,\n"
+        "                  'phases': app.main.startup.phases,\n"
+        "                  'preloaded': app.main.app.openapi_schema is not None}))\n"
+    )
+    service_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=service_dir,
+        env={**os.environ, "OPENAPI_SCHEMA_PATH": str(schema_path)},
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result["seconds"] < DEFAULT_STARTUP_BUDGET
+    assert sum(result["phases"].values()) < DEFAULT_STARTUP_BUDGET
+    assert set(result["phases"]) == {"imports", "app"}
+    assert result["preloaded"]
+
+@pytest.mark.asyncio
+async def test_readiness_flips_after_warm_up(monkeypatch):
+    """Test /ready reports 503 until warm-up finishes, while /health is up"""
+    import asyncio
+    from app import main
+    from app.startup import StartupTracker
+
+    monkeypatch.setattr(main, "startup", StartupTracker())
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming_up"
+        assert (await client.get("/health")).status_code == 200
+
+        async with app.router.lifespan_context(app):
+            for _ in range(100):
+                response = await client.get("/ready")
+                if response.status_code == 200:
+                    break
+                await asyncio.sleep(0.05)
+        assert response.status_code == 200
+        report = response.json()
+        assert report["ready"] is True
+        assert set(report["phases_seconds"]) == {"server", "warmup"}
+
+def test_load_benchmark_baseline_and_compare(tmp_path):
+    """Test the load benchmark saves baselines and fails on regressions"""
+    import json
+    from benchmarks import bench_load
+
+    baseline_path = tmp_path / "baseline.json"
+    assert bench_load.main([
+        "--requests", "5", "--concurrency", "2", "--batch-sizes", "3",
+        "--save", str(baseline_path),
+    ]) == 0
+    baseline = json.loads(baseline_path.read_text())
+    assert set(baseline["results"]) == {
+        "process concurrency=2",
+        "batch-process batch=3 concurrency=2",
+        "metrics concurrency=2",
+    }
+    result = baseline["results"]["batch-process batch=3 concurrency=2"]
+    assert result["errors"] == 0 and result["p50_ms"] <= result["p99_ms"]
+
+    # A baseline twice as fast as the saved results flags a regression
+    faster = {"results": {
+        key: {**result, "throughput_rps": result["throughput_rps"] * 2}
+        for key, result in baseline["results"].items()
+    }}
+    faster_path = tmp_path / "faster.json"
+    faster_path.write_text(json.dumps(faster))
+    assert bench_load.main(
+        ["--input", str(baseline_path), "--compare", str(faster_path)]
+    ) == 1
+    assert bench_load.main(
+        ["--input", str(baseline_path), "--compare", str(baseline_path)]
+    ) == 0
+
+@pytest.mark.asyncio
+async def test_debug_profile_guarded_and_collapsed(monkeypatch):
+    """Test /debug/profile needs its token and returns collapsed stacks"""
+    import asyncio
+    import time
+    from app import main
+
+    def busy_worker():
+        deadline = time.monotonic() + 0.3
+        while time.monotonic() < deadline:
+            pass
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        monkeypatch.setattr(main, "profile_token", None)
+        response = await client.get("/debug/profile?seconds=0.1")
+        assert response.status_code == 404
+
+        monkeypatch.setattr(main, "profile_token", "secret")
+        response = await client.get(
+            "/debug/profile?seconds=0.1", headers={"X-Profile-Token": "wrong"}
+        )
+        assert response.status_code == 403
+        response = await client.get(
+            "/debug/profile?seconds=120", headers={"X-Profile-Token": "secret"}
+        )
+        assert response.status_code == 422
+
+        work = asyncio.get_running_loop().run_in_executor(None, busy_worker)
+        response, busy = await asyncio.gather(
+            client.get(
+                "/debug/profile?seconds=0.2", headers={"X-Profile-Token": "secret"}
+            ),
+            client.get(
+                "/debug/profile?seconds=0.2", headers={"X-Profile-Token": "secret"}
+            ),
+        )
+        await work
+
+    statuses = sorted([response.status_code, busy.status_code])
+    assert statuses == [200, 409]
+    profile = response if response.status_code == 200 else busy
+    assert profile.headers["content-type"].startswith("text/plain")
+    lines = profile.text.splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+    assert any("busy_worker (tests/test_main.py" in line for line in lines)
+
+@pytest.mark.asyncio
+async def test_profiler_end_does_not_block_event_loop(monkeypatch):
+    """Test the sampler thread is joined off the event loop"""
+    import asyncio
+    import time
+    from app.profiling import Profiler, StackSampler
+
+    join = StackSampler.join
+
+    def slow_join(self):
+        time.sleep(0.2)
+        join(self)
+
+    monkeypatch.setattr(StackSampler, "join", slow_join)
+    profiler = Profiler()
+    sampler = profiler.begin()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0)
+    await profiler.end(sampler)
+    task.cancel()
+
+    assert ticks >= 5
+    # The lock is released, so another profile can start
+    await profiler.end(profiler.begin())
+
+@pytest.mark.asyncio
+async def test_event_loop_lag_monitor():
+    """Test a callback blocking the loop shows up as event loop lag"""
+    import asyncio
+    import time
+    from prometheus_client import REGISTRY
+    from app.instrumentation import monitor_event_loop_lag
+
+    before = REGISTRY.get_sample_value("event_loop_lag_seconds_sum") or 0.0
+    task = asyncio.ensure_future(monitor_event_loop_lag(0.01))
+    await asyncio.sleep(0.02)
+    time.sleep(0.1)
+    await asyncio.sleep(0.02)
+    task.cancel()
+
+    lag = REGISTRY.get_sample_value("event_loop_lag_seconds_sum") - before
+    assert lag >= 0.05
+
+def test_websocket_channel_text_and_binary_frames():
+    """Test the WebSocket channel answers JSON and binary frames in order"""
+    import json
+    import numpy as np
+    from prometheus_client import REGISTRY
+    from starlette.testclient import TestClient
+
+    def points():
+        return REGISTRY.get_sample_value(
+            "websocket_points_total", {"endpoint": "/api/v1/ws/process"}
+        ) or 0.0
+
+    before = points()
+    client = TestClient(app)
+    with client.websocket_connect("/api/v1/ws/process?pipeline=scale(3)") as ws:
+        ws.send_text(json.dumps({"id": 1, "value": 2.0}))
+        ws.send_bytes(np.array([1.0, -2.5, 4.0], dtype="<f8").tobytes())
+        ws.send_text(json.dumps([{"value": 1.0}, {"value": 5.0}]))
+        ws.send_bytes(b"\x00" * 5)
+        ws.send_text('{"value": "not a number"}')
+
+        single = json.loads(ws.receive_text())
+        assert single["processed_value"] == 6.0
+        assert single["operation"] == "scale(3)"
+        processed = np.frombuffer(ws.receive_bytes(), dtype="<f8")
+        assert processed.tolist() == [3.0, -7.5, 12.0]
+        batch = json.loads(ws.receive_text())
+        assert [r["processed_value"] for r in batch] == [3.0, 15.0]
+        assert json.loads(ws.receive_text())["frame"] == 4
+        error = json.loads(ws.receive_text())
+        assert error["frame"] == 5 and "error" in error
+
+    # Metrics are flushed when the connection closes
+    assert points() - before == 6
+
+def test_websocket_channel_survives_unexpected_errors(monkeypatch):
+    """Test a frame that fails unexpectedly gets an error reply, not a close"""
+    import json
+    from starlette.testclient import TestClient
+    from app import main
+
+    record_values = main.analytics.record_values
+
+    def failing_record(values, ids=None):
+        if len(values) == 1 and values[0] == 13.0:
+            raise RuntimeError("analytics unavailable")
+        record_values(values, ids)
+
+    monkeypatch.setattr(main.analytics, "record_values", failing_record)
+    client = TestClient(app)
+    with client.websocket_connect("/api/v1/ws/process") as ws:
+        ws.send_text(json.dumps({"value": 13.0}))
+        ws.send_text(json.dumps({"value": 1.0}))
+        assert json.loads(ws.receive_text()) == {
+            "frame": 1, "error": "internal error"
+        }
+        assert json.loads(ws.receive_text())["processed_value"] == 2.0
+
+def test_websocket_channel_rejects_invalid_pipeline():
+    """Test an invalid pipeline closes the WebSocket during the handshake"""
+    from starlette.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+
+    client = TestClient(app)
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with client.websocket_connect("/api/v1/ws/process?pipeline=nope"):
+            pass
+    assert exc_info.value.code == 1008
+
+@pytest.mark.asyncio
+async def test_websocket_channel_flow_control():
+    """Test the channel stops reading frames while its queue is full"""
+    import asyncio
+    from starlette.websockets import WebSocket
+    from app.websocket import serve_channel
+
+    frames_read = 0
+    release = asyncio.Event()
+    sent = []
+
+    async def receive():
+        nonlocal frames_read
+        if not sent:
+            return {"type": "websocket.connect"}
+        if frames_read == 10:
+            # Stay connected until every reply is sent
+            while len(sent) < 11:
+                await asyncio.sleep(0.01)
+            return {"type": "websocket.disconnect", "code": 1000}
+        frames_read += 1
+        return {"type": "websocket.receive", "text": str(frames_read)}
+
+    async def send(message):
+        sent.append(message)
+
+    async def handle(message):
+        await release.wait()
+        return 1, message["text"]
+
+    websocket = WebSocket(
+        {"type": "websocket", "path": "/ws", "headers": []}, receive, send
+    )
+    task = asyncio.ensure_future(serve_channel(websocket, handle, "/ws", 2))
+    await asyncio.sleep(0.05)
+    # One frame is being handled, two are queued and one waits to be queued
+    assert frames_read == 4
+
+    release.set()
+    await asyncio.wait_for(task, 5)
+    replies = [m["text"] for m in sent if m["type"] == "websocket.send"]
+    assert replies == [str(n) for n in range(1, 11)]
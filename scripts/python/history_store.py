@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Health History Store - Columnar time-series storage for health metrics
+Author: Joshua
+Description: Append-only, fixed-width column files with automatic rollups
+and retention, so trend queries are array slices instead of JSON parsing
+
+Layout: one directory per tier ("raw", "1m", "5m", "1h"), one file per
+column. Each file is a flat array of little-endian values, so it can be
+memory-mapped directly, e.g. numpy.memmap("raw/cpu_percent.f4", dtype="<f4").
+"""
+
+import array
+import bisect
+import datetime
+import mmap
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+
+
+# (column name, array typecode, rollup aggregation)
+COLUMNS = [
+    ("timestamp", "d", "first"),
+    ("cpu_percent", "f", "mean"),
+    ("memory_percent", "f", "mean"),
+    ("swap_percent", "f", "mean"),
+    ("disk_percent_max", "f", "mean"),
+    ("net_sent_mb", "d", "last"),
+    ("net_recv_mb", "d", "last"),
+    ("packets_sent", "q", "last"),
+    ("packets_recv", "q", "last"),
+    ("errors_in", "q", "last"),
+    ("errors_out", "q", "last"),
+    ("process_count", "i", "mean"),
+]
+
+FILE_SUFFIXES = {"d": "f8", "f": "f4", "q": "i8", "i": "i4"}
+
+# (tier name, bucket width in seconds); each tier rolls up the previous one
+TIERS = [("raw", 0), ("1m", 60), ("5m", 300), ("1h", 3600)]
+
+DEFAULT_RETENTION_DAYS = {"raw": 1, "1m": 7, "5m": 30, "1h": 365}
+
+
+def row_from_health_data(health_data):
+    """Extract the numeric history columns from a health report"""
+    disks = [disk["percent_used"] for disk in health_data.get("disk", [])]
+    network = health_data.get("network", {})
+    timestamp = health_data["timestamp"]
+    if isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+
+    return {
+        "timestamp": timestamp.timestamp(),
+        "cpu_percent": health_data["cpu"]["cpu_percent_total"],
+        "memory_percent": health_data["memory"]["percent_used"],
+        "swap_percent": health_data["memory"].get("swap_percent", 0.0),
+        "disk_percent_max": max(disks) if disks else 0.0,
+        "net_sent_mb": network.get("bytes_sent_mb", 0.0),
+        "net_recv_mb": network.get("bytes_recv_mb", 0.0),
+        "packets_sent": network.get("packets_sent", 0),
+        "packets_recv": network.get("packets_recv", 0),
+        "errors_in": network.get("errors_in", 0),
+        "errors_out": network.get("errors_out", 0),
+        "process_count": health_data.get("processes", {}).get("total_processes", 0),
+    }
+
+
+@contextmanager
+def _mapped_column(path, typecode):
+    """Memory-map a column file as a typed, read-only view"""
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if size == 0:
+        yield memoryview(array.array(typecode))
+        return
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            raw = memoryview(mm)
+            itemsize = array.array(typecode).itemsize
+            view = raw[: size - size % itemsize].cast(typecode)
+            try:
+                yield view
+            finally:
+                view.release()
+                raw.release()
+
+
+class HistoryStore:
+    """Columnar, append-only history of health metrics"""
+
+    def __init__(self, path, retention_days=None):
+        self.path = path
+        self.retention_days = dict(DEFAULT_RETENTION_DAYS)
+        self.retention_days.update(retention_days or {})
+
+        for tier, _ in TIERS:
+            self._recover(tier)
+            os.makedirs(os.path.join(self.path, tier), exist_ok=True)
+            self._repair(tier)
+
+    def _column_path(self, tier, name, typecode):
+        """File holding one column of one tier"""
+        return os.path.join(self.path, tier, f"{name}.{FILE_SUFFIXES[typecode]}")
+
+    def _recover(self, tier):
+        """
+        Finish or roll back a retention rewrite interrupted by a crash
+
+        A rewrite builds the trimmed tier in ``<tier>.new`` and swaps it in by
+        renaming directories, so every column is replaced together. If the
+        live directory is missing the swap was cut short after the old copy
+        moved aside and the new copy is complete; otherwise any leftover
+        ``.new`` directory is an unfinished rewrite and is discarded.
+        """
+        live = os.path.join(self.path, tier)
+        new = live + ".new"
+        old = live + ".old"
+
+        if not os.path.isdir(live) and os.path.isdir(new):
+            os.rename(new, live)
+        if os.path.isdir(new):
+            shutil.rmtree(new)
+        if os.path.isdir(old):
+            shutil.rmtree(old)
+
+    def _lengths(self, tier):
+        """Number of complete values in each column file of a tier"""
+        lengths = []
+        for name, typecode, _ in COLUMNS:
+            path = self._column_path(tier, name, typecode)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            lengths.append(size // array.array(typecode).itemsize)
+        return lengths
+
+    def _repair(self, tier):
+        """Truncate columns left longer than the others by an interrupted append"""
+        lengths = self._lengths(tier)
+        rows = min(lengths)
+        for (name, typecode, _), length in zip(COLUMNS, lengths):
+            path = self._column_path(tier, name, typecode)
+            itemsize = array.array(typecode).itemsize
+            if os.path.exists(path) and os.path.getsize(path) != rows * itemsize:
+                with open(path, "r+b") as f:
+                    f.truncate(rows * itemsize)
+
+    def count(self, tier="raw"):
+        """Number of rows stored in a tier"""
+        return min(self._lengths(tier))
+
+    def _write_rows(self, tier, rows, directory=None, durable=False):
+        """Append rows to every column of a tier (or of ``directory``)"""
+        directory = directory or os.path.join(self.path, tier)
+        for name, typecode, _ in COLUMNS:
+            values = array.array(typecode, [row[name] for row in rows])
+            if sys.byteorder != "little":
+                values.byteswap()
+            path = os.path.join(directory, f"{name}.{FILE_SUFFIXES[typecode]}")
+            with open(path, "ab") as f:
+                values.tofile(f)
+                if durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _replace_tier(self, tier, rows):
+        """
+        Atomically replace every column of a tier with ``rows``
+
+        The new columns are written to ``<tier>.new`` and swapped in with
+        directory renames, so a crash never leaves columns of different
+        generations side by side (see _recover).
+        """
+        live = os.path.join(self.path, tier)
+        new = live + ".new"
+        old = live + ".old"
+
+        if os.path.isdir(new):
+            shutil.rmtree(new)
+        os.makedirs(new)
+        self._write_rows(tier, rows, directory=new, durable=True)
+
+        os.rename(live, old)
+        os.rename(new, live)
+        shutil.rmtree(old)
+
+    def _last_timestamp(self, tier):
+        """Timestamp of the newest row in a tier, or None if empty"""
+        rows = self.count(tier)
+        if rows == 0:
+            return None
+        with _mapped_column(self._column_path(tier, "timestamp", "d"), "d") as ts:
+            return ts[rows - 1]
+
+    def append(self, health_data):
+        """Record one health report, then update rollups and retention"""
+        self.append_row(row_from_health_data(health_data))
+
+    def append_row(self, row):
+        """Record one sample given as a column -> value mapping"""
+        last = self._last_timestamp("raw")
+        if last is not None and row["timestamp"] < last:
+            raise ValueError("History samples must be appended in time order")
+
+        self._write_rows("raw", [row])
+        self._rollup(row["timestamp"])
+        self.apply_retention(row["timestamp"])
+
+    def _rollup(self, now):
+        """Aggregate every completed bucket into the next coarser tier"""
+        for (source, _), (target, width) in zip(TIERS, TIERS[1:]):
+            current_bucket = now - now % width
+            last_rolled = self._last_timestamp(target)
+            start = last_rolled + width if last_rolled is not None else None
+
+            data = self.query(source, start=start, end=current_bucket)
+            rows = []
+            bucket_rows = []
+            bucket = None
+            for i in range(len(data["timestamp"])):
+                ts = data["timestamp"][i]
+                ts_bucket = ts - ts % width
+                if bucket is not None and ts_bucket != bucket:
+                    rows.append(self._aggregate(bucket, bucket_rows, data))
+                    bucket_rows = []
+                bucket = ts_bucket
+                bucket_rows.append(i)
+            if bucket_rows:
+                rows.append(self._aggregate(bucket, bucket_rows, data))
+
+            if rows:
+                self._write_rows(target, rows)
+
+    def _aggregate(self, bucket, indices, data):
+        """Combine the rows at ``indices`` of ``data`` into one rollup row"""
+        row = {}
+        for name, typecode, how in COLUMNS:
+            values = [data[name][i] for i in indices]
+            if name == "timestamp":
+                row[name] = bucket
+            elif how == "last":
+                row[name] = values[-1]
+            elif typecode in ("q", "i"):
+                row[name] = int(round(sum(values) / len(values)))
+            else:
+                row[name] = sum(values) / len(values)
+        return row
+
+    def apply_retention(self, now):
+        """
+        Drop rows older than each tier's retention period
+
+        Files are only rewritten once the expired prefix grows past a tenth
+        of the retention window, so appends stay cheap.
+        """
+        for tier, _ in TIERS:
+            keep_seconds = self.retention_days[tier] * 86400
+            cutoff = now - keep_seconds
+            rows = self.count(tier)
+            if rows == 0:
+                continue
+
+            with _mapped_column(self._column_path(tier, "timestamp", "d"), "d") as ts:
+                first = ts[0]
+                expired = bisect.bisect_left(ts, cutoff, 0, rows)
+
+            if expired == 0 or first > cutoff - keep_seconds / 10:
+                continue
+
+            kept = self.query(tier, start=cutoff)
+            self._replace_tier(
+                tier,
+                [
+                    {name: kept[name][i] for name, _, _ in COLUMNS}
+                    for i in range(len(kept["timestamp"]))
+                ],
+            )
+
+    def query(self, tier="raw", start=None, end=None, columns=None):
+        """
+        Return rows with start <= timestamp < end as arrays per column
+
+        The time range is located by binary search over the memory-mapped
+        timestamp column, so only the matching slice is copied out.
+        """
+        names = columns or [name for name, _, _ in COLUMNS]
+        rows = self.count(tier)
+
+        with _mapped_column(self._column_path(tier, "timestamp", "d"), "d") as ts:
+            lo = bisect.bisect_left(ts, start, 0, rows) if start is not None else 0
+            hi = bisect.bisect_left(ts, end, 0, rows) if end is not None else rows
+
+        result = {}
+        for name, typecode, _ in COLUMNS:
+            if name not in names and name != "timestamp":
+                continue
+            path = self._column_path(tier, name, typecode)
+            values = array.array(typecode)
+            with _mapped_column(path, typecode) as view:
+                values.frombytes(view[lo:hi].cast("B"))
+            if sys.byteorder != "little":
+                values.byteswap()
+            result[name] = values
+
+        return result
@@ -15,30 +15,155 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from collections import OrderedDict
 import argparse
+import heapq
+import queue
 import sys
+import signal
+import threading
+import time
+
+
+def _cpu_busy_and_total(times):
+    """Return (busy, total) seconds for a psutil cpu_times sample"""
+    total = sum(times)
+    # guest time is already accounted for in user/nice on Linux
+    total -= getattr(times, "guest", 0) + getattr(times, "guest_nice", 0)
+    idle = times.idle + getattr(times, "iowait", 0)
+    return total - idle, total
+
+
+def _cpu_percent_between(before, after):
+    """Compute utilisation percentage between two cpu_times samples"""
+    busy_before, total_before = before
+    busy_after, total_after = after
+
+    total_delta = total_after - total_before
+    if total_delta <= 0:
+        return 0.0
+
+    busy_delta = busy_after - busy_before
+    percent = busy_delta / total_delta * 100
+    return round(min(max(percent, 0.0), 100.0), 1)
+
+
+def _ping_postgresql(conn):
+    """Run a trivial query to verify a PostgreSQL connection is alive"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
 
 
 class DatabaseChecker:
     """Check connectivity to various databases"""
 
-    def __init__(self):
+    def __init__(self, persistent=False):
         self.results = []
+        self.persistent = persistent
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+
+    def _client_key(self, db_type, config):
+        """Identify a pooled client by its connection target"""
+        return (
+            db_type,
+            config["host"],
+            config["port"],
+            config.get("database"),
+            config.get("user"),
+        )
+
+    def _checkout(self, key):
+        """Take a pooled client out of the pool, if one exists"""
+        with self._clients_lock:
+            return self._clients.pop(key, None)
+
+    def _checkin(self, key, client, close):
+        """Return a client to the pool, or close it when not persistent"""
+        if not self.persistent:
+            close(client)
+            return
+
+        with self._clients_lock:
+            previous = self._clients.pop(key, None)
+            self._clients[key] = (client, close)
+
+        if previous is not None:
+            self._close_quietly(*previous)
+
+    def _close_quietly(self, client, close):
+        """Close a client, ignoring errors from already broken connections"""
+        try:
+            close(client)
+        except Exception:
+            pass
+
+    def _probe(self, db_type, config, connect, ping, close):
+        """
+        Verify connectivity, reusing a pooled client when available
+
+        A pooled client is pinged first; only if that fails is it dropped and
+        a fresh connection opened. Clients are checked out while in use so a
+        hung probe never shares its connection with the next cycle.
+        """
+        key = self._client_key(db_type, config)
+        pooled = self._checkout(key)
+
+        if pooled is not None:
+            client, pooled_close = pooled
+            try:
+                ping(client)
+                self._checkin(key, client, pooled_close)
+                return {"status": "CONNECTED", "message": "Connection reused"}
+            except Exception:
+                self._close_quietly(client, pooled_close)
+
+        client = connect()
+        try:
+            ping(client)
+        except Exception:
+            self._close_quietly(client, close)
+            raise
+
+        self._checkin(key, client, close)
+        return {"status": "CONNECTED", "message": "Connection successful"}
+
+    def close_all(self):
+        """Close every pooled client"""
+        with self._clients_lock:
+            pooled = list(self._clients.values())
+            self._clients.clear()
+
+        for client, close in pooled:
+            self._close_quietly(client, close)
 
     def check_postgresql(self, config):
         """Check PostgreSQL connection"""
+        timeout_ms = int(config.get("timeout", 5) * 1000)
         try:
             import psycopg2
 
-            conn = psycopg2.connect(
-                host=config["host"],
-                port=config["port"],
-                database=config["database"],
-                user=config["user"],
-                password=config["password"],
-                connect_timeout=config.get("timeout", 5),
+            def connect():
+                conn = psycopg2.connect(
+                    host=config["host"],
+                    port=config["port"],
+                    database=config["database"],
+                    user=config["user"],
+                    password=config["password"],
+                    connect_timeout=config.get("timeout", 5),
+                    # Abort the ping server-side if it outlives the probe
+                    options=f"-c statement_timeout={timeout_ms}",
+                )
+                # Keep pooled connections from idling inside a transaction
+                conn.autocommit = True
+                return conn
+
+            return self._probe(
+                "postgresql",
+                config,
+                connect,
+                _ping_postgresql,
+                lambda conn: conn.close(),
             )
-            conn.close()
-            return {"status": "CONNECTED", "message": "Connection successful"}
         except ImportError:
             return {"status": "SKIPPED", "message": "psycopg2 not installed"}
         except Exception as e:
@@ -49,16 +174,26 @@ class DatabaseChecker:
         try:
             import pymysql
 
-            conn = pymysql.connect(
-                host=config["host"],
-                port=config["port"],
-                database=config["database"],
-                user=config["user"],
-                password=config["password"],
-                connect_timeout=config.get("timeout", 5),
+            def connect():
+                return pymysql.connect(
+                    host=config["host"],
+                    port=config["port"],
+                    database=config["database"],
+                    user=config["user"],
+                    password=config["password"],
+                    connect_timeout=config.get("timeout", 5),
+                    read_timeout=config.get("timeout", 5),
+                    write_timeout=config.get("timeout", 5),
+                    autocommit=True,
+                )
+
+            return self._probe(
+                "mysql",
+                config,
+                connect,
+                lambda conn: conn.ping(reconnect=False),
+                lambda conn: conn.close(),
             )
-            conn.close()
-            return {"status": "CONNECTED", "message": "Connection successful"}
         except ImportError:
             return {"status": "SKIPPED", "message": "pymysql not installed"}
         except Exception as e:
@@ -69,14 +204,22 @@ class DatabaseChecker:
         try:
             from pymongo import MongoClient
 
-            client = MongoClient(
-                host=config["host"],
-                port=config["port"],
-                serverSelectionTimeoutMS=config.get("timeout", 5) * 1000,
+            def connect():
+                return MongoClient(
+                    host=config["host"],
+                    port=config["port"],
+                    serverSelectionTimeoutMS=config.get("timeout", 5) * 1000,
+                    connectTimeoutMS=config.get("timeout", 5) * 1000,
+                    socketTimeoutMS=config.get("timeout", 5) * 1000,
+                )
+
+            return self._probe(
+                "mongodb",
+                config,
+                connect,
+                lambda client: client.server_info(),
+                lambda client: client.close(),
             )
-            client.server_info()
-            client.close()
-            return {"status": "CONNECTED", "message": "Connection successful"}
         except ImportError:
             return {"status": "SKIPPED", "message": "pymongo not installed"}
         except Exception as e:
@@ -87,47 +230,116 @@ class DatabaseChecker:
         try:
             import redis
 
-            r = redis.Redis(
-                host=config["host"],
-                port=config["port"],
-                socket_timeout=config.get("timeout", 5),
+            def connect():
+                return redis.Redis(
+                    host=config["host"],
+                    port=config["port"],
+                    socket_timeout=config.get("timeout", 5),
+                    socket_connect_timeout=config.get("timeout", 5),
+                )
+
+            return self._probe(
+                "redis", config, connect, lambda r: r.ping(), lambda r: r.close()
             )
-            r.ping()
-            return {"status": "CONNECTED", "message": "Connection successful"}
         except ImportError:
             return {"status": "SKIPPED", "message": "redis not installed"}
         except Exception as e:
             return {"status": "FAILED", "message": str(e)}
 
-    def check_all(self, db_configs):
-        """Check all configured databases"""
-        results = []
+    def check_one(self, db_config):
+        """Check a single configured database"""
+        db_type = db_config["type"].lower()
+        result = {
+            "name": db_config["name"],
+            "type": db_config["type"],
+            "host": db_config["host"],
+            "port": db_config["port"],
+        }
 
-        for db_config in db_configs:
-            db_type = db_config["type"].lower()
-            result = {
-                "name": db_config["name"],
-                "type": db_config["type"],
-                "host": db_config["host"],
-                "port": db_config["port"],
+        if db_type == "postgresql":
+            check_result = self.check_postgresql(db_config)
+        elif db_type == "mysql":
+            check_result = self.check_mysql(db_config)
+        elif db_type == "mongodb":
+            check_result = self.check_mongodb(db_config)
+        elif db_type == "redis":
+            check_result = self.check_redis(db_config)
+        else:
+            check_result = {
+                "status": "UNKNOWN",
+                "message": f"Unknown database type: {db_type}",
             }
 
-            if db_type == "postgresql":
-                check_result = self.check_postgresql(db_config)
-            elif db_type == "mysql":
-                check_result = self.check_mysql(db_config)
-            elif db_type == "mongodb":
-                check_result = self.check_mongodb(db_config)
-            elif db_type == "redis":
-                check_result = self.check_redis(db_config)
+        result.update(check_result)
+        return result
+
+    def check_all(self, db_configs, deadline=10, max_workers=16):
+        """
+        Check all configured databases concurrently
+
+        Probes run on up to ``max_workers`` threads so the total time stays
+        close to the slowest single probe. Each probe's ``timeout`` counts
+        from when a worker picks it up, so time spent queued behind other
+        probes is not charged to it; everything is also bounded by the global
+        ``deadline``. Probes that miss either limit are reported with a
+        TIMEOUT status. The workers are daemon threads, so a probe that hangs
+        never keeps a one-shot run alive past the deadline. Results are
+        returned in config order.
+        """
+        if not db_configs:
+            return []
+
+        started = time.monotonic()
+        global_end = started + deadline
+        start_times = [None] * len(db_configs)
+        start_events = [threading.Event() for _ in db_configs]
+        done_events = [threading.Event() for _ in db_configs]
+        probe_results = [None] * len(db_configs)
+        pending = queue.SimpleQueue()
+        for index in range(len(db_configs)):
+            pending.put(index)
+
+        def worker():
+            while time.monotonic() < global_end:
+                try:
+                    index = pending.get_nowait()
+                except queue.Empty:
+                    return
+                start_times[index] = time.monotonic()
+                start_events[index].set()
+                probe_results[index] = self.check_one(db_configs[index])
+                done_events[index].set()
+
+        for number in range(min(len(db_configs), max_workers)):
+            threading.Thread(
+                target=worker, name=f"db-probe-{number}", daemon=True
+            ).start()
+
+        results = []
+        for index, db_config in enumerate(db_configs):
+            probe_timeout = db_config.get("timeout", 5)
+
+            # Wait for a worker to pick the probe up, then for its own budget
+            if start_events[index].wait(max(0, global_end - time.monotonic())):
+                probe_end = min(start_times[index] + probe_timeout, global_end)
+                message = f"No response within {min(probe_timeout, deadline)}s"
             else:
-                check_result = {
-                    "status": "UNKNOWN",
-                    "message": f"Unknown database type: {db_type}",
-                }
+                probe_end = global_end
+                message = f"Not started before the {deadline}s deadline"
 
-            result.update(check_result)
-            results.append(result)
+            if done_events[index].wait(max(0, probe_end - time.monotonic())):
+                results.append(probe_results[index])
+            else:
+                results.append(
+                    {
+                        "name": db_config["name"],
+                        "type": db_config["type"],
+                        "host": db_config["host"],
+                        "port": db_config["port"],
+                        "status": "TIMEOUT",
+                        "message": message,
+                    }
+                )
 
         return results
 
@@ -305,12 +517,14 @@ class EmailAlerter:
 class SystemHealthChecker:
     """Monitor and report system health metrics with enhanced features"""
 
-    def __init__(self, config_path="config.json"):
+    def __init__(self, config_path="config.json", persistent_connections=False):
         self.timestamp = datetime.datetime.now()
         self.health_data = OrderedDict()
         self.config = self._load_config(config_path)
-        self.db_checker = DatabaseChecker()
+        self.db_checker = DatabaseChecker(persistent=persistent_connections)
         self.email_alerter = EmailAlerter(self.config.get("email", {}))
+        self._cpu_baseline = None
+        self._history_store = None
 
     def _load_config(self, config_path):
         """Load configuration from JSON file"""
@@ -337,8 +551,19 @@ class SystemHealthChecker:
                 "disk_warning": 60,
                 "disk_critical": 80,
             },
-            "databases": {"check_enabled": False, "connections": []},
-            "monitoring": {"report_path": "./", "keep_history": False},
+            "databases": {
+                "check_enabled": False,
+                "check_deadline": 10,
+                "max_workers": 16,
+                "connections": [],
+            },
+            "monitoring": {
+                "report_path": "./",
+                "keep_history": False,
+                "cpu_sample_interval": 1,
+                "top_processes": 5,
+                "history_store": {"enabled": False},
+            },
         }
 
     def get_system_info(self):
@@ -352,17 +577,53 @@ class SystemHealthChecker:
             "python_version": platform.python_version(),
         }
 
+    def start_cpu_sample(self):
+        """Take a baseline snapshot of per-CPU times for the next CPU sample"""
+        self._cpu_baseline = (time.monotonic(), psutil.cpu_times(percpu=True))
+
+    def sample_cpu_percent(self):
+        """
+        Measure per-core and total CPU usage from a single delta
+
+        Both values come from the same pair of per-CPU time snapshots, so the
+        sampling window is only waited out once. If a baseline was taken
+        earlier, only the remainder of the window is slept.
+        """
+        window = self.config.get("monitoring", {}).get("cpu_sample_interval", 1)
+
+        if self._cpu_baseline is None:
+            self.start_cpu_sample()
+
+        started, before = self._cpu_baseline
+        remaining = window - (time.monotonic() - started)
+        if remaining > 0:
+            time.sleep(remaining)
+
+        after = psutil.cpu_times(percpu=True)
+        # The closing snapshot doubles as the baseline for the next sample
+        self._cpu_baseline = (time.monotonic(), after)
+
+        before = [_cpu_busy_and_total(t) for t in before]
+        after = [_cpu_busy_and_total(t) for t in after]
+
+        per_core = [_cpu_percent_between(b, a) for b, a in zip(before, after)]
+        total = _cpu_percent_between(
+            (sum(b[0] for b in before), sum(b[1] for b in before)),
+            (sum(a[0] for a in after), sum(a[1] for a in after)),
+        )
+        return total, per_core
+
     def get_cpu_info(self):
         """Get CPU usage and information"""
-        cpu_percent = psutil.cpu_percent(interval=1, percpu=True)
-        total_percent = psutil.cpu_percent(interval=1)
+        total_percent, cpu_percent = self.sample_cpu_percent()
+        cpu_freq = psutil.cpu_freq()
 
         return {
             "cpu_count": psutil.cpu_count(logical=False),
             "cpu_count_logical": psutil.cpu_count(logical=True),
             "cpu_percent_total": total_percent,
             "cpu_percent_per_core": cpu_percent,
-            "cpu_freq": psutil.cpu_freq()._asdict() if psutil.cpu_freq() else None,
+            "cpu_freq": cpu_freq._asdict() if cpu_freq else None,
             "status": self._get_status(total_percent, "cpu"),
         }
 
@@ -422,30 +683,76 @@ class SystemHealthChecker:
             "interface_count": len(interfaces),
         }
 
-    def get_process_info(self):
-        """Get running process information"""
-        process_count = len(psutil.pids())
-        processes = []
-
-        # Get top 5 CPU consuming processes
-        for proc in sorted(
-            psutil.process_iter(["pid", "name", "cpu_percent", "memory_percent"]),
-            key=lambda p: p.info["cpu_percent"] or 0,
-            reverse=True,
-        )[:5]:
+    def prime_process_sample(self):
+        """
+        Prime per-process CPU counters at the start of the CPU window
+
+        psutil reports per-process CPU usage since the previous call on the
+        same (cached) Process object, so without this pass every process
+        reads 0.0 on the first scan.
+        """
+        for proc in psutil.process_iter():
             try:
-                processes.append(
-                    {
-                        "pid": proc.info["pid"],
-                        "name": proc.info["name"],
-                        "cpu_percent": proc.info["cpu_percent"],
-                        "memory_percent": round(proc.info["memory_percent"], 2),
-                    }
-                )
+                proc.cpu_percent(interval=None)
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 continue
 
-        return {"total_processes": process_count, "top_cpu_processes": processes}
+    def get_process_info(self):
+        """
+        Get running process information
+
+        The process table is scanned once: processes are counted and the
+        top-N by CPU, resident memory, open file descriptors and threads are
+        kept in bounded heaps instead of sorting the whole table.
+        """
+        top_n = self.config.get("monitoring", {}).get("top_processes", 5)
+        attrs = ["pid", "name", "cpu_percent", "memory_percent", "memory_info"]
+        attrs.append("num_threads")
+        if hasattr(psutil.Process, "num_fds"):
+            attrs.append("num_fds")
+
+        rankings = OrderedDict(
+            (
+                ("top_cpu_processes", "cpu_percent"),
+                ("top_memory_processes", "rss_mb"),
+                ("top_fd_processes", "num_fds"),
+                ("top_thread_processes", "num_threads"),
+            )
+        )
+        heaps = {ranking: [] for ranking in rankings}
+        process_count = 0
+
+        for proc in psutil.process_iter(attrs, ad_value=None):
+            process_count += 1
+            info = proc.info
+            memory_info = info.get("memory_info")
+            entry = {
+                "pid": info["pid"],
+                "name": info["name"],
+                "cpu_percent": info["cpu_percent"] or 0.0,
+                "memory_percent": round(info["memory_percent"] or 0.0, 2),
+                "rss_mb": round(memory_info.rss / (1024**2), 2) if memory_info else 0.0,
+                "num_fds": info.get("num_fds"),
+                "num_threads": info.get("num_threads"),
+            }
+
+            for ranking, key in rankings.items():
+                value = entry[key]
+                if value is None:
+                    continue
+                item = (value, -entry["pid"], entry)
+                heap = heaps[ranking]
+                if len(heap) < top_n:
+                    heapq.heappush(heap, item)
+                elif item[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, item)
+
+        result = {"total_processes": process_count}
+        for ranking, heap in heaps.items():
+            ordered = sorted(heap, key=lambda item: item[:2], reverse=True)
+            result[ranking] = [entry for _, _, entry in ordered]
+
+        return result
 
     def check_databases(self):
         """Check database connectivity"""
@@ -457,7 +764,11 @@ class SystemHealthChecker:
             return []
 
         print("Checking database connectivity...")
-        return self.db_checker.check_all(db_configs)
+        return self.db_checker.check_all(
+            db_configs,
+            deadline=self.config["databases"].get("check_deadline", 10),
+            max_workers=self.config["databases"].get("max_workers", 16),
+        )
 
     def _get_status(self, percent, resource_type="cpu"):
         """Determine health status based on percentage and thresholds"""
@@ -490,7 +801,7 @@ class SystemHealthChecker:
         # Check databases if enabled
         if self.health_data.get("databases"):
             db_statuses = [db["status"] for db in self.health_data["databases"]]
-            if "FAILED" in db_statuses:
+            if "FAILED" in db_statuses or "TIMEOUT" in db_statuses:
                 statuses.append("CRITICAL")
 
         if "CRITICAL" in statuses:
@@ -504,8 +815,17 @@ class SystemHealthChecker:
         """Collect all system health metrics"""
         print("Collecting system health metrics...\n")
 
+        self.timestamp = datetime.datetime.now()
+        self.health_data = OrderedDict()
         self.health_data["timestamp"] = self.timestamp.isoformat()
         self.health_data["system"] = self.get_system_info()
+
+        # Open the CPU window for the system and per-process samples together,
+        # unless the previous cycle already left a baseline behind
+        if self._cpu_baseline is None:
+            self.prime_process_sample()
+            self.start_cpu_sample()
+
         self.health_data["cpu"] = self.get_cpu_info()
         self.health_data["memory"] = self.get_memory_info()
         self.health_data["disk"] = self.get_disk_info()
@@ -614,6 +934,25 @@ class SystemHealthChecker:
         print(f"\nHealth report exported to: {filename}")
         return filename
 
+    def export_to_history(self):
+        """Append health data to the columnar history store, if enabled"""
+        history_config = self.config["monitoring"].get("history_store", {})
+        if not history_config.get("enabled", False):
+            return None
+
+        if self._history_store is None:
+            from history_store import HistoryStore
+
+            path = history_config.get("path") or os.path.join(
+                self.config["monitoring"].get("report_path", "./"), "history"
+            )
+            self._history_store = HistoryStore(
+                path, retention_days=history_config.get("retention_days")
+            )
+
+        self._history_store.append(self.health_data)
+        return self._history_store.path
+
     def send_alert(self):
         """Send email alert if conditions are met"""
         result = self.email_alerter.send_alert(self.health_data)
@@ -628,6 +967,92 @@ class SystemHealthChecker:
         return result
 
 
+def get_exit_code(checker, quiet=False):
+    """Map overall health to an exit code, printing a summary line"""
+    exit_code = 0
+    if checker.health_data["overall_health"] == "CRITICAL":
+        if not quiet:
+            print(
+                "\n[ALERT] System is in CRITICAL state! Immediate attention required."
+            )
+        exit_code = 2
+    elif checker.health_data["overall_health"] == "WARNING":
+        if not quiet:
+            print("\n[WARNING] System resources are running high. Monitor closely.")
+        exit_code = 1
+    else:
+        if not quiet:
+            print("\n[OK] System is healthy.")
+
+    return exit_code
+
+
+def run_once(checker, quiet=False, send_alert=True):
+    """Run a single health check cycle and return its exit code"""
+    # Collect metrics
+    checker.collect_all_metrics()
+
+    # Print report unless quiet mode
+    if not quiet:
+        checker.print_report()
+
+    # Export to JSON
+    checker.export_to_json()
+
+    # Append to the columnar history store
+    try:
+        checker.export_to_history()
+    except Exception as e:
+        print(f"\nWarning: Could not update history store: {str(e)}")
+
+    # Send email alert if needed
+    if send_alert:
+        checker.send_alert()
+
+    return get_exit_code(checker, quiet)
+
+
+def run_daemon(checker, interval, quiet=False, stop_event=None):
+    """
+    Run health checks every ``interval`` seconds until stopped
+
+    The same checker is reused across cycles, so config, imports, the CPU
+    baseline and pooled database connections survive between ticks. Email
+    alerts are only sent when the overall health changes, so a persistent
+    WARNING does not trigger a message every cycle.
+    """
+    stop_event = stop_event or threading.Event()
+    last_health = None
+
+    def _stop(signum, frame):
+        stop_event.set()
+
+    previous_handler = None
+    if threading.current_thread() is threading.main_thread():
+        previous_handler = signal.signal(signal.SIGTERM, _stop)
+
+    try:
+        while not stop_event.is_set():
+            cycle_start = time.monotonic()
+
+            try:
+                run_once(checker, quiet=quiet, send_alert=False)
+                if checker.health_data["overall_health"] != last_health:
+                    checker.send_alert()
+                    last_health = checker.health_data["overall_health"]
+            except Exception as e:
+                print(f"\nError during health check cycle: {str(e)}")
+
+            elapsed = time.monotonic() - cycle_start
+            stop_event.wait(max(0, interval - elapsed))
+    finally:
+        checker.db_checker.close_all()
+        if previous_handler is not None:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+    return 0
+
+
 def main():
     """Main execution function"""
     parser = argparse.ArgumentParser(
@@ -640,43 +1065,36 @@ def main():
         "--no-email", action="store_true", help="Disable email alerts for this run"
     )
     parser.add_argument("--quiet", action="store_true", help="Suppress console output")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and emit a report every --interval seconds",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=60,
+        help="Seconds between health checks in daemon mode (default: 60)",
+    )
 
     args = parser.parse_args()
 
-    checker = SystemHealthChecker(config_path=args.config)
+    if args.interval <= 0:
+        parser.error("--interval must be greater than 0")
+
+    checker = SystemHealthChecker(
+        config_path=args.config, persistent_connections=args.daemon
+    )
 
     # Disable email if flag is set
     if args.no_email:
         checker.email_alerter.enabled = False
 
-    # Collect metrics
-    checker.collect_all_metrics()
-
-    # Print report unless quiet mode
-    if not args.quiet:
-        checker.print_report()
-
-    # Export to JSON
-    checker.export_to_json()
-
-    # Send email alert if needed
-    checker.send_alert()
-
-    # Exit with appropriate status code
-    exit_code = 0
-    if checker.health_data["overall_health"] == "CRITICAL":
-        if not args.quiet:
-            print(
-                "\n[ALERT] System is in CRITICAL state! Immediate attention required."
-            )
-        exit_code = 2
-    elif checker.health_data["overall_health"] == "WARNING":
-        if not args.quiet:
-            print("\n[WARNING] System resources are running high. Monitor closely.")
-        exit_code = 1
+    if args.daemon:
+        exit_code = run_daemon(checker, args.interval, quiet=args.quiet)
     else:
-        if not args.quiet:
-            print("\n[OK] System is healthy.")
+        # Exit with appropriate status code
+        exit_code = run_once(checker, quiet=args.quiet)
 
     sys.exit(exit_code)
 
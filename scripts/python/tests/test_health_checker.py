@@ -6,6 +6,17 @@ import pytest
 import json
 from unittest.mock import Mock, patch, MagicMock
 import psutil
+from collections import namedtuple
+
+
+CpuTimes = namedtuple("CpuTimes", ["user", "system", "idle"])
+
+
+def cpu_times_samples(percent, cores=2):
+    """Build a pair of per-CPU snapshots that differ by the given usage"""
+    before = [CpuTimes(0.0, 0.0, 0.0)] * cores
+    after = [CpuTimes(percent, 0.0, 100.0 - percent)] * cores
+    return [before, after]
 
 
 class TestSystemHealthChecker:
@@ -13,11 +24,11 @@ class TestSystemHealthChecker:
 
     def test_cpu_check_healthy(self):
         """Test CPU check returns healthy status when below threshold"""
-        # Mock psutil.cpu_percent to return 50%
-        with patch("psutil.cpu_percent", return_value=50.0):
+        with patch("psutil.cpu_times", side_effect=cpu_times_samples(50.0)):
             from system_health_checker_v2 import SystemHealthChecker
 
             checker = SystemHealthChecker()
+            checker.config["monitoring"]["cpu_sample_interval"] = 0
 
             result = checker.get_cpu_info()
             assert result["status"] == "HEALTHY"
@@ -25,10 +36,11 @@ class TestSystemHealthChecker:
 
     def test_cpu_check_warning(self):
         """Test CPU check returns warning when above warning threshold"""
-        with patch("psutil.cpu_percent", return_value=70.0):
+        with patch("psutil.cpu_times", side_effect=cpu_times_samples(70.0)):
             from system_health_checker_v2 import SystemHealthChecker
 
             checker = SystemHealthChecker()
+            checker.config["monitoring"]["cpu_sample_interval"] = 0
 
             result = checker.get_cpu_info()
             assert result["status"] == "WARNING"
@@ -36,15 +48,36 @@ class TestSystemHealthChecker:
 
     def test_cpu_check_critical(self):
         """Test CPU check returns critical when above critical threshold"""
-        with patch("psutil.cpu_percent", return_value=90.0):
+        with patch("psutil.cpu_times", side_effect=cpu_times_samples(90.0)):
             from system_health_checker_v2 import SystemHealthChecker
 
             checker = SystemHealthChecker()
+            checker.config["monitoring"]["cpu_sample_interval"] = 0
 
             result = checker.get_cpu_info()
             assert result["status"] == "CRITICAL"
             assert result["cpu_percent_total"] == 90.0
 
+    def test_cpu_sample_single_delta(self):
+        """Test per-core and total usage come from one pair of snapshots"""
+        before = [CpuTimes(0.0, 0.0, 0.0), CpuTimes(0.0, 0.0, 0.0)]
+        after = [CpuTimes(20.0, 0.0, 80.0), CpuTimes(60.0, 0.0, 40.0)]
+
+        with patch("psutil.cpu_times", side_effect=[before, after]) as mock_times:
+            with patch("time.sleep") as mock_sleep:
+                from system_health_checker_v2 import SystemHealthChecker
+
+                checker = SystemHealthChecker()
+                checker.config["monitoring"]["cpu_sample_interval"] = 0.5
+
+                total, per_core = checker.sample_cpu_percent()
+
+                assert per_core == [20.0, 60.0]
+                assert total == 40.0
+                assert mock_times.call_count == 2
+                assert mock_sleep.call_count == 1
+                assert mock_sleep.call_args[0][0] <= 0.5
+
     def test_memory_check_healthy(self):
         """Test memory check returns healthy status"""
         mock_memory = MagicMock()
@@ -91,6 +124,38 @@ class TestSystemHealthChecker:
                 assert len(result) > 0
                 assert result[0]["status"] == "HEALTHY"
 
+    def test_process_scan_keeps_top_n(self):
+        """Test a single process scan counts processes and ranks the top N"""
+        procs = []
+        for pid in range(1, 21):
+            proc = MagicMock()
+            proc.info = {
+                "pid": pid,
+                "name": f"proc-{pid}",
+                "cpu_percent": float(pid % 7),
+                "memory_percent": pid / 10,
+                "memory_info": MagicMock(rss=(21 - pid) * 1024**2),
+                "num_threads": pid,
+                "num_fds": None if pid == 20 else pid * 2,
+            }
+            procs.append(proc)
+
+        with patch("psutil.process_iter", return_value=procs) as mock_iter:
+            from system_health_checker_v2 import SystemHealthChecker
+
+            checker = SystemHealthChecker()
+            checker.config["monitoring"]["top_processes"] = 3
+
+            result = checker.get_process_info()
+
+        assert mock_iter.call_count == 1
+        assert result["total_processes"] == 20
+        assert [p["cpu_percent"] for p in result["top_cpu_processes"]] == [6.0] * 3
+        assert [p["pid"] for p in result["top_memory_processes"]] == [1, 2, 3]
+        assert [p["pid"] for p in result["top_thread_processes"]] == [20, 19, 18]
+        # Processes without a readable FD count are skipped for that ranking
+        assert [p["pid"] for p in result["top_fd_processes"]] == [19, 18, 17]
+
     def test_overall_health_healthy(self):
         """Test overall health calculation when all systems healthy"""
         from system_health_checker_v2 import SystemHealthChecker
@@ -206,6 +271,161 @@ class TestDatabaseChecker:
             result = checker.check_postgresql(config)
             assert result["status"] == "SKIPPED"
 
+    def test_check_all_runs_probes_concurrently(self):
+        """Test probes run in parallel and results keep config order"""
+        import time
+        from system_health_checker_v2 import DatabaseChecker
+
+        def slow_probe(config):
+            time.sleep(0.2)
+            return {"status": "CONNECTED", "message": config["name"]}
+
+        checker = DatabaseChecker()
+        configs = [
+            {"name": f"cache-{i}", "type": "redis", "host": "localhost", "port": 6379}
+            for i in range(5)
+        ]
+
+        with patch.object(checker, "check_redis", side_effect=slow_probe):
+            started = time.monotonic()
+            results = checker.check_all(configs)
+            elapsed = time.monotonic() - started
+
+        assert [r["message"] for r in results] == [c["name"] for c in configs]
+        assert all(r["status"] == "CONNECTED" for r in results)
+        assert elapsed < 0.8
+
+    def test_check_all_reports_timeout_at_deadline(self):
+        """Test probes still running at the deadline are reported as TIMEOUT"""
+        import threading
+        from system_health_checker_v2 import DatabaseChecker
+
+        release = threading.Event()
+
+        def probe(config):
+            if config["name"] == "hung":
+                release.wait(5)
+            return {"status": "CONNECTED", "message": "Connection successful"}
+
+        checker = DatabaseChecker()
+        configs = [
+            {"name": "hung", "type": "redis", "host": "10.0.0.1", "port": 6379},
+            {"name": "fast", "type": "redis", "host": "localhost", "port": 6379},
+        ]
+
+        try:
+            with patch.object(checker, "check_redis", side_effect=probe):
+                results = checker.check_all(configs, deadline=0.2)
+        finally:
+            release.set()
+
+        assert results[0]["name"] == "hung"
+        assert results[0]["status"] == "TIMEOUT"
+        assert results[1]["status"] == "CONNECTED"
+
+    def test_hung_probe_does_not_delay_process_exit(self, tmp_path):
+        """Test a one-shot run exits at the deadline even if a probe hangs"""
+        import os
+        import subprocess
+        import sys
+        import time
+        import system_health_checker_v2
+
+        script = tmp_path / "hung_probe.py"
+        script.write_text(
+            "import time\n"
+            "from system_health_checker_v2 import DatabaseChecker\n"
+            "checker = DatabaseChecker()\n"
+            "checker.check_redis = lambda config: time.sleep(4)\n"
+            "config = {'name': 'hung', 'type': 'redis', 'host': 'x', 'port': 1}\n"
+            "print(checker.check_all([config], deadline=0.5)[0]['status'])\n"
+        )
+        module_dir = os.path.dirname(os.path.abspath(system_health_checker_v2.__file__))
+        env = {**os.environ, "PYTHONPATH": module_dir}
+
+        started = time.monotonic()
+        output = subprocess.run(
+            [sys.executable, str(script)], env=env, capture_output=True,
+            text=True, timeout=10,
+        )
+        elapsed = time.monotonic() - started
+
+        assert output.stdout.strip() == "TIMEOUT"
+        assert elapsed < 3
+
+    def test_check_all_timeout_starts_when_probe_runs(self):
+        """Test queued probes are not charged for time spent waiting for a worker"""
+        import time
+        from system_health_checker_v2 import DatabaseChecker
+
+        def probe(config):
+            time.sleep(0.3)
+            return {"status": "CONNECTED", "message": "Connection successful"}
+
+        checker = DatabaseChecker()
+        configs = [
+            {
+                "name": f"cache-{i}",
+                "type": "redis",
+                "host": "localhost",
+                "port": 6379,
+                "timeout": 0.5,
+            }
+            for i in range(3)
+        ]
+
+        with patch.object(checker, "check_redis", side_effect=probe):
+            results = checker.check_all(configs, deadline=5, max_workers=1)
+
+        # The third probe starts ~0.6s in, past its 0.5s timeout from the call start
+        assert [r["status"] for r in results] == ["CONNECTED"] * 3
+
+    def test_persistent_checker_reuses_client(self):
+        """Test pooled clients are reused across checks and closed on demand"""
+        mock_redis_module = MagicMock()
+        mock_client = Mock()
+        mock_client.ping.return_value = True
+        mock_redis_module.Redis.return_value = mock_client
+
+        with patch.dict("sys.modules", {"redis": mock_redis_module}):
+            from system_health_checker_v2 import DatabaseChecker
+
+            checker = DatabaseChecker(persistent=True)
+            config = {"host": "localhost", "port": 6379, "timeout": 5}
+
+            first = checker.check_redis(config)
+            second = checker.check_redis(config)
+
+            assert first["status"] == "CONNECTED"
+            assert second["message"] == "Connection reused"
+            assert mock_redis_module.Redis.call_count == 1
+            assert mock_client.ping.call_count == 2
+
+            checker.close_all()
+            mock_client.close.assert_called_once()
+
+    def test_persistent_checker_reconnects_on_failure(self):
+        """Test a broken pooled client is dropped and replaced"""
+        mock_redis_module = MagicMock()
+        broken_client = Mock()
+        broken_client.ping.side_effect = [True, Exception("Connection reset")]
+        fresh_client = Mock()
+        fresh_client.ping.return_value = True
+        mock_redis_module.Redis.side_effect = [broken_client, fresh_client]
+
+        with patch.dict("sys.modules", {"redis": mock_redis_module}):
+            from system_health_checker_v2 import DatabaseChecker
+
+            checker = DatabaseChecker(persistent=True)
+            config = {"host": "localhost", "port": 6379, "timeout": 5}
+
+            checker.check_redis(config)
+            result = checker.check_redis(config)
+
+            assert result["status"] == "CONNECTED"
+            assert mock_redis_module.Redis.call_count == 2
+            broken_client.close.assert_called_once()
+
 
 class TestReportGeneration:
     """Test report generation and export"""
@@ -251,6 +471,35 @@ class TestCommandLineArguments:
         # This would test loading a custom config.json
         pass
 
+    def test_daemon_reuses_checker_each_tick(self, tmp_path):
+        """Test daemon mode runs cycles on one checker until stopped"""
+        import threading
+        from system_health_checker_v2 import SystemHealthChecker, run_daemon
+
+        checker = SystemHealthChecker(persistent_connections=True)
+        checker.config["monitoring"]["report_path"] = str(tmp_path)
+        stop_event = threading.Event()
+        cycles = []
+
+        def fake_collect():
+            cycles.append(checker)
+            checker.health_data = {"overall_health": "HEALTHY"}
+            if len(cycles) == 3:
+                stop_event.set()
+
+        with patch.object(checker, "collect_all_metrics", side_effect=fake_collect):
+            with patch.object(checker, "send_alert") as mock_alert:
+                with patch.object(checker.db_checker, "close_all") as mock_close:
+                    exit_code = run_daemon(
+                        checker, interval=0.01, quiet=True, stop_event=stop_event
+                    )
+
+        assert exit_code == 0
+        assert len(cycles) == 3
+        # Alerts fire on health changes only, not on every tick
+        assert mock_alert.call_count == 1
+        mock_close.assert_called_once()
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
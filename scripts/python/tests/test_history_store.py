@@ -0,0 +1,143 @@
+"""
+Unit tests for the columnar health history store
+"""
+
+import os
+import pytest
+
+from history_store import COLUMNS, HistoryStore, row_from_health_data
+
+
+HOUR_START = 1_699_999_200  # aligned to a whole hour
+
+
+def make_row(timestamp, cpu=10.0, packets=0):
+    """Build a history row with every column filled in"""
+    row = {name: 0 for name, _, _ in COLUMNS}
+    row.update(
+        {"timestamp": float(timestamp), "cpu_percent": cpu, "packets_sent": packets}
+    )
+    return row
+
+
+class TestHistoryStore:
+    """Test HistoryStore class"""
+
+    def test_append_and_query_range(self, tmp_path):
+        """Test range queries return only rows inside [start, end)"""
+        store = HistoryStore(str(tmp_path))
+        for i in range(10):
+            store.append_row(make_row(HOUR_START + i * 15, cpu=float(i)))
+
+        result = store.query("raw", start=HOUR_START + 30, end=HOUR_START + 90)
+
+        assert list(result["timestamp"]) == [HOUR_START + 30 + i * 15 for i in range(4)]
+        assert list(result["cpu_percent"]) == [2.0, 3.0, 4.0, 5.0]
+
+    def test_fixed_width_storage(self, tmp_path):
+        """Test each sample costs a fixed, small number of bytes"""
+        store = HistoryStore(str(tmp_path))
+        for i in range(100):
+            store.append_row(make_row(HOUR_START + i * 15))
+
+        raw_dir = tmp_path / "raw"
+        total = sum(os.path.getsize(raw_dir / name) for name in os.listdir(raw_dir))
+
+        assert store.count("raw") == 100
+        assert total / 100 < 100
+
+    def test_rollups_cascade(self, tmp_path):
+        """Test completed buckets roll up 1m -> 5m -> 1h"""
+        store = HistoryStore(str(tmp_path))
+        for i in range(0, 3600 + 60, 15):
+            store.append_row(make_row(HOUR_START + i, cpu=float(i % 60), packets=i))
+
+        assert store.count("1m") == 60  # the last minute is still open
+        assert store.count("5m") == 12
+        assert store.count("1h") == 1
+
+        minute = store.query("1m", end=HOUR_START + 60)
+        assert list(minute["timestamp"]) == [HOUR_START]
+        assert minute["cpu_percent"][0] == pytest.approx(22.5)
+        assert minute["packets_sent"][0] == 45  # counters keep the last value
+
+    def test_retention_drops_old_rows(self, tmp_path):
+        """Test rows older than the retention window are removed"""
+        store = HistoryStore(str(tmp_path), retention_days={"raw": 1 / 24})
+        for i in range(0, 3 * 3600, 60):
+            store.append_row(make_row(HOUR_START + i))
+
+        oldest = store.query("raw")["timestamp"][0]
+        newest = HOUR_START + 3 * 3600 - 60
+
+        assert newest - oldest <= 3600 * 1.1
+        assert store.count("1m") == 3 * 60 - 1
+
+    def test_interrupted_retention_rewrite_is_rolled_back(self, tmp_path):
+        """Test a half-written retention rewrite never mixes column generations"""
+        store = HistoryStore(str(tmp_path))
+        for i in range(5):
+            store.append_row(make_row(HOUR_START + i * 15, cpu=float(i)))
+
+        # Simulate a crash while the trimmed copy was still being written
+        partial = tmp_path / "raw.new"
+        partial.mkdir()
+        (partial / "timestamp.f8").write_bytes(b"\x00" * 8)
+
+        reopened = HistoryStore(str(tmp_path))
+        assert not partial.exists()
+        assert reopened.count("raw") == 5
+        assert list(reopened.query("raw")["cpu_percent"]) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+    def test_interrupted_retention_swap_is_completed(self, tmp_path):
+        """Test a finished rewrite is swapped in if the crash hit mid-rename"""
+        store = HistoryStore(str(tmp_path))
+        for i in range(5):
+            store.append_row(make_row(HOUR_START + i * 15))
+
+        # Crash after the live tier moved aside, before the new one took its place
+        os.rename(tmp_path / "raw", tmp_path / "raw.old")
+        os.makedirs(tmp_path / "raw.new")
+        store._write_rows("raw", [make_row(HOUR_START + 60)], str(tmp_path / "raw.new"))
+
+        reopened = HistoryStore(str(tmp_path))
+        assert list(reopened.query("raw")["timestamp"]) == [HOUR_START + 60]
+        assert not (tmp_path / "raw.old").exists()
+
+    def test_out_of_order_rejected(self, tmp_path):
+        """Test samples must be appended in time order"""
+        store = HistoryStore(str(tmp_path))
+        store.append_row(make_row(HOUR_START + 60))
+
+        with pytest.raises(ValueError):
+            store.append_row(make_row(HOUR_START))
+
+    def test_repair_truncates_partial_append(self, tmp_path):
+        """Test columns are realigned after an interrupted append"""
+        store = HistoryStore(str(tmp_path))
+        store.append_row(make_row(HOUR_START))
+
+        with open(tmp_path / "raw" / "timestamp.f8", "ab") as f:
+            f.write(b"\x00" * 8)
+
+        reopened = HistoryStore(str(tmp_path))
+        assert reopened.count("raw") == 1
+        assert os.path.getsize(tmp_path / "raw" / "timestamp.f8") == 8
+
+    def test_row_from_health_data(self):
+        """Test a health report maps onto history columns"""
+        health_data = {
+            "timestamp": "2024-01-01T00:00:00",
+            "cpu": {"cpu_percent_total": 42.0},
+            "memory": {"percent_used": 55.0, "swap_percent": 1.0},
+            "disk": [{"percent_used": 30.0}, {"percent_used": 70.0}],
+            "network": {"bytes_sent_mb": 1.5, "packets_sent": 10},
+            "processes": {"total_processes": 123},
+        }
+
+        row = row_from_health_data(health_data)
+
+        assert row["cpu_percent"] == 42.0
+        assert row["disk_percent_max"] == 70.0
+        assert row["process_count"] == 123
+        assert set(row) == {name for name, _, _ in COLUMNS}